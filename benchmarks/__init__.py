@@ -0,0 +1,6 @@
+"""Offline benchmarks for the studio graphs.
+
+Run `python -m benchmarks.run_graphs --help`, `python -m benchmarks.import_time --help`,
+`python -m benchmarks.engine_overhead --help` or `python -m benchmarks.serde_bench --help`
+from the repository root.
+"""
@@ -0,0 +1,137 @@
+"""Measure what the LangGraph runtime itself costs per superstep, using the graphs that need no model.
+
+Runs simple_graph, dynamic_breakpoints and sub_graphs many times with a seeded
+`decide_mood`, with and without a checkpointer and at growing state sizes, and
+reports per-run and per-superstep latency, peak allocations per superstep and
+checkpoint serialization cost as JSON. The nodes only concatenate strings, so
+nearly all of the time measured is runtime overhead.
+
+Examples:
+    python -m benchmarks.engine_overhead --runs 100000
+    python -m benchmarks.engine_overhead --graph module-1/simple_graph --runs 1000000 --sizes 0
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+from typing import Callable, Optional
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+from benchmarks import fakes, graphs
+from benchmarks.run_graphs import summarize
+
+# Sample log used to grow the sub_graphs input; roughly 200 bytes once serialized
+LOG = {"question": "How can I use Chroma vector store?", "answer": "Use Chroma.from_documents.",
+       "grade": 0, "grader": "Document Relevance Recall",
+       "feedback": "The retrieved documents discuss vector stores in general."}
+
+# Input builders taking an approximate state size in bytes. dynamic_breakpoints interrupts
+# on inputs longer than 5 characters, so its input does not grow.
+INPUTS: dict[str, Callable[[int], dict]] = {
+    "module-1/simple_graph": lambda size: {"graph_state": "x" * size},
+    "module-3/dynamic_breakpoints": lambda size: {"input": "hello"},
+    "module-4/sub_graphs": lambda size: {"raw_logs": [{"id": str(i), **LOG} for i in range(max(1, size // 200))]},
+}
+
+def count_supersteps(graph, inputs: dict, config: dict) -> int:
+    """Supersteps executed by one run, including those of subgraphs."""
+    steps = set()
+    for namespace, event in graph.stream(inputs, config, stream_mode="debug", subgraphs=True):
+        if event["type"] == "task":
+            steps.add((namespace, event["step"]))
+    return len(steps)
+
+def benchmark(graph, make_input: Callable[[], dict], runs: int, checkpointer: bool, alloc_runs: int) -> dict:
+    serializer = fakes.CountingSerializer()
+    graph.checkpointer = InMemorySaver(serde=serializer) if checkpointer else None
+
+    def config() -> dict:
+        return {"configurable": {"thread_id": str(uuid.uuid4())}} if checkpointer else {}
+
+    def cleanup(run_config: dict) -> None:
+        # Keep the in-memory saver from growing over millions of runs
+        if checkpointer:
+            graph.checkpointer.delete_thread(run_config["configurable"]["thread_id"])
+
+    steps = count_supersteps(graph, make_input(), config())
+    serializer.bytes_written, serializer.seconds = 0, 0.0
+
+    latencies = []
+    for _ in range(runs):
+        inputs, run_config = make_input(), config()
+        start = time.perf_counter()
+        graph.invoke(inputs, run_config)
+        latencies.append(time.perf_counter() - start)
+        cleanup(run_config)
+    serde_bytes, serde_seconds = serializer.bytes_written, serializer.seconds
+
+    # Allocation pass, separate because tracemalloc slows everything down
+    peaks = []
+    tracemalloc.start()
+    for _ in range(alloc_runs):
+        inputs, run_config = make_input(), config()
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        graph.invoke(inputs, run_config)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        cleanup(run_config)
+    tracemalloc.stop()
+    graph.checkpointer = None
+
+    total = sum(latencies)
+    per_run = summarize(latencies)
+    return {
+        "runs": runs,
+        "supersteps_per_run": steps,
+        "runs_per_second": runs / total if total else 0.0,
+        "per_run": per_run,
+        "per_superstep_us": 1000 * per_run["mean_ms"] / steps,
+        "peak_alloc_bytes_per_superstep": sum(peaks) / len(peaks) / steps if peaks else None,
+        "checkpoint": {
+            "bytes_per_run": serde_bytes / runs,
+            "serialize_us_per_run": 1e6 * serde_seconds / runs,
+            "serialize_share_of_run": serde_seconds / total if total else 0.0,
+        } if checkpointer else None,
+    }
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--graph", action="append", choices=sorted(INPUTS), help="Graph id (default: all three)")
+    parser.add_argument("--runs", type=int, default=10000)
+    parser.add_argument("--alloc-runs", type=int, default=200, help="Runs traced with tracemalloc")
+    parser.add_argument("--sizes", default="0,10000,1000000", help="Comma separated approximate state sizes in bytes")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for decide_mood's coin flip")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    entries = [e for e in graphs.discover() if e.id in (args.graph or INPUTS)]
+    report = {"settings": {k: v for k, v in vars(args).items() if k != "output"}, "graphs": {}}
+    # The nodes print progress; drop it instead of timing the terminal
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for entry in entries:
+            graph = graphs.load(entry)
+            results = report["graphs"][entry.id] = {}
+            for size in sizes if entry.id != "module-3/dynamic_breakpoints" else sizes[:1]:
+                make_input = lambda: INPUTS[entry.id](size)
+                for checkpointer in (False, True):
+                    random.seed(args.seed)
+                    key = f"size={len(json.dumps(make_input()))},checkpointer={checkpointer}"
+                    results[key] = benchmark(graph, make_input, args.runs, checkpointer, args.alloc_runs)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
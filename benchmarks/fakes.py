@@ -0,0 +1,281 @@
+"""Deterministic local stand-ins for the model, search and extraction clients.
+
+The studio modules import `ChatOpenAI`, `TavilySearch`, `WikipediaLoader` and
+`create_extractor` on first use, so `patch_dependencies` must be active while a
+graph module is imported and while it runs.
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Optional
+from unittest import mock
+
+from langchain_core.documents import Document
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+## Latency
+
+@dataclass
+class LatencyModel:
+    """Latency distribution in seconds, parsed from specs such as `fixed:0.05`,
+    `uniform:0.05,0.2`, `normal:0.8,0.2` or `lognormal:-0.5,0.4`."""
+    kind: str = "fixed"
+    params: tuple = (0.0,)
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        kind, _, raw = spec.partition(":")
+        params = tuple(float(p) for p in raw.split(",")) if raw else (0.0,)
+        if kind not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        return cls(kind, params)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return rng.uniform(*self.params)
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(*self.params))
+        return rng.lognormvariate(*self.params)
+
+## Cassettes
+
+class Cassette:
+    """Recorded model responses keyed by a hash of the bound tools and the prompt.
+
+    When replaying, recorded responses are returned as-is; anything missing is
+    generated and, if `record` is set, added to the cassette for the next run.
+    """
+
+    def __init__(self, path: Optional[str] = None, record: bool = False):
+        self.path = path
+        self.record = record
+        self.responses: dict[str, dict] = {}
+        self.lock = threading.Lock()
+        if path:
+            try:
+                with open(path) as f:
+                    self.responses = json.load(f)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def key(tools: list[dict], messages: list[BaseMessage]) -> str:
+        payload = json.dumps(
+            [[t["function"]["name"] for t in tools],
+             [(m.type, m.content if isinstance(m.content, str) else str(m.content)) for m in messages]],
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        return self.responses.get(key)
+
+    def put(self, key: str, response: dict) -> None:
+        if self.record:
+            with self.lock:
+                self.responses[key] = response
+
+    def save(self) -> None:
+        if self.path and self.record:
+            with open(self.path, "w") as f:
+                json.dump(self.responses, f, indent=2, sort_keys=True)
+
+## Settings shared by all fakes
+
+@dataclass
+class FakeSettings:
+    llm_latency: LatencyModel = field(default_factory=LatencyModel)
+    search_latency: LatencyModel = field(default_factory=LatencyModel)
+    cassette: Cassette = field(default_factory=Cassette)
+    seed: int = 0
+
+    def __post_init__(self):
+        self.rng = random.Random(self.seed)
+        self.lock = threading.Lock()
+
+    def sleep(self, latency: LatencyModel) -> None:
+        with self.lock:
+            delay = latency.sample(self.rng)
+        if delay > 0:
+            time.sleep(delay)
+
+settings = FakeSettings()
+
+## Schema sampling
+
+def sample_from_schema(schema: dict, defs: Optional[dict] = None) -> Any:
+    """Build a small valid value for a JSON schema (used for tool call args and extractions)."""
+    defs = defs if defs is not None else schema.get("$defs", {})
+    if "$ref" in schema:
+        return sample_from_schema(defs[schema["$ref"].split("/")[-1]], defs)
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in schema:
+            options = [s for s in schema[key] if s.get("type") != "null"] or schema[key]
+            return sample_from_schema(options[0], defs)
+    if "enum" in schema:
+        return schema["enum"][0]
+    if "const" in schema:
+        return schema["const"]
+    kind = schema.get("type", "object" if "properties" in schema else "string")
+    if kind == "object":
+        return {name: sample_from_schema(prop, defs) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [sample_from_schema(schema.get("items") or {"type": "string"}, defs) for _ in range(2)]
+    if kind == "integer":
+        return 1
+    if kind == "number":
+        return 1.0
+    if kind == "boolean":
+        return True
+    if kind == "null":
+        return None
+    if schema.get("format") == "date-time":
+        return datetime.now(timezone.utc).isoformat()
+    return "benchmark"
+
+## Model
+
+class FakeChatModel(BaseChatModel):
+    """Scripted replacement for `ChatOpenAI`.
+
+    With tools bound it calls the forced (or first) tool unless the last message is a tool
+    result, which makes ReAct loops finish after one round trip. Otherwise it answers with text.
+    """
+    model: str = "fake"
+    temperature: Optional[float] = None
+    tools: list[dict] = []
+    tool_choice: Optional[str] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def bind_tools(self, tools, *, tool_choice=None, **kwargs):
+        formatted = [convert_to_openai_tool(t) for t in tools]
+        if tool_choice in ("any", "required", True):
+            tool_choice = formatted[0]["function"]["name"]
+        if isinstance(tool_choice, dict):
+            tool_choice = tool_choice["function"]["name"]
+        return self.model_copy(update={"tools": formatted, "tool_choice": tool_choice})
+
+    def _respond(self, messages: list[BaseMessage]) -> dict:
+        wants_tool = self.tools and (self.tool_choice or not isinstance(messages[-1], ToolMessage))
+        if not wants_tool:
+            return {"content": f"Benchmark response to: {str(messages[-1].content)[:80]}", "tool_calls": []}
+        tool = next((t for t in self.tools if t["function"]["name"] == self.tool_choice), self.tools[0])
+        args = sample_from_schema(tool["function"].get("parameters", {}))
+        return {"content": "", "tool_calls": [{"name": tool["function"]["name"], "args": args,
+                                               "id": f"call_{uuid.uuid4().hex[:12]}"}]}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        settings.sleep(settings.llm_latency)
+        key = Cassette.key(self.tools, messages)
+        response = settings.cassette.get(key)
+        if response is None:
+            response = self._respond(messages)
+            settings.cassette.put(key, response)
+        message = AIMessage(content=response["content"], tool_calls=response["tool_calls"])
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+## Search
+
+class FakeTavilySearch:
+    """Replacement for `TavilySearch` returning fixed results."""
+
+    def __init__(self, max_results: int = 3, **kwargs):
+        self.max_results = max_results
+
+    def _results(self, query: str) -> dict:
+        settings.sleep(settings.search_latency)
+        return {"results": [{"url": f"https://example.com/{i}", "content": f"Result {i} for {query}"}
+                            for i in range(self.max_results)]}
+
+    def invoke(self, input: dict, config=None, **kwargs) -> dict:
+        return self._results(input["query"])
+
+    async def ainvoke(self, input: dict, config=None, **kwargs) -> dict:
+        return self._results(input["query"])
+
+class FakeWikipediaLoader:
+    """Replacement for `WikipediaLoader` returning fixed documents."""
+
+    def __init__(self, query: str, load_max_docs: int = 2, **kwargs):
+        self.query = query
+        self.load_max_docs = load_max_docs
+
+    def load(self) -> list[Document]:
+        settings.sleep(settings.search_latency)
+        return [Document(page_content=f"Wikipedia page {i} about {self.query}",
+                         metadata={"source": f"https://en.wikipedia.org/wiki/Page_{i}"})
+                for i in range(self.load_max_docs)]
+
+    async def aload(self) -> list[Document]:
+        return self.load()
+
+## Trustcall
+
+def fake_create_extractor(llm, *, tools, tool_choice=None, enable_inserts=False, **kwargs):
+    """Replacement for `trustcall.create_extractor` that returns one sampled object per call."""
+    schema = tools[0]
+
+    def extract(inputs: dict) -> dict:
+        settings.sleep(settings.llm_latency)
+        response = schema.model_validate(sample_from_schema(schema.model_json_schema()))
+        return {"messages": [AIMessage(content="")], "responses": [response], "response_metadata": [{}]}
+
+    return RunnableLambda(extract, name="FakeExtractor")
+
+## Checkpoint accounting
+
+class CountingSerializer(JsonPlusSerializer):
+    """Serializer that counts the bytes it writes and the time spent doing so."""
+
+    def __init__(self):
+        super().__init__()
+        self.bytes_written = 0
+        self.seconds = 0.0
+        self.lock = threading.Lock()
+
+    def dumps_typed(self, obj):
+        start = time.perf_counter()
+        type_, data = super().dumps_typed(obj)
+        with self.lock:
+            self.seconds += time.perf_counter() - start
+            self.bytes_written += len(data)
+        return type_, data
+
+@contextmanager
+def patch_dependencies(fake_settings: Optional[FakeSettings] = None):
+    """Swap the external clients used by the studio modules for the fakes above."""
+    global settings
+    previous = settings
+    settings = fake_settings or FakeSettings()
+    with ExitStack() as stack:
+        import langchain_community.document_loaders
+        import langchain_openai
+        import langchain_tavily
+        import trustcall
+        stack.enter_context(mock.patch.object(langchain_openai, "ChatOpenAI", FakeChatModel))
+        stack.enter_context(mock.patch.object(langchain_tavily, "TavilySearch", FakeTavilySearch))
+        stack.enter_context(mock.patch.object(langchain_community.document_loaders, "WikipediaLoader",
+                                              FakeWikipediaLoader, create=True))
+        stack.enter_context(mock.patch.object(trustcall, "create_extractor", fake_create_extractor))
+        try:
+            yield settings
+        finally:
+            settings.cassette.save()
+            settings = previous
@@ -0,0 +1,87 @@
+"""Discover and load the graphs declared in each module's langgraph.json."""
+
+import importlib.util
+import json
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from langchain_core.messages import HumanMessage
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Inputs used for each graph name; graphs not listed here get a single human message
+SAMPLE_INPUTS = {
+    "simple_graph": lambda: {"graph_state": "Hi, this is Lance."},
+    "dynamic_breakpoints": lambda: {"input": "hello"},
+    "parallelization": lambda: {"question": "How were Nvidia's Q2 2024 earnings?"},
+    "map_reduce": lambda: {"topic": "animals"},
+    "research_assistant": lambda: {"topic": "The benefits of adopting LangGraph as an agent framework",
+                                   "max_analysts": 3},
+    "sub_graphs": lambda: {"raw_logs": [
+        {"id": "1", "question": "How can I import ChatOllama?", "answer": "from langchain_community.chat_models import ChatOllama"},
+        {"id": "2", "question": "How can I use Chroma vector store?", "answer": "Use Chroma.from_documents.",
+         "grade": 0, "grader": "Document Relevance Recall", "feedback": "The retrieved documents discuss vector stores in general."},
+    ]},
+}
+
+def sample_input(name: str) -> dict:
+    if name in SAMPLE_INPUTS:
+        return SAMPLE_INPUTS[name]()
+    return {"messages": [HumanMessage(content="Hi, I'm Lance. Multiply 2 and 3, then remind me to buy milk.")]}
+
+@dataclass
+class GraphEntry:
+    module: str # e.g. "module-4"
+    name: str # Graph name in langgraph.json
+    directory: Path # Directory holding langgraph.json
+    path: Path # Python file defining the graph
+    attribute: str # Attribute holding the compiled graph
+
+    @property
+    def id(self) -> str:
+        return f"{self.module}/{self.name}"
+
+    @property
+    def module_name(self) -> str:
+        """Name the graph's module is registered under in sys.modules by `load`."""
+        return f"_bench_{self.module.replace('-', '_')}_{self.path.stem}"
+
+def discover(root: Path = REPO_ROOT) -> list[GraphEntry]:
+    """Return every graph listed in the langgraph.json files of modules 1-6."""
+    entries = []
+    for config_path in sorted(root.glob("module-*/*/langgraph.json")):
+        config = json.loads(config_path.read_text())
+        for name, target in config.get("graphs", {}).items():
+            file, _, attribute = target.partition(":")
+            entries.append(GraphEntry(
+                module=config_path.parent.parent.name,
+                name=name,
+                directory=config_path.parent,
+                path=(config_path.parent / file).resolve(),
+                attribute=attribute or "graph",
+            ))
+    return entries
+
+def load(entry: GraphEntry) -> Any:
+    """Import the module for a graph entry and return its compiled graph.
+
+    Each studio directory is imported the way `langgraph dev` does it: with the directory
+    on sys.path, so sibling modules such as `configuration` resolve to that directory.
+    """
+    directory = str(entry.directory)
+    # Drop sibling modules cached from a different studio directory
+    for module_name, module in list(sys.modules.items()):
+        module_file = getattr(module, "__file__", None) or ""
+        if module_file.startswith(str(REPO_ROOT / "module-")) and not module_file.startswith(directory):
+            del sys.modules[module_name]
+    sys.path.insert(0, directory)
+    try:
+        spec = importlib.util.spec_from_file_location(entry.module_name, entry.path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[entry.module_name] = module
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(directory)
+    return getattr(module, entry.attribute)
@@ -0,0 +1,101 @@
+"""Measure how long each studio graph module takes to import, as JSON.
+
+Cold: a fresh interpreter imports the module (what `langgraph dev` or an API
+container pays at startup). Warm: the module is executed again in a process
+that already has its dependencies imported (what a forked worker pays).
+
+Examples:
+    python -m benchmarks.import_time --runs 5
+    python -m benchmarks.import_time --graph module-5/memory_agent --top 15
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Optional
+
+from benchmarks import graphs
+
+# Runs in the child interpreter; prints the load time and, with -X importtime, the import log on stderr
+COLD_SCRIPT = """
+import importlib.util, sys, time
+start = time.perf_counter()
+directory, path = sys.argv[1:3]
+sys.path.insert(0, directory)
+spec = importlib.util.spec_from_file_location("graph_module", path)
+spec.loader.exec_module(importlib.util.module_from_spec(spec))
+print(time.perf_counter() - start)
+"""
+
+def child_env() -> dict:
+    env = dict(os.environ)
+    # Some clients validate credentials when constructed; a placeholder keeps eager modules importable
+    env.setdefault("OPENAI_API_KEY", "sk-import-time")
+    env.setdefault("TAVILY_API_KEY", "tvly-import-time")
+    return env
+
+def parse_importtime(stderr: str, top: int) -> list[dict]:
+    """Slowest top-level imports from `python -X importtime` output, by cumulative time."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative_us, name = line.split("|", 2)
+        # Nested imports are indented below the module that triggered them
+        if not cumulative_us.strip().isdigit() or name[1:].startswith(" "):
+            continue
+        rows.append({"module": name.strip(), "cumulative_ms": int(cumulative_us) / 1000})
+    return sorted(rows, key=lambda r: -r["cumulative_ms"])[:top]
+
+def cold_import(entry: graphs.GraphEntry, top: int = 0) -> tuple[float, list[dict]]:
+    command = [sys.executable] + (["-X", "importtime"] if top else []) + ["-c", COLD_SCRIPT, str(entry.directory), str(entry.path)]
+    result = subprocess.run(command, capture_output=True, text=True, cwd=graphs.REPO_ROOT, env=child_env())
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return float(result.stdout.strip().splitlines()[-1]), parse_importtime(result.stderr, top) if top else []
+
+def warm_import(entry: graphs.GraphEntry) -> float:
+    start = time.perf_counter()
+    graphs.load(entry)
+    return time.perf_counter() - start
+
+def summarize(values: list[float]) -> dict:
+    return {"min_ms": 1000 * min(values), "median_ms": 1000 * statistics.median(values)}
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--graph", action="append", help="Graph id such as module-1/agent (default: all)")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=0, help="Also list the N slowest top-level imports (cold)")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    os.environ.update({k: v for k, v in child_env().items() if k.endswith("_API_KEY")})
+    entries = [e for e in graphs.discover() if not args.graph or e.id in args.graph]
+    report = {"runs": args.runs, "graphs": {}}
+    for entry in entries:
+        try:
+            cold = [cold_import(entry)[0] for _ in range(args.runs)]
+            slowest = cold_import(entry, args.top)[1] if args.top else None
+            warm_import(entry)
+            warm = [warm_import(entry) for _ in range(args.runs)]
+        except Exception as e:
+            report["graphs"][entry.id] = {"error": f"{type(e).__name__}: {e}"}
+            continue
+        report["graphs"][entry.id] = {"cold": summarize(cold), "warm": summarize(warm)}
+        if slowest is not None:
+            report["graphs"][entry.id]["slowest_imports"] = slowest
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
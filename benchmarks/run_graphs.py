@@ -0,0 +1,165 @@
+"""Run every studio graph offline and report framework and node overhead as JSON.
+
+Examples:
+    python -m benchmarks.run_graphs --runs 20
+    python -m benchmarks.run_graphs --graph module-4/research_assistant --llm-latency lognormal:-1,0.3
+    python -m benchmarks.run_graphs --cassette cassette.json --record
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import sys
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.store.memory import InMemoryStore
+
+from benchmarks import fakes, graphs
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile (q in [0, 100])."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+def summarize(values: list[float]) -> dict:
+    return {
+        "count": len(values),
+        "mean_ms": 1000 * sum(values) / len(values) if values else 0.0,
+        "p50_ms": 1000 * percentile(values, 50),
+        "p99_ms": 1000 * percentile(values, 99),
+    }
+
+class NodeTimer(BaseCallbackHandler):
+    """Collect wall time per graph node and the supersteps executed, from LangGraph run metadata."""
+
+    def __init__(self):
+        self.starts: dict[Any, tuple[str, float]] = {}
+        self.durations: dict[str, list[float]] = defaultdict(list)
+        self.supersteps: set[tuple[str, int]] = set()
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, name=None, **kwargs):
+        metadata = metadata or {}
+        node = metadata.get("langgraph_node")
+        # Only the node runnable itself, not the chains and models it calls, nor
+        # LangGraph's own steps such as __start__
+        if node is None or name != node or node.startswith("__"):
+            return
+        self.starts[run_id] = (node, time.perf_counter())
+        self.supersteps.add((metadata.get("langgraph_checkpoint_ns", ""), metadata.get("langgraph_step", 0)))
+
+    def _finish(self, run_id):
+        if run_id in self.starts:
+            node, start = self.starts.pop(run_id)
+            self.durations[node].append(time.perf_counter() - start)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id)
+
+def run_to_completion(graph, inputs: dict, config: dict, max_resumes: int = 5) -> None:
+    """Invoke a graph, resuming through interrupts (e.g. human_feedback) with no state changes."""
+    graph.invoke(inputs, config)
+    for _ in range(max_resumes):
+        if not graph.get_state(config).next:
+            return
+        graph.invoke(None, config)
+
+async def arun_to_completion(graph, inputs: dict, config: dict, max_resumes: int = 5) -> None:
+    """Async variant of run_to_completion, which selects the async node implementations."""
+    await graph.ainvoke(inputs, config)
+    for _ in range(max_resumes):
+        if not (await graph.aget_state(config)).next:
+            return
+        await graph.ainvoke(None, config)
+
+def benchmark_graph(entry: graphs.GraphEntry, runs: int, warmup: int, mode: str = "sync") -> dict:
+    graph = graphs.load(entry)
+    serializer = fakes.CountingSerializer()
+    graph.checkpointer = InMemorySaver(serde=serializer)
+    graph.store = InMemoryStore()
+
+    timer = NodeTimer()
+    latencies = []
+    supersteps = 0
+    for i in range(warmup + runs):
+        measured = i >= warmup
+        if measured and i == warmup:
+            # Discard the warmup numbers
+            timer.__init__()
+            serializer.bytes_written = 0
+        config = {"configurable": {"thread_id": str(uuid.uuid4())}, "recursion_limit": 50}
+        if measured:
+            config["callbacks"] = [timer]
+        start = time.perf_counter()
+        if mode == "async":
+            asyncio.run(arun_to_completion(graph, graphs.sample_input(entry.name), config))
+        else:
+            run_to_completion(graph, graphs.sample_input(entry.name), config)
+        if measured:
+            latencies.append(time.perf_counter() - start)
+            supersteps += len(timer.supersteps)
+            timer.supersteps.clear()
+
+    total = sum(latencies)
+    return {
+        "runs": runs,
+        "end_to_end": summarize(latencies),
+        "supersteps_per_second": supersteps / total if total else 0.0,
+        "checkpoint_bytes_written": serializer.bytes_written,
+        "checkpoint_bytes_per_run": serializer.bytes_written / runs if runs else 0,
+        "nodes": {node: {**summarize(values), "total_ms": 1000 * sum(values)}
+                  for node, values in sorted(timer.durations.items())},
+    }
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--graph", action="append", help="Graph id such as module-1/agent (default: all)")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--mode", choices=["sync", "async"], default="sync", help="Run graphs with invoke or ainvoke")
+    parser.add_argument("--llm-latency", default="fixed:0", help="Latency distribution for model calls")
+    parser.add_argument("--search-latency", default="fixed:0", help="Latency distribution for Tavily / Wikipedia")
+    parser.add_argument("--cassette", help="JSON file of recorded model responses")
+    parser.add_argument("--record", action="store_true", help="Add generated responses to the cassette")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    settings = fakes.FakeSettings(
+        llm_latency=fakes.LatencyModel.parse(args.llm_latency),
+        search_latency=fakes.LatencyModel.parse(args.search_latency),
+        cassette=fakes.Cassette(args.cassette, record=args.record),
+        seed=args.seed,
+    )
+    entries = [e for e in graphs.discover() if not args.graph or e.id in args.graph]
+    report = {"settings": {k: v for k, v in vars(args).items() if k not in ("graph", "output")}, "graphs": {}}
+    with fakes.patch_dependencies(settings):
+        for entry in entries:
+            try:
+                # Some nodes print progress; keep stdout for the report
+                with contextlib.redirect_stdout(io.StringIO()):
+                    report["graphs"][entry.id] = benchmark_graph(entry, args.runs, args.warmup, args.mode)
+            except Exception as e:
+                report["graphs"][entry.id] = {"error": f"{type(e).__name__}: {e}"}
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,110 @@
+"""Compare checkpoint serializers on the states the studio graphs actually produce.
+
+Runs each graph offline (with `fakes`) for a few turns on one thread, collects every
+checkpoint and pending write it saved, and times `dumps_typed` / `loads_typed` over
+them for JsonPlusSerializer (the default) and checkpoints.serde.FastSerializer, with
+and without zstd compression. Every round trip is checked against the original.
+
+Examples:
+    python -m benchmarks.serde_bench
+    python -m benchmarks.serde_bench --graph module-4/research_assistant --turns 20 --repeat 50
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+import time
+import uuid
+from typing import Any, Callable, Optional
+
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.store.memory import InMemoryStore
+
+from benchmarks import fakes, graphs
+from benchmarks.run_graphs import run_to_completion
+from checkpoints.compression import ZstdSerializer
+from checkpoints.serde import FastSerializer, course_models
+
+DEFAULT_GRAPHS = ["module-1/agent", "module-2/chatbot", "module-4/research_assistant", "module-5/memory_agent"]
+
+def collect_states(entry: graphs.GraphEntry, turns: int) -> tuple[list[Any], Any]:
+    """Checkpoints and pending write values saved while running a graph for `turns` turns."""
+    graph = graphs.load(entry)
+    module = sys.modules[entry.module_name]
+    graph.checkpointer = InMemorySaver()
+    graph.store = InMemoryStore()
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}, "recursion_limit": 50}
+    inputs = graphs.sample_input(entry.name)
+    for turn in range(turns):
+        run_to_completion(graph, inputs, config)
+        # Later turns only add to the conversation, so message lists keep growing
+        inputs = {"messages": [HumanMessage(f"Follow-up question {turn}: can you go into more detail?")]}
+    states = []
+    for checkpoint in graph.checkpointer.list(config):
+        states.append(checkpoint.checkpoint)
+        states.extend(value for _, _, value in checkpoint.pending_writes or [])
+    return states, module
+
+def time_serializer(serializer: SerializerProtocol, states: list[Any], repeat: int) -> dict:
+    encoded = [serializer.dumps_typed(state) for state in states]
+    mismatches = sum(serializer.loads_typed(data) != state for data, state in zip(encoded, states))
+
+    def best_of(fn: Callable[[], Any]) -> float:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    dumps = best_of(lambda: [serializer.dumps_typed(state) for state in states])
+    loads = best_of(lambda: [serializer.loads_typed(data) for data in encoded])
+    return {
+        "bytes": sum(len(data) for _, data in encoded),
+        "dumps_ms": 1000 * dumps,
+        "loads_ms": 1000 * loads,
+        "round_trip_mismatches": mismatches,
+    }
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--graph", action="append", help=f"Graph id (default: {', '.join(DEFAULT_GRAPHS)})")
+    parser.add_argument("--turns", type=int, default=10, help="Conversation turns per graph")
+    parser.add_argument("--repeat", type=int, default=20, help="Timing repetitions; the best is reported")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    wanted = args.graph or DEFAULT_GRAPHS
+    report = {"settings": {k: v for k, v in vars(args).items() if k != "output"}, "graphs": {}}
+    with fakes.patch_dependencies():
+        for entry in [e for e in graphs.discover() if e.id in wanted]:
+            with contextlib.redirect_stdout(io.StringIO()):
+                states, module = collect_states(entry, args.turns)
+            fast = FastSerializer(models=course_models(module))
+            serializers = {
+                "jsonplus": JsonPlusSerializer(),
+                "fast": fast,
+                "jsonplus+zstd": ZstdSerializer(JsonPlusSerializer()),
+                "fast+zstd": ZstdSerializer(fast),
+            }
+            results = {name: time_serializer(s, states, args.repeat) for name, s in serializers.items()}
+            baseline = results["jsonplus"]
+            for result in results.values():
+                result["dumps_speedup"] = baseline["dumps_ms"] / result["dumps_ms"]
+                result["loads_speedup"] = baseline["loads_ms"] / result["loads_ms"]
+            report["graphs"][entry.id] = {"values": len(states), "serializers": results}
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
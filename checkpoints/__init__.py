@@ -0,0 +1,4 @@
+"""Storage tools for SQLite checkpoint databases such as module-2/state_db/example.db.
+
+Run `python -m checkpoints.compression --help` from the repository root.
+"""
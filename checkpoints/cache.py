@@ -0,0 +1,296 @@
+"""In-process read cache of each thread's latest checkpoint.
+
+Every turn of a conversation starts with `get_tuple` for the thread's latest
+checkpoint, which SqliteSaver answers with a query and a full deserialization, even
+though the same process wrote that checkpoint a moment ago. `CachedSaver` wraps any
+checkpointer and keeps the latest deserialized checkpoint per (thread_id,
+checkpoint_ns) in an LRU bounded by an estimate of its memory use:
+
+- `put` stores the checkpoint it was given (write-through), so the next turn is
+  served without touching the database;
+- `put_writes`, `delete_thread`, `copy_thread`, `fork`, `prune` and
+  `delete_for_runs` invalidate the affected entries;
+- reads of a specific older checkpoint (time travel) go to the database.
+
+    memory = CachedSaver(SqliteSaver(conn), max_bytes=256 * 2**20)
+    graph = builder.compile(checkpointer=memory)
+    memory.stats()  # {"hits": ..., "misses": ..., "hit_rate": ...}
+
+Cached values are shared with callers instead of copied, the same way the runtime
+shares state between steps, so nodes must not mutate state in place. The cache only
+sees this process's writes: route each thread to one worker, or set `ttl_seconds`
+to bound how stale an entry may get when several processes write the same thread.
+"""
+
+import copy
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Collection, Iterable, Iterator, Sequence
+from typing import Any, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+
+# Leaf values, measured without looking inside
+SCALARS = frozenset({str, bytes, bytearray, int, float, bool, type(None)})
+
+def approximate_size(obj: Any, depth: int = 0) -> int:
+    """Rough memory footprint of a checkpoint value in bytes. Dict keys of objects
+    are shared between instances and not counted."""
+    size = sys.getsizeof(obj)
+    if type(obj) in SCALARS or depth > 8:
+        return size
+    if isinstance(obj, dict):
+        values = obj.values()
+        size += sum(sys.getsizeof(key) for key in obj)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        values = obj
+    elif hasattr(obj, "__dict__"):
+        values = vars(obj).values()
+    else:
+        return size
+    for value in values:
+        size += sys.getsizeof(value) if type(value) in SCALARS else approximate_size(value, depth + 1)
+    return size
+
+class Entry:
+    __slots__ = ("value", "size", "item_sizes", "cached_at")
+
+    def __init__(self, value: Optional[CheckpointTuple], size: int, item_sizes: dict[int, tuple[Any, int]]):
+        # None once pending writes were added behind the cached tuple's back
+        self.value = value
+        self.size = size
+        # id(list item) -> (item, size) for list channels such as messages, which
+        # mostly hold the same objects from one checkpoint to the next
+        self.item_sizes = item_sizes
+        self.cached_at = time.monotonic()
+
+class CachedSaver(BaseCheckpointSaver):
+    """Checkpointer wrapper caching the latest checkpoint of each thread; see the module docstring.
+
+    Args:
+        inner: The checkpointer to read from and write to, e.g. SqliteSaver.
+        max_bytes: Estimated memory budget for cached checkpoints.
+        ttl_seconds: Drop entries older than this (0 keeps them until evicted).
+    """
+
+    def __init__(self, inner: BaseCheckpointSaver, *, max_bytes: int = 64 * 2**20, ttl_seconds: float = 0):
+        super().__init__(serde=inner.serde)
+        self.inner = inner
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.lock = threading.Lock()
+        # (thread_id, checkpoint_ns) -> latest checkpoint, least recently used first
+        self.entries: OrderedDict[tuple[str, str], Entry] = OrderedDict()
+        self.bytes = 0
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @property
+    def config_specs(self) -> list:
+        return self.inner.config_specs
+
+    ## Cache bookkeeping
+
+    @staticmethod
+    def _key(config: RunnableConfig) -> tuple[str, str]:
+        return str(config["configurable"]["thread_id"]), config["configurable"].get("checkpoint_ns", "")
+
+    def _lookup(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        key, checkpoint_id = self._key(config), get_checkpoint_id(config)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.ttl_seconds and time.monotonic() - entry.cached_at > self.ttl_seconds:
+                self._drop(key)
+                entry = None
+            value = entry.value if entry is not None else None
+            if value is None or (checkpoint_id and checkpoint_id != value.checkpoint["id"]):
+                self.counters["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.counters["hits"] += 1
+        # Callers may add keys to the checkpoint dict; give them their own
+        return value._replace(checkpoint=copy.copy(value.checkpoint), pending_writes=list(value.pending_writes or []))
+
+    def _store(self, key: tuple[str, str], checkpoint_tuple: CheckpointTuple) -> None:
+        with self.lock:
+            previous = self.entries.get(key)
+        known = previous.item_sizes if previous is not None else {}
+        item_sizes = {}
+        size = approximate_size(checkpoint_tuple.pending_writes)
+        for value in checkpoint_tuple.checkpoint["channel_values"].values():
+            if not isinstance(value, list):
+                size += approximate_size(value)
+                continue
+            size += sys.getsizeof(value)
+            for item in value:
+                cached = known.get(id(item))
+                item_size = cached[1] if cached is not None and cached[0] is item else approximate_size(item)
+                item_sizes[id(item)] = (item, item_size)
+                size += item_size
+
+        with self.lock:
+            self._drop(key)
+            if size > self.max_bytes:
+                return
+            self.entries[key] = Entry(checkpoint_tuple, size, item_sizes)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self.entries)))
+                self.counters["evictions"] += 1
+
+    def _drop(self, key: tuple[str, str]) -> bool:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+        return entry is not None
+
+    def warm(self, checkpoint_tuples: Iterable[CheckpointTuple]) -> None:
+        """Cache checkpoints loaded in bulk. Each must be the latest of its thread and namespace."""
+        for checkpoint_tuple in checkpoint_tuples:
+            self._store(self._key(checkpoint_tuple.config), checkpoint_tuple)
+
+    def invalidate(self, thread_id: Optional[str] = None) -> None:
+        """Forget one thread (every namespace), or everything."""
+        with self.lock:
+            keys = [key for key in self.entries if thread_id is None or key[0] == str(thread_id)]
+            for key in keys:
+                self._drop(key)
+            self.counters["invalidations"] += len(keys)
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {**self.counters, "hit_rate": self.counters["hits"] / lookups if lookups else 0.0,
+                    "entries": len(self.entries), "bytes": self.bytes, "max_bytes": self.max_bytes}
+
+    def _cached_put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                    saved_config: RunnableConfig) -> None:
+        parent_config = None
+        if config["configurable"].get("checkpoint_id"):
+            parent_config = {"configurable": {**config["configurable"]}}
+        self._store(self._key(config), CheckpointTuple(saved_config, checkpoint, metadata, parent_config, []))
+
+    def _invalidate_writes(self, config: RunnableConfig) -> None:
+        # The cached tuple's pending writes are now out of date. The entry stays, so
+        # that the next put can reuse its sizes, but is no longer served.
+        with self.lock:
+            entry = self.entries.get(self._key(config))
+            if entry is not None and entry.value is not None and \
+                    entry.value.checkpoint["id"] == config["configurable"].get("checkpoint_id"):
+                entry.value = None
+                self.counters["invalidations"] += 1
+
+    ## Sync API
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        cached = self._lookup(config)
+        if cached is not None:
+            return cached
+        checkpoint_tuple = self.inner.get_tuple(config)
+        if checkpoint_tuple is not None and not get_checkpoint_id(config):
+            self._store(self._key(config), checkpoint_tuple)
+        return checkpoint_tuple
+
+    def list(self, config: Optional[RunnableConfig], **kwargs: Any) -> Iterator[CheckpointTuple]:
+        return self.inner.list(config, **kwargs)
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        saved_config = self.inner.put(config, checkpoint, metadata, new_versions)
+        self._cached_put(config, checkpoint, metadata, saved_config)
+        return saved_config
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        self.inner.put_writes(config, writes, task_id, task_path)
+        self._invalidate_writes(config)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.inner.delete_thread(thread_id)
+        self.invalidate(thread_id)
+
+    def copy_thread(self, source_thread_id: str, target_thread_id: str) -> None:
+        self.inner.copy_thread(source_thread_id, target_thread_id)
+        self.invalidate(target_thread_id)
+
+    def fork(self, config: RunnableConfig, target_thread_id: str) -> RunnableConfig:
+        """`CopyOnWriteSqliteSaver.fork` on the inner saver."""
+        forked = self.inner.fork(config, target_thread_id)
+        self.invalidate(target_thread_id)
+        return forked
+
+    def prune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        self.inner.prune(thread_ids, strategy=strategy)
+        for thread_id in thread_ids:
+            self.invalidate(thread_id)
+
+    def delete_for_runs(self, run_ids: Sequence[str]) -> None:
+        self.inner.delete_for_runs(run_ids)
+        # Which threads the runs wrote to is only known to the database
+        self.invalidate()
+
+    ## Async API, for async inner savers
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        cached = self._lookup(config)
+        if cached is not None:
+            return cached
+        checkpoint_tuple = await self.inner.aget_tuple(config)
+        if checkpoint_tuple is not None and not get_checkpoint_id(config):
+            self._store(self._key(config), checkpoint_tuple)
+        return checkpoint_tuple
+
+    async def alist(self, config: Optional[RunnableConfig], **kwargs: Any) -> AsyncIterator[CheckpointTuple]:
+        async for checkpoint_tuple in self.inner.alist(config, **kwargs):
+            yield checkpoint_tuple
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        saved_config = await self.inner.aput(config, checkpoint, metadata, new_versions)
+        self._cached_put(config, checkpoint, metadata, saved_config)
+        return saved_config
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        await self.inner.aput_writes(config, writes, task_id, task_path)
+        self._invalidate_writes(config)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self.inner.adelete_thread(thread_id)
+        self.invalidate(thread_id)
+
+    async def acopy_thread(self, source_thread_id: str, target_thread_id: str) -> None:
+        await self.inner.acopy_thread(source_thread_id, target_thread_id)
+        self.invalidate(target_thread_id)
+
+    async def aprune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        await self.inner.aprune(thread_ids, strategy=strategy)
+        for thread_id in thread_ids:
+            self.invalidate(thread_id)
+
+    async def adelete_for_runs(self, run_ids: Sequence[str]) -> None:
+        await self.inner.adelete_for_runs(run_ids)
+        self.invalidate()
+
+    ## Delegated
+
+    def get_next_version(self, current: Any, channel: None) -> Any:
+        return self.inner.get_next_version(current, channel)
+
+    def with_allowlist(self, extra_allowlist: Collection[tuple[str, ...]]) -> "CachedSaver":
+        inner = self.inner.with_allowlist(extra_allowlist)
+        if inner is self.inner:
+            return self
+        # Same database, so the clone shares the cache
+        clone = copy.copy(self)
+        clone.inner, clone.serde = inner, inner.serde
+        return clone
@@ -0,0 +1,318 @@
+"""Compressed, delta-encoded checkpoint storage for SqliteSaver.
+
+`CompressedSqliteSaver` is a drop-in replacement for `SqliteSaver`:
+
+- Checkpoint and write blobs are zstd-compressed (`ZstdSerializer`), stored with a
+  `zstd/<inner type>` type tag.
+- Append-only channels such as `messages` are stored as a delta against the parent
+  checkpoint: a marker naming the parent plus the messages added since. A full copy
+  (keyframe) is written every `keyframe_interval` checkpoints, and whenever the
+  parent's value is not at hand, so rehydrating never walks a long chain.
+
+Reads through `get_tuple` and `list` rehydrate deltas transparently. Existing
+databases can be converted in place:
+
+    python -m checkpoints.compression migrate module-2/state_db/example.db
+"""
+
+import argparse
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from contextlib import closing
+from typing import Any, Iterator, Optional
+
+import zstandard
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from checkpoints.serde import SERDE_HELP, load_serializer
+
+ZSTD_PREFIX = "zstd/"
+
+# Key of the marker stored in place of a delta-encoded channel value
+DELTA_KEY = "__checkpoint_delta__"
+
+class ZstdSerializer(SerializerProtocol):
+    """Wrap another serializer and zstd-compress its output.
+
+    Payloads smaller than `min_size` are stored as-is, and data written without
+    compression is still read back, so existing databases keep working.
+    """
+
+    def __init__(self, inner: Optional[SerializerProtocol] = None, level: int = 3, min_size: int = 128):
+        self.inner = inner or JsonPlusSerializer()
+        self.level = level
+        self.min_size = min_size
+        # zstd contexts are not thread-safe; keep one pair per thread
+        self._local = threading.local()
+
+    def _contexts(self) -> tuple[zstandard.ZstdCompressor, zstandard.ZstdDecompressor]:
+        if not hasattr(self._local, "contexts"):
+            self._local.contexts = (zstandard.ZstdCompressor(level=self.level), zstandard.ZstdDecompressor())
+        return self._local.contexts
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        type_, data = self.inner.dumps_typed(obj)
+        if len(data) < self.min_size:
+            return type_, data
+        return ZSTD_PREFIX + type_, self._contexts()[0].compress(data)
+
+    def unwrap(self, data: tuple[str, bytes]) -> tuple[str, bytes]:
+        """Decompress a stored (type, payload) pair into what the inner serializer wrote."""
+        type_, payload = data
+        if type_.startswith(ZSTD_PREFIX):
+            return type_[len(ZSTD_PREFIX):], self._contexts()[1].decompress(payload)
+        return type_, payload
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        return self.inner.loads_typed(self.unwrap(data))
+
+def is_delta(value: Any) -> bool:
+    return isinstance(value, dict) and DELTA_KEY in value
+
+def same_prefix(base: list, value: list) -> bool:
+    """True if value starts with every item of base (an append-only update)."""
+    if len(value) < len(base):
+        return False
+    return all(b is v or b == v for b, v in zip(base, value))
+
+class CompressedSqliteSaver(SqliteSaver):
+    """SqliteSaver that stores zstd-compressed blobs and delta-encodes append-only channels.
+
+    Args:
+        conn: The SQLite database connection.
+        serde: Serializer to compress; defaults to JsonPlusSerializer.
+        delta_channels: Channels to delta-encode. They must hold lists that only grow
+            by appending, like `messages` with `add_messages` when nothing is removed;
+            any other update is stored in full.
+        keyframe_interval: Longest chain of deltas before a full copy is stored.
+        compression_level: zstd level.
+    """
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        *,
+        serde: Optional[SerializerProtocol] = None,
+        delta_channels: tuple[str, ...] = ("messages",),
+        keyframe_interval: int = 50,
+        compression_level: int = 3,
+        cache_size: int = 256,
+    ):
+        super().__init__(conn, serde=ZstdSerializer(serde, level=compression_level))
+        # Rehydrating a delta reads its parent while `list` holds the lock
+        self.lock = threading.RLock()
+        self.delta_channels = tuple(delta_channels)
+        self.keyframe_interval = keyframe_interval
+        self.cache_size = cache_size
+        # (thread_id, checkpoint_ns, checkpoint_id, channel) -> (value, delta depth)
+        self._values: OrderedDict[tuple, tuple[Any, int]] = OrderedDict()
+
+    ## Cache of full channel values, used as delta bases and when rehydrating
+
+    def _remember(self, key: tuple, value: Any, depth: int) -> None:
+        with self.lock:
+            self._values[key] = (value, depth)
+            self._values.move_to_end(key)
+            while len(self._values) > self.cache_size:
+                self._values.popitem(last=False)
+
+    def _recall(self, key: tuple) -> Optional[tuple[Any, int]]:
+        with self.lock:
+            if key in self._values:
+                self._values.move_to_end(key)
+                return self._values[key]
+        return None
+
+    ## Encoding
+
+    def encode_checkpoint(self, thread_id: str, checkpoint_ns: str, checkpoint: Checkpoint,
+                          parent_id: Optional[str]) -> Checkpoint:
+        """Copy of checkpoint with delta channels replaced by markers where possible."""
+        channel_values = dict(checkpoint["channel_values"])
+        for channel in self.delta_channels:
+            value = channel_values.get(channel)
+            if not isinstance(value, list):
+                continue
+            base = self._recall((thread_id, checkpoint_ns, parent_id, channel)) if parent_id else None
+            depth = 0
+            if base is not None and base[1] + 1 < self.keyframe_interval and same_prefix(base[0], value):
+                depth = base[1] + 1
+                channel_values[channel] = {DELTA_KEY: parent_id, "base_length": len(base[0]),
+                                           "depth": depth, "tail": value[len(base[0]):]}
+            self._remember((thread_id, checkpoint_ns, checkpoint["id"], channel), value, depth)
+        return {**checkpoint, "channel_values": channel_values}
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        configurable = config["configurable"]
+        encoded = self.encode_checkpoint(str(configurable["thread_id"]), configurable.get("checkpoint_ns", ""),
+                                         checkpoint, configurable.get("checkpoint_id"))
+        return super().put(config, encoded, metadata, new_versions)
+
+    ## Decoding
+
+    def load_channel(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str, channel: str) -> Any:
+        """Full value of one channel at a checkpoint, following deltas back to a keyframe."""
+        key = (thread_id, checkpoint_ns, checkpoint_id, channel)
+        cached = self._recall(key)
+        if cached is not None:
+            return cached[0]
+        with self.cursor(transaction=False) as cur:
+            cur.execute(
+                "SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            )
+            row = cur.fetchone()
+        if row is None:
+            raise LookupError(f"Delta base {checkpoint_id} of thread {thread_id} is missing")
+        value = self.serde.loads_typed(row)["channel_values"].get(channel)
+        return self.resolve(thread_id, checkpoint_ns, checkpoint_id, channel, value)
+
+    def resolve(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str, channel: str, value: Any) -> Any:
+        """Turn a stored channel value into the full value."""
+        depth = 0
+        if is_delta(value):
+            base = self.load_channel(thread_id, checkpoint_ns, value[DELTA_KEY], channel)
+            depth = value["depth"]
+            value = base[:value["base_length"]] + value["tail"]
+        if channel in self.delta_channels:
+            self._remember((thread_id, checkpoint_ns, checkpoint_id, channel), value, depth)
+        return value
+
+    def store_keyframe(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> bool:
+        """Rewrite a stored checkpoint with its delta channels in full, so its ancestors
+        can be deleted. Returns False if it held no deltas."""
+        with self.cursor(transaction=False) as cur:
+            cur.execute(
+                "SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            )
+            row = cur.fetchone()
+        if row is None:
+            return False
+        checkpoint = self.serde.loads_typed(row)
+        channel_values = dict(checkpoint["channel_values"])
+        deltas = [channel for channel, value in channel_values.items() if is_delta(value)]
+        if not deltas:
+            return False
+        for channel in deltas:
+            channel_values[channel] = self.resolve(thread_id, checkpoint_ns, checkpoint_id, channel,
+                                                   channel_values[channel])
+            self._remember((thread_id, checkpoint_ns, checkpoint_id, channel), channel_values[channel], 0)
+        with self.cursor() as cur:
+            cur.execute(
+                "UPDATE checkpoints SET type = ?, checkpoint = ? WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (*self.serde.dumps_typed({**checkpoint, "channel_values": channel_values}),
+                 thread_id, checkpoint_ns, checkpoint_id),
+            )
+        return True
+
+    def rehydrate(self, checkpoint_tuple: Optional[CheckpointTuple]) -> Optional[CheckpointTuple]:
+        if checkpoint_tuple is None:
+            return None
+        configurable = checkpoint_tuple.config["configurable"]
+        checkpoint = checkpoint_tuple.checkpoint
+        channel_values = dict(checkpoint["channel_values"])
+        for channel, value in channel_values.items():
+            if is_delta(value):
+                channel_values[channel] = self.resolve(str(configurable["thread_id"]), configurable["checkpoint_ns"],
+                                                       configurable["checkpoint_id"], channel, value)
+        return checkpoint_tuple._replace(checkpoint={**checkpoint, "channel_values": channel_values})
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self.rehydrate(super().get_tuple(config))
+
+    def list(self, config: Optional[RunnableConfig], **kwargs) -> Iterator[CheckpointTuple]:
+        for checkpoint_tuple in super().list(config, **kwargs):
+            yield self.rehydrate(checkpoint_tuple)
+
+## Migration
+
+def database_bytes(conn: sqlite3.Connection) -> int:
+    return sum(conn.execute(query).fetchone()[0] or 0 for query in (
+        "SELECT SUM(LENGTH(checkpoint)) + SUM(LENGTH(metadata)) FROM checkpoints",
+        "SELECT SUM(LENGTH(value)) FROM writes",
+    ))
+
+def migrate(conn: sqlite3.Connection, saver: Optional[CompressedSqliteSaver] = None, batch_size: int = 500) -> dict:
+    """Rewrite every checkpoint and write of a database in the compressed format, in place.
+
+    Threads are converted in checkpoint order so each checkpoint can be delta-encoded
+    against its parent. Rows already in the compressed format are decoded and re-encoded,
+    so running it twice is safe. Commits every `batch_size` rows.
+    """
+    saver = saver or CompressedSqliteSaver(conn)
+    saver.setup()
+    before = database_bytes(conn)
+    checkpoints = 0
+    with closing(conn.cursor()) as cur:
+        threads = cur.execute("SELECT DISTINCT thread_id, checkpoint_ns FROM checkpoints").fetchall()
+        for thread_id, checkpoint_ns in threads:
+            rows = cur.execute(
+                "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint FROM checkpoints "
+                "WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id",
+                (thread_id, checkpoint_ns),
+            ).fetchall()
+            for checkpoint_id, parent_id, type_, blob in rows:
+                checkpoint = saver.serde.loads_typed((type_, blob))
+                channel_values = {channel: saver.resolve(thread_id, checkpoint_ns, checkpoint_id, channel, value)
+                                  for channel, value in checkpoint["channel_values"].items()}
+                encoded = saver.encode_checkpoint(thread_id, checkpoint_ns,
+                                                  {**checkpoint, "channel_values": channel_values}, parent_id)
+                conn.execute(
+                    "UPDATE checkpoints SET type = ?, checkpoint = ? WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (*saver.serde.dumps_typed(encoded), thread_id, checkpoint_ns, checkpoint_id),
+                )
+                checkpoints += 1
+                if checkpoints % batch_size == 0:
+                    conn.commit()
+        conn.commit()
+
+        writes = 0
+        rows = cur.execute(f"SELECT rowid, type, value FROM writes WHERE type NOT LIKE '{ZSTD_PREFIX}%'").fetchall()
+        for rowid, type_, value in rows:
+            if type_ is None:
+                continue
+            encoded = saver.serde.dumps_typed(saver.serde.loads_typed((type_, value)))
+            if encoded[0] == type_:
+                # Too small to be worth compressing
+                continue
+            conn.execute("UPDATE writes SET type = ?, value = ? WHERE rowid = ?", (*encoded, rowid))
+            writes += 1
+            if writes % batch_size == 0:
+                conn.commit()
+        conn.commit()
+    return {"checkpoints": checkpoints, "writes": writes, "bytes_before": before, "bytes_after": database_bytes(conn)}
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subcommands.add_parser("migrate", help="Convert a SQLite checkpoint database in place")
+    migrate_parser.add_argument("database")
+    migrate_parser.add_argument("--keyframe-interval", type=int, default=50)
+    migrate_parser.add_argument("--level", type=int, default=3, help="zstd compression level")
+    migrate_parser.add_argument("--batch-size", type=int, default=500, help="Rows per transaction")
+    migrate_parser.add_argument("--serde", default="jsonplus", help=SERDE_HELP)
+    args = parser.parse_args(argv)
+
+    with closing(sqlite3.connect(args.database, check_same_thread=False)) as conn:
+        saver = CompressedSqliteSaver(conn, serde=load_serializer(args.serde), keyframe_interval=args.keyframe_interval,
+                                      compression_level=args.level)
+        report = migrate(conn, saver, args.batch_size)
+    print(f"Migrated {report['checkpoints']} checkpoints and {report['writes']} writes: "
+          f"{report['bytes_before']:,} -> {report['bytes_after']:,} bytes "
+          "(run VACUUM to return the space to the filesystem)")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,271 @@
+"""What changed between two checkpoints, without loading the channels that did not.
+
+Every checkpoint records a version per channel, bumped whenever the channel is
+written. `diff_checkpoints` decodes only the structure of the two checkpoints (channel
+values stay as undecoded msgpack), compares the versions, and deserializes just the
+channels whose versions differ. Message lists are compared by message id. When the
+two checkpoints are parent and child, the `writes` rows that produced the child are
+included too, so time-travel views can show which task wrote what.
+
+    step = diff_step(memory, state.config)
+    for channel, change in step.channels.items():
+        print(channel, change.messages or change.after)
+
+Example:
+    python -m checkpoints.diff module-2/state_db/example.db --thread-id 1
+"""
+
+import argparse
+import sqlite3
+import sys
+from contextlib import closing
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Any, Optional
+
+import ormsgpack
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from checkpoints.compression import DELTA_KEY, CompressedSqliteSaver, ZstdSerializer, is_delta
+from checkpoints.serde import SERDE_HELP, load_serializer
+
+@dataclass
+class MessageListDiff:
+    added: list[BaseMessage] = field(default_factory=list)
+    removed: list[BaseMessage] = field(default_factory=list)
+    # (before, after) pairs of messages with the same id and different content
+    modified: list[tuple[BaseMessage, BaseMessage]] = field(default_factory=list)
+
+class RawExt:
+    """A serialized object (message, document, ...) left undecoded.
+
+    Not a dataclass: ormsgpack would serialize one itself instead of calling `pack_raw`.
+    """
+    __slots__ = ("code", "data")
+
+    def __init__(self, code: int, data: bytes):
+        self.code, self.data = code, data
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, RawExt) and self.code == other.code and self.data == other.data
+
+def pack_raw(obj: Any) -> ormsgpack.Ext:
+    if isinstance(obj, RawExt):
+        return ormsgpack.Ext(obj.code, obj.data)
+    raise TypeError(f"Cannot repack {type(obj).__name__}")
+
+def message_id(raw: Any) -> Optional[str]:
+    """Id of an undecoded message, reading only its top-level fields."""
+    if not isinstance(raw, RawExt):
+        return None
+    fields = ormsgpack.unpackb(raw.data, ext_hook=RawExt, option=ormsgpack.OPT_NON_STR_KEYS)
+    if isinstance(fields, list) and len(fields) > 2 and isinstance(fields[2], dict):
+        return fields[2].get("id")
+    return None
+
+class LazyCheckpoint:
+    """A stored checkpoint whose channel values are decoded on request."""
+
+    def __init__(self, saver: SqliteSaver, thread_id: str, checkpoint_ns: str, checkpoint_id: str,
+                 parent_id: Optional[str], type_: str, blob: bytes):
+        self.saver = saver
+        self.key = (thread_id, checkpoint_ns, checkpoint_id)
+        self.parent_id = parent_id
+        serde = saver.serde
+        if isinstance(serde, ZstdSerializer):
+            type_, blob = serde.unwrap((type_, blob))
+            serde = serde.inner
+        self.serde = serde
+        self.lazy = type_ == "msgpack"
+        if self.lazy:
+            self.raw = ormsgpack.unpackb(blob, ext_hook=RawExt, option=ormsgpack.OPT_NON_STR_KEYS)
+        else:
+            # Older formats such as json have no cheap partial decode
+            self.raw = serde.loads_typed((type_, blob))
+
+    @property
+    def versions(self) -> dict[str, Any]:
+        return self.raw.get("channel_versions", {})
+
+    def raw_value(self, channel: str) -> Any:
+        return self.raw.get("channel_values", {}).get(channel)
+
+    def decode(self, raw: Any) -> Any:
+        if not self.lazy or raw is None:
+            return raw
+        return self.serde.loads_typed(("msgpack", ormsgpack.packb(raw, default=pack_raw,
+                                                                  option=ormsgpack.OPT_NON_STR_KEYS)))
+
+    def value(self, channel: str) -> Any:
+        value = self.decode(self.raw_value(channel))
+        if is_delta(value) and isinstance(self.saver, CompressedSqliteSaver):
+            value = self.saver.resolve(*self.key, channel, value)
+        return value
+
+class ChannelDiff:
+    """A channel whose version changed. `before` and `after` are decoded on first access."""
+
+    def __init__(self, channel: str, old: LazyCheckpoint, new: LazyCheckpoint):
+        self.channel = channel
+        self.old, self.new = old, new
+        self.before_version = old.versions.get(channel)
+        self.after_version = new.versions.get(channel)
+        # Set when both sides are message lists
+        self.messages: Optional[MessageListDiff] = None
+
+    @cached_property
+    def before(self) -> Any:
+        return self.old.value(self.channel)
+
+    @cached_property
+    def after(self) -> Any:
+        return self.new.value(self.channel)
+
+@dataclass
+class CheckpointDiff:
+    before_id: str
+    after_id: str
+    channels: dict[str, ChannelDiff] = field(default_factory=dict)
+    # (task_id, channel, value) rows that produced `after` from `before`, when adjacent
+    writes: list[tuple[str, str, Any]] = field(default_factory=list)
+
+def load(saver: SqliteSaver, config: RunnableConfig) -> LazyCheckpoint:
+    thread_id = str(config["configurable"]["thread_id"])
+    checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+    checkpoint_id = config["configurable"]["checkpoint_id"]
+    with saver.cursor(transaction=False) as cur:
+        cur.execute(
+            "SELECT parent_checkpoint_id, type, checkpoint FROM checkpoints "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        )
+        row = cur.fetchone()
+    if row is None:
+        raise LookupError(f"Checkpoint {checkpoint_id} of thread {thread_id} not found")
+    return LazyCheckpoint(saver, thread_id, checkpoint_ns, checkpoint_id, *row)
+
+def diff_messages(before: list[BaseMessage], after: list[BaseMessage]) -> MessageListDiff:
+    """Compare two decoded message lists by id (by position for messages without one)."""
+    def keyed(messages: list[BaseMessage]) -> dict[str, BaseMessage]:
+        return {m.id or f"#{i}": m for i, m in enumerate(messages)}
+
+    old, new = keyed(before), keyed(after)
+    return MessageListDiff(
+        added=[m for key, m in new.items() if key not in old],
+        removed=[m for key, m in old.items() if key not in new],
+        modified=[(old[key], m) for key, m in new.items() if key in old and old[key] != m],
+    )
+
+def diff_raw_messages(change: ChannelDiff) -> Optional[MessageListDiff]:
+    """Message diff decoding only the messages that differ, or None if the values are
+    not undecoded message lists."""
+    old, new = change.old, change.new
+    before, after = old.raw_value(change.channel), new.raw_value(change.channel)
+    if not (old.lazy and new.lazy):
+        return None
+    if is_delta(after) and after[DELTA_KEY] == old.key[2]:
+        # Stored as "the parent's messages plus these"
+        added = new.decode(after["tail"])
+        return MessageListDiff(added=added) if added == [] or is_message_list(added) else None
+    if not (isinstance(before, list) and isinstance(after, list)) \
+            or not all(isinstance(raw, RawExt) for raw in before + after):
+        return None
+    # Serialized messages compare byte for byte, so the shared prefix needs no decoding
+    prefix = 0
+    while prefix < min(len(before), len(after)) and before[prefix] == after[prefix]:
+        prefix += 1
+    old_rest = {message_id(raw): raw for raw in before[prefix:]}
+    new_rest = {message_id(raw): raw for raw in after[prefix:]}
+    if None in old_rest or None in new_rest:
+        return None
+    removed = [old.decode(raw) for key, raw in old_rest.items() if key not in new_rest]
+    added = [new.decode(raw) for key, raw in new_rest.items() if key not in old_rest]
+    modified = [(old.decode(old_rest[key]), new.decode(raw)) for key, raw in new_rest.items()
+                if key in old_rest and old_rest[key] != raw]
+    if not all(isinstance(m, BaseMessage) for m in removed + added + [m for pair in modified for m in pair]):
+        return None
+    return MessageListDiff(added, removed, modified)
+
+def is_message_list(value: Any) -> bool:
+    return isinstance(value, list) and bool(value) and all(isinstance(m, BaseMessage) for m in value)
+
+def diff_checkpoints(saver: SqliteSaver, before: RunnableConfig, after: RunnableConfig) -> CheckpointDiff:
+    """Channels whose versions differ between two checkpoints of the same thread."""
+    old, new = load(saver, before), load(saver, after)
+    diff = CheckpointDiff(old.key[2], new.key[2])
+    for channel in sorted(old.versions.keys() | new.versions.keys()):
+        if old.versions.get(channel) == new.versions.get(channel):
+            continue
+        change = diff.channels[channel] = ChannelDiff(channel, old, new)
+        change.messages = diff_raw_messages(change)
+        if change.messages is None and all(is_message_list(v) or v in (None, []) for v in (change.before, change.after)) \
+                and (change.before or change.after):
+            change.messages = diff_messages(change.before or [], change.after or [])
+
+    if new.parent_id == old.key[2] and old.key[:2] == new.key[:2]:
+        with saver.cursor(transaction=False) as cur:
+            cur.execute(
+                "SELECT task_id, channel, type, value FROM writes "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+                old.key,
+            )
+            rows = cur.fetchall()
+        # Writes to channels not in the diff (e.g. task triggers) are skipped undecoded
+        diff.writes = [(task_id, channel, saver.serde.loads_typed((type_, value)))
+                       for task_id, channel, type_, value in rows if channel in diff.channels]
+    return diff
+
+def diff_step(saver: SqliteSaver, config: RunnableConfig) -> Optional[CheckpointDiff]:
+    """What changed from a checkpoint's parent to the checkpoint; None for the first one."""
+    checkpoint = load(saver, config)
+    if checkpoint.parent_id is None:
+        return None
+    return diff_checkpoints(saver, {"configurable": {**config["configurable"], "checkpoint_id": checkpoint.parent_id}},
+                            config)
+
+def describe(value: Any) -> str:
+    if isinstance(value, BaseMessage):
+        return f"{value.type}: {value.content!r:.80}"
+    return f"{value!r:.100}"
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("database")
+    parser.add_argument("--thread-id", required=True)
+    parser.add_argument("--checkpoint-ns", default="")
+    parser.add_argument("--before", help="Checkpoint id (default: the parent of --after)")
+    parser.add_argument("--after", help="Checkpoint id (default: the latest)")
+    parser.add_argument("--serde", default="jsonplus", help=SERDE_HELP)
+    args = parser.parse_args(argv)
+
+    with closing(sqlite3.connect(args.database, check_same_thread=False)) as conn:
+        saver = CompressedSqliteSaver(conn, serde=load_serializer(args.serde))
+        configurable = {"thread_id": args.thread_id, "checkpoint_ns": args.checkpoint_ns}
+        after = args.after or saver.get_tuple({"configurable": configurable}).config["configurable"]["checkpoint_id"]
+        after_config = {"configurable": {**configurable, "checkpoint_id": after}}
+        if args.before:
+            diff = diff_checkpoints(saver, {"configurable": {**configurable, "checkpoint_id": args.before}}, after_config)
+        else:
+            diff = diff_step(saver, after_config)
+    if diff is None:
+        print("First checkpoint of the thread; nothing to compare")
+        return
+    print(f"{diff.before_id} -> {diff.after_id}")
+    for channel, change in diff.channels.items():
+        print(f"{channel} (version {change.before_version} -> {change.after_version})")
+        if change.messages:
+            for message in change.messages.added:
+                print(f"  + {describe(message)}")
+            for message in change.messages.removed:
+                print(f"  - {describe(message)}")
+            for old, new in change.messages.modified:
+                print(f"  ~ {describe(old)} -> {describe(new)}")
+        else:
+            print(f"  {describe(change.before)} -> {describe(change.after)}")
+    for task_id, channel, value in diff.writes:
+        print(f"write {task_id[:8]} {channel}: {describe(value)}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,310 @@
+"""Stream a SQLite checkpoint database to Parquet or Arrow files for analytics.
+
+Produces two tables:
+
+- `checkpoints`: one row per (thread, step, channel) for each channel written at that
+  step (its version differs from the parent checkpoint's). Values are JSON. For
+  message lists the value holds only the messages appended at that step
+  (`appended` is true), so a long conversation is not repeated at every step.
+- `writes`: one row per pending write (task, channel, value).
+
+The database is opened read-only and never changed. Rows are read in batches in
+rowid order, which needs no index, and decoded in a process pool with a bounded
+number of batches in flight, so memory stays flat however large the database is.
+Each run writes new part files into the output directory and records a watermark
+there; the next run exports only checkpoints created after it. The most
+recent `--lag` seconds are left for the next run, so checkpoints still being written
+are not missed. Writes can be stored long after their checkpoint (a node that runs
+for minutes), so they have a watermark of their own, the last exported rowid.
+
+Examples:
+    python -m checkpoints.export module-2/state_db/example.db exports/
+    python -m checkpoints.export app.db exports/ --workers 8 --format arrow
+    python -m checkpoints.export app.db exports/ --serde myapp.checkpointer:serde
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import closing
+from dataclasses import asdict, is_dataclass
+from datetime import datetime, timezone
+from typing import Any, Iterator, Optional
+
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet as pq
+from langchain_core.messages import BaseMessage
+from pydantic import BaseModel
+
+from checkpoints.compression import ZstdSerializer, is_delta
+from checkpoints.retention import checkpoint_id_at, checkpoint_time, connect_readonly
+from checkpoints.serde import SERDE_HELP, load_serializer
+
+CHECKPOINT_SCHEMA = pa.schema([
+    ("thread_id", pa.string()),
+    ("checkpoint_ns", pa.string()),
+    ("checkpoint_id", pa.string()),
+    ("parent_checkpoint_id", pa.string()),
+    ("step", pa.int64()),
+    ("source", pa.string()),
+    ("created_at", pa.timestamp("us", tz="UTC")),
+    ("channel", pa.string()),
+    ("version", pa.string()),
+    ("appended", pa.bool_()),
+    ("value", pa.string()),
+])
+
+WRITE_SCHEMA = pa.schema([
+    ("thread_id", pa.string()),
+    ("checkpoint_ns", pa.string()),
+    ("checkpoint_id", pa.string()),
+    ("task_id", pa.string()),
+    ("idx", pa.int64()),
+    ("channel", pa.string()),
+    ("value", pa.string()),
+])
+
+WATERMARK_FILE = "_watermark.json"
+
+## Decoding, in the worker processes
+
+serde = ZstdSerializer()
+
+def init_worker(serde_spec: str) -> None:
+    # Serializers with registered classes do not pickle; each worker builds its own
+    global serde
+    serde = ZstdSerializer(load_serializer(serde_spec))
+
+def jsonable(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if is_dataclass(value) and not isinstance(value, type):
+        return asdict(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, bytes):
+        return value.hex()
+    return str(value)
+
+def to_json(value: Any) -> str:
+    return json.dumps(value, default=jsonable, ensure_ascii=False)
+
+def appended_messages(value: Any, parent_value: Any) -> Optional[list]:
+    """Messages added on top of the parent's list, or None if it is not a pure append."""
+    if not (isinstance(value, list) and value and all(isinstance(m, BaseMessage) for m in value)):
+        return None
+    parent_value = parent_value if isinstance(parent_value, list) else []
+    if len(value) < len(parent_value) or any(a.id != b.id for a, b in zip(parent_value, value)):
+        return None
+    return value[len(parent_value):]
+
+def decode_checkpoints(rows: list[tuple], parents: dict[tuple, tuple]) -> dict[str, list]:
+    """Columns of the checkpoints table for a batch of rows.
+
+    `parents` holds the (type, blob) of parents outside the batch, keyed by
+    (thread_id, checkpoint_ns, checkpoint_id).
+    """
+    columns = {name: [] for name in CHECKPOINT_SCHEMA.names}
+    decoded: dict[tuple, dict] = {}
+
+    def load(key: tuple) -> Optional[dict]:
+        if key not in decoded and key in parents:
+            decoded[key] = serde.loads_typed(parents[key])
+        return decoded.get(key)
+
+    for thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, blob, metadata in rows:
+        checkpoint = decoded[(thread_id, checkpoint_ns, checkpoint_id)] = serde.loads_typed((type_, blob))
+        parent = load((thread_id, checkpoint_ns, parent_id)) if parent_id else None
+        parent_versions = parent["channel_versions"] if parent else {}
+        metadata = json.loads(metadata) if metadata else {}
+        for channel, value in checkpoint["channel_values"].items():
+            version = checkpoint["channel_versions"].get(channel)
+            if parent and version == parent_versions.get(channel):
+                continue
+            appended = None
+            if is_delta(value):
+                # Compressed storage already holds just the appended part
+                appended = value["tail"]
+            elif parent is not None:
+                parent_value = parent["channel_values"].get(channel)
+                if not is_delta(parent_value):
+                    appended = appended_messages(value, parent_value)
+            columns["thread_id"].append(thread_id)
+            columns["checkpoint_ns"].append(checkpoint_ns)
+            columns["checkpoint_id"].append(checkpoint_id)
+            columns["parent_checkpoint_id"].append(parent_id)
+            columns["step"].append(metadata.get("step"))
+            columns["source"].append(metadata.get("source"))
+            columns["created_at"].append(datetime.fromtimestamp(checkpoint_time(checkpoint_id), timezone.utc))
+            columns["channel"].append(channel)
+            columns["version"].append(None if version is None else str(version))
+            columns["appended"].append(appended is not None)
+            columns["value"].append(to_json(value if appended is None else appended))
+    return columns
+
+def decode_writes(rows: list[tuple]) -> dict[str, list]:
+    columns = {name: [] for name in WRITE_SCHEMA.names}
+    for thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type_, value in rows:
+        for name, item in zip(WRITE_SCHEMA.names, (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel)):
+            columns[name].append(item)
+        columns["value"].append(to_json(serde.loads_typed((type_, value))) if type_ else None)
+    return columns
+
+## Reading, in the main process
+
+def checkpoint_batches(conn: sqlite3.Connection, since: str, until: str,
+                       batch_size: int) -> Iterator[tuple[list[tuple], dict[tuple, tuple]]]:
+    """Rows with since <= checkpoint_id < until, with the parents they need.
+
+    Scans in rowid order, which needs no index on checkpoint_id; each batch is sorted
+    by id, so parents in the batch come before their children.
+    """
+    cursor = 0
+    while True:
+        rows = conn.execute(
+            "SELECT rowid, thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata "
+            "FROM checkpoints WHERE rowid > ? AND checkpoint_id >= ? AND checkpoint_id < ? ORDER BY rowid LIMIT ?",
+            (cursor, since, until, batch_size),
+        ).fetchall()
+        if not rows:
+            return
+        cursor = rows[-1][0]
+        rows = sorted((row[1:] for row in rows), key=lambda row: row[2])
+        in_batch = {(r[0], r[1], r[2]) for r in rows}
+        parents = {}
+        for thread_id, checkpoint_ns, _, parent_id, *_ in rows:
+            key = (thread_id, checkpoint_ns, parent_id)
+            if parent_id and key not in in_batch and key not in parents:
+                row = conn.execute(
+                    "SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    key,
+                ).fetchone()
+                if row:
+                    parents[key] = tuple(row)
+        yield rows, parents
+
+def write_batches(conn: sqlite3.Connection, since: int, until: int, batch_size: int) -> Iterator[list[tuple]]:
+    """Rows with since < rowid <= until, in rowid (insertion) order."""
+    cursor = since
+    while True:
+        rows = conn.execute(
+            "SELECT rowid, thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value FROM writes "
+            "WHERE rowid > ? AND rowid <= ? ORDER BY rowid LIMIT ?",
+            (cursor, until, batch_size),
+        ).fetchall()
+        if not rows:
+            return
+        yield [row[1:] for row in rows]
+        cursor = rows[-1][0]
+
+class TableWriter:
+    """Append record batches to one Parquet or Arrow IPC file, created on first write."""
+
+    def __init__(self, path: str, schema: pa.Schema, format: str):
+        self.path, self.schema, self.format = path, schema, format
+        self.writer = None
+        self.rows = 0
+
+    def write(self, columns: dict[str, list]) -> None:
+        batch = pa.RecordBatch.from_pydict(columns, schema=self.schema)
+        if not batch.num_rows:
+            return
+        if self.writer is None:
+            self.writer = (pq.ParquetWriter(self.path, self.schema, compression="zstd") if self.format == "parquet"
+                           else pa.ipc.new_file(self.path, self.schema))
+        self.writer.write_batch(batch)
+        self.rows += batch.num_rows
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+def drain(futures: deque, writer: TableWriter, limit: int) -> None:
+    """Write finished batches in order until at most `limit` are in flight."""
+    while len(futures) > limit:
+        writer.write(futures.popleft().result())
+
+def export(
+    database: str,
+    output_dir: str,
+    *,
+    format: str = "parquet",
+    workers: Optional[int] = None,
+    batch_size: int = 1000,
+    lag: float = 5.0,
+    full: bool = False,
+    serde: str = "jsonplus",
+) -> dict:
+    """Export checkpoints and writes created since the last run's watermark.
+
+    `serde` names the serializer the database was written with, as for `--serde`.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    watermark_path = os.path.join(output_dir, WATERMARK_FILE)
+    since, writes_since = "", 0
+    if not full and os.path.exists(watermark_path):
+        with open(watermark_path) as f:
+            watermark = json.load(f)
+        since, writes_since = watermark["checkpoint_id"], watermark.get("writes_rowid", 0)
+    until = checkpoint_id_at(time.time() - lag)
+    workers = workers or os.cpu_count() or 1
+    extension = "parquet" if format == "parquet" else "arrow"
+    part = until.replace("-", "")
+    writers = {
+        "checkpoints": TableWriter(os.path.join(output_dir, f"checkpoints-{part}.{extension}"), CHECKPOINT_SCHEMA, format),
+        "writes": TableWriter(os.path.join(output_dir, f"writes-{part}.{extension}"), WRITE_SCHEMA, format),
+    }
+    start = time.perf_counter()
+    load_serializer(serde)  # fail here, not in every worker
+    with closing(connect_readonly(database)) as conn, \
+            ProcessPoolExecutor(workers, initializer=init_worker, initargs=(serde,)) as pool:
+        # Rowids only grow, and a write is visible only once committed with the rest
+        # of its transaction, so everything up to the current maximum is final
+        writes_until = conn.execute("SELECT coalesce(max(rowid), 0) FROM writes").fetchone()[0]
+        in_flight: deque[Future] = deque()
+        for rows, parents in checkpoint_batches(conn, since, until, batch_size):
+            in_flight.append(pool.submit(decode_checkpoints, rows, parents))
+            drain(in_flight, writers["checkpoints"], 2 * workers)
+        drain(in_flight, writers["checkpoints"], 0)
+        for rows in write_batches(conn, writes_since, writes_until, batch_size):
+            in_flight.append(pool.submit(decode_writes, rows))
+            drain(in_flight, writers["writes"], 2 * workers)
+        drain(in_flight, writers["writes"], 0)
+    for writer in writers.values():
+        writer.close()
+    with open(watermark_path, "w") as f:
+        json.dump({"checkpoint_id": until, "writes_rowid": writes_until, "exported_at": time.time()}, f)
+    return {
+        "since": since or None,
+        "until": until,
+        "writes_since": writes_since,
+        "writes_until": writes_until,
+        "checkpoint_rows": writers["checkpoints"].rows,
+        "write_rows": writers["writes"].rows,
+        "seconds": time.perf_counter() - start,
+        "files": [w.path for w in writers.values() if w.rows],
+    }
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("database")
+    parser.add_argument("output_dir")
+    parser.add_argument("--format", choices=["parquet", "arrow"], default="parquet")
+    parser.add_argument("--workers", type=int, help="Decoding processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Checkpoints per batch")
+    parser.add_argument("--lag", type=float, default=5.0, help="Skip checkpoints newer than this many seconds")
+    parser.add_argument("--full", action="store_true", help="Ignore the watermark and export everything")
+    parser.add_argument("--serde", default="jsonplus", help=SERDE_HELP)
+    args = parser.parse_args(argv)
+    report = export(args.database, args.output_dir, format=args.format, workers=args.workers,
+                    batch_size=args.batch_size, lag=args.lag, full=args.full, serde=args.serde)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,302 @@
+"""Copy-on-write checkpoint storage for forks and what-if runs.
+
+Forking a thread from an earlier checkpoint (`update_state` on a past config, as in
+module 3's time-travel notebook) makes SqliteSaver serialize and store the whole
+state again, though usually only one channel changed. `CopyOnWriteSqliteSaver`
+stores every channel value of at least `min_size` serialized bytes once, in a
+`blobs` table keyed by a hash of its content, and gives each checkpoint references
+to the blobs it uses (`checkpoint_blobs`):
+
+- a channel whose version matches the parent checkpoint's reuses the parent's blob
+  without being serialized again, so a fork only writes the channels it changed;
+- equal values written anywhere else (other forks, other threads) share one blob;
+- decoded blobs are cached by hash, so replaying many forks of one checkpoint
+  decodes the shared channels once.
+
+`fork` and `copy_thread` start what-if threads by copying references, not values:
+
+    memory = CopyOnWriteSqliteSaver(sqlite3.connect("example.db", check_same_thread=False))
+    what_if = memory.fork(to_fork.config, "what-if-1")
+    graph.update_state(what_if, {"messages": [HumanMessage("Multiply 5 and 3")]})
+
+Blobs are deleted once no checkpoint references them by `collect_blobs`, which
+`checkpoints.retention.apply_retention` runs after deleting checkpoints. The other
+`checkpoints` tools read rows directly and only see the inline channels.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+from typing import Any, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from checkpoints.sql import INSERT_CHECKPOINT
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    value BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checkpoint_blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    version TEXT,
+    hash TEXT NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, channel)
+);
+CREATE INDEX IF NOT EXISTS checkpoint_blobs_hash_idx ON checkpoint_blobs (hash);
+"""
+
+def content_hash(type_: str, data: bytes) -> str:
+    return hashlib.blake2b(type_.encode() + b"\0" + data, digest_size=20).hexdigest()
+
+class CopyOnWriteSqliteSaver(SqliteSaver):
+    """SqliteSaver storing large channel values once, by content hash; see the module docstring.
+
+    Args:
+        min_size: Channel values smaller than this (serialized) stay inline in the checkpoint.
+        cache_size: Decoded blobs, and recent checkpoints' references, kept in memory.
+    """
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        *,
+        serde: Optional[SerializerProtocol] = None,
+        min_size: int = 256,
+        cache_size: int = 256,
+    ):
+        super().__init__(conn, serde=serde)
+        # Rehydrating reads blobs while `list` holds the lock
+        self.lock = threading.RLock()
+        self.min_size = min_size
+        self.cache_size = cache_size
+        # hash -> decoded value
+        self._values: OrderedDict[str, Any] = OrderedDict()
+        # (thread_id, checkpoint_ns, checkpoint_id) -> {channel: (version, hash)}
+        self._refs: OrderedDict[tuple[str, str, str], dict[str, tuple[Optional[str], str]]] = OrderedDict()
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        super().setup()
+        self.conn.executescript(SCHEMA)
+
+    ## Caches
+
+    def _remember(self, cache: OrderedDict, key: Any, value: Any) -> None:
+        with self.lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > self.cache_size:
+                cache.popitem(last=False)
+
+    def references(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> dict[str, tuple[Optional[str], str]]:
+        """Blob references of a checkpoint, as {channel: (version, hash)}."""
+        key = (thread_id, checkpoint_ns, checkpoint_id)
+        with self.lock:
+            if key in self._refs:
+                self._refs.move_to_end(key)
+                return self._refs[key]
+        with self.cursor(transaction=False) as cur:
+            cur.execute(
+                "SELECT channel, version, hash FROM checkpoint_blobs WHERE thread_id = ? AND checkpoint_ns = ? "
+                "AND checkpoint_id = ?",
+                key,
+            )
+            refs = {channel: (version, hash_) for channel, version, hash_ in cur.fetchall()}
+        self._remember(self._refs, key, refs)
+        return refs
+
+    ## Writing
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        parent_id = config["configurable"].get("checkpoint_id")
+        parent_refs = self.references(thread_id, checkpoint_ns, parent_id) if parent_id else {}
+
+        inline, refs, new_blobs = {}, {}, []
+        for channel, value in checkpoint["channel_values"].items():
+            version = checkpoint["channel_versions"].get(channel)
+            version = None if version is None else str(version)
+            parent = parent_refs.get(channel)
+            if parent is not None and version is not None and parent[0] == version:
+                # Unchanged since the parent: share its blob
+                refs[channel] = parent
+                continue
+            type_, data = self.serde.dumps_typed(value)
+            if len(data) < self.min_size:
+                inline[channel] = value
+                continue
+            hash_ = content_hash(type_, data)
+            refs[channel] = (version, hash_)
+            new_blobs.append((hash_, type_, data))
+            self._remember(self._values, hash_, value)
+
+        type_, serialized_checkpoint = self.serde.dumps_typed({**checkpoint, "channel_values": inline})
+        serialized_metadata = json.dumps(
+            get_checkpoint_metadata(config, metadata), ensure_ascii=False
+        ).encode("utf-8", "ignore")
+        with self.cursor() as cur:
+            # The references go in first: once written (and the write lock held),
+            # collect_blobs can no longer delete the blobs they point to
+            cur.executemany(
+                "INSERT OR REPLACE INTO checkpoint_blobs (thread_id, checkpoint_ns, checkpoint_id, channel, version, hash) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(thread_id, checkpoint_ns, checkpoint["id"], channel, version, hash_)
+                 for channel, (version, hash_) in refs.items()],
+            )
+            shared = {hash_: channel for channel, (_, hash_) in refs.items() if refs[channel] is parent_refs.get(channel)}
+            if shared:
+                # collect_blobs may have removed them before that, if the parent was deleted
+                cur.execute(f"SELECT hash FROM blobs WHERE hash IN ({', '.join('?' * len(shared))})", tuple(shared))
+                for hash_ in set(shared) - {hash_ for (hash_,) in cur.fetchall()}:
+                    new_blobs.append((hash_, *self.serde.dumps_typed(checkpoint["channel_values"][shared[hash_]])))
+            cur.executemany("INSERT OR IGNORE INTO blobs (hash, type, value) VALUES (?, ?, ?)", new_blobs)
+            cur.execute(INSERT_CHECKPOINT, (thread_id, checkpoint_ns, checkpoint["id"], parent_id, type_,
+                                            serialized_checkpoint, serialized_metadata))
+        self._remember(self._refs, (thread_id, checkpoint_ns, checkpoint["id"]), refs)
+        return {"configurable": {"thread_id": config["configurable"]["thread_id"], "checkpoint_ns": checkpoint_ns,
+                                 "checkpoint_id": checkpoint["id"]}}
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM checkpoint_blobs WHERE thread_id = ?", (str(thread_id),))
+        with self.lock:
+            for key in [key for key in self._refs if key[0] == str(thread_id)]:
+                del self._refs[key]
+
+    def copy_thread(self, source_thread_id: str, target_thread_id: str) -> None:
+        """Copy a thread's checkpoints, writes and blob references to a new thread id."""
+        self._copy(str(source_thread_id), str(target_thread_id), "", ())
+
+    def fork(self, config: RunnableConfig, target_thread_id: str) -> RunnableConfig:
+        """Start `target_thread_id` from one checkpoint of another thread (with its pending
+        writes), sharing its blobs. Returns the config of the new thread's first checkpoint."""
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        self._copy(str(config["configurable"]["thread_id"]), str(target_thread_id),
+                   " AND checkpoint_ns = ? AND checkpoint_id = ?", (checkpoint_ns, checkpoint_id))
+        return {"configurable": {"thread_id": target_thread_id, "checkpoint_ns": checkpoint_ns,
+                                 "checkpoint_id": checkpoint_id}}
+
+    def _copy(self, source: str, target: str, where: str, params: tuple) -> None:
+        # A single copied checkpoint becomes the root of the new thread
+        parent = "parent_checkpoint_id" if not params else "NULL"
+        with self.cursor() as cur:
+            cur.execute(
+                f"INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+                f"type, checkpoint, metadata) SELECT ?, checkpoint_ns, checkpoint_id, {parent}, type, checkpoint, "
+                f"metadata FROM checkpoints WHERE thread_id = ?{where}",
+                (target, source, *params),
+            )
+            cur.execute(
+                f"INSERT OR REPLACE INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, task_path, idx, "
+                f"channel, type, value) SELECT ?, checkpoint_ns, checkpoint_id, task_id, task_path, idx, channel, "
+                f"type, value FROM writes WHERE thread_id = ?{where}",
+                (target, source, *params),
+            )
+            cur.execute(
+                f"INSERT OR REPLACE INTO checkpoint_blobs (thread_id, checkpoint_ns, checkpoint_id, channel, version, "
+                f"hash) SELECT ?, checkpoint_ns, checkpoint_id, channel, version, hash FROM checkpoint_blobs "
+                f"WHERE thread_id = ?{where}",
+                (target, source, *params),
+            )
+
+    ## Reading
+
+    def rehydrate(self, checkpoint_tuple: Optional[CheckpointTuple]) -> Optional[CheckpointTuple]:
+        if checkpoint_tuple is None:
+            return None
+        configurable = checkpoint_tuple.config["configurable"]
+        refs = self.references(str(configurable["thread_id"]), configurable["checkpoint_ns"],
+                               configurable["checkpoint_id"])
+        if not refs:
+            return checkpoint_tuple
+        values = {}
+        with self.lock:
+            for channel, (_, hash_) in refs.items():
+                if hash_ in self._values:
+                    self._values.move_to_end(hash_)
+                    values[channel] = self._values[hash_]
+        missing = {hash_ for channel, (_, hash_) in refs.items() if channel not in values}
+        if missing:
+            with self.cursor(transaction=False) as cur:
+                cur.execute(f"SELECT hash, type, value FROM blobs WHERE hash IN ({', '.join('?' * len(missing))})",
+                            tuple(missing))
+                loaded = {hash_: self.serde.loads_typed((type_, data)) for hash_, type_, data in cur.fetchall()}
+            for hash_, value in loaded.items():
+                self._remember(self._values, hash_, value)
+            for channel, (_, hash_) in refs.items():
+                if channel in values:
+                    continue
+                if hash_ not in loaded:
+                    raise LookupError(f"Blob {hash_} of channel {channel!r} in checkpoint {configurable['checkpoint_id']} "
+                                      f"of thread {configurable['thread_id']} is missing")
+                values[channel] = loaded[hash_]
+        checkpoint = checkpoint_tuple.checkpoint
+        return checkpoint_tuple._replace(
+            checkpoint={**checkpoint, "channel_values": {**checkpoint["channel_values"], **values}}
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self.rehydrate(super().get_tuple(config))
+
+    def list(self, config: Optional[RunnableConfig], **kwargs) -> Iterator[CheckpointTuple]:
+        for checkpoint_tuple in super().list(config, **kwargs):
+            yield self.rehydrate(checkpoint_tuple)
+
+def collect_blobs(saver: SqliteSaver, batch_size: int = 500, pause: float = 0.0) -> tuple[int, int]:
+    """Delete blob references of deleted checkpoints, then blobs nothing references,
+    `batch_size` rows per transaction. Returns (blobs deleted, their payload bytes)."""
+    with saver.cursor(transaction=False) as cur:
+        if not cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'blobs'").fetchone():
+            return 0, 0
+    while True:
+        with saver.cursor() as cur:
+            cur.execute(
+                "DELETE FROM checkpoint_blobs WHERE rowid IN (SELECT r.rowid FROM checkpoint_blobs r WHERE NOT EXISTS ("
+                "SELECT 1 FROM checkpoints c WHERE c.thread_id = r.thread_id AND c.checkpoint_ns = r.checkpoint_ns "
+                "AND c.checkpoint_id = r.checkpoint_id) LIMIT ?)",
+                (batch_size,),
+            )
+            if cur.rowcount < batch_size:
+                break
+        time.sleep(pause)
+
+    deleted = payload = 0
+    while True:
+        with saver.cursor() as cur:
+            # One statement, so a reference written by a concurrent put is either
+            # seen here or written after the blob is gone (and put stores it again)
+            cur.execute(
+                "DELETE FROM blobs WHERE rowid IN (SELECT b.rowid FROM blobs b WHERE NOT EXISTS ("
+                "SELECT 1 FROM checkpoint_blobs r WHERE r.hash = b.hash) LIMIT ?) RETURNING LENGTH(value)",
+                (batch_size,),
+            )
+            sizes = [size for (size,) in cur.fetchall()]
+        deleted += len(sizes)
+        payload += sum(sizes)
+        if len(sizes) < batch_size:
+            return deleted, payload
+        time.sleep(pause)
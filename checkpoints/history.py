@@ -0,0 +1,248 @@
+"""Indexed, keyset-paginated checkpoint history for time travel.
+
+`SqliteSaver` only has the primary key on `checkpoints`, so metadata filters and
+"which checkpoints forked from this one" scan the whole thread, and `list` loads the
+pending writes of every checkpoint it returns. `ensure_indexes` adds secondary
+indexes, and `history_page` returns one page of a thread's history from the index
+alone: each page seeks to its cursor (`before`/`after` a checkpoint id), so the
+1000th page of a 100k-step thread costs the same as the first.
+
+    ensure_indexes(memory.conn)
+    page = history_page(memory, {"configurable": {"thread_id": "1"}}, limit=20)
+    older = history_page(memory, config, before=page.before, limit=20)
+
+Examples:
+    python -m checkpoints.history index module-2/state_db/example.db
+    python -m checkpoints.history list module-2/state_db/example.db --thread-id 1 --limit 5
+"""
+
+import argparse
+import json
+import re
+import sqlite3
+import sys
+from contextlib import closing
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import CheckpointTuple
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from checkpoints.compression import CompressedSqliteSaver
+from checkpoints.retention import checkpoint_time, connect_readonly
+from checkpoints.serde import SERDE_HELP, load_serializer
+
+# Metadata keys indexed by default; filters on other keys still work, without an index
+INDEXED_METADATA = ("source", "step")
+# Keys are pasted into the SQL, so only plain JSON property names are allowed
+METADATA_KEY = re.compile(r"[a-zA-Z0-9_.-]+")
+
+@dataclass
+class HistoryEntry:
+    thread_id: str
+    checkpoint_ns: str
+    checkpoint_id: str
+    parent_checkpoint_id: Optional[str]
+    metadata: dict
+    # Only loaded with `include_state`
+    state: Optional[CheckpointTuple] = None
+
+    @property
+    def created_at(self) -> float:
+        return checkpoint_time(self.checkpoint_id)
+
+    @property
+    def config(self) -> RunnableConfig:
+        return {"configurable": {"thread_id": self.thread_id, "checkpoint_ns": self.checkpoint_ns,
+                                 "checkpoint_id": self.checkpoint_id}}
+
+@dataclass
+class HistoryPage:
+    # Newest first, like `get_state_history`
+    entries: list[HistoryEntry] = field(default_factory=list)
+    # Cursor for the next (older) page, None on the last page
+    before: Optional[str] = None
+    # Cursor for the previous (newer) page, None on the first page
+    after: Optional[str] = None
+
+def metadata_expression(key: str) -> str:
+    """The expression SqliteSaver filters metadata on, so its `list(filter=...)` and
+    `history_page` use the same indexes."""
+    if not METADATA_KEY.fullmatch(key):
+        raise ValueError(f"Invalid metadata key {key!r}: use letters, digits, '_', '.' and '-'")
+    return f"json_extract(CAST(metadata AS TEXT), '$.{key}')"
+
+def metadata_predicate(filter: dict[str, Any]) -> tuple[list[str], list[Any]]:
+    """WHERE predicates and parameters matching metadata values, as `SqliteSaver.list` does."""
+    predicates, params = [], []
+    for key, value in filter.items():
+        if value is None:
+            predicates.append(f"{metadata_expression(key)} IS ?")
+        else:
+            predicates.append(f"{metadata_expression(key)} = ?")
+            if isinstance(value, (dict, list)):
+                # json_extract returns JSON without whitespace after separators
+                value = json.dumps(value, separators=(",", ":"))
+            elif not isinstance(value, (str, int, float)):
+                value = str(value)
+        params.append(value)
+    return predicates, params
+
+def ensure_indexes(conn: sqlite3.Connection, metadata_keys: tuple[str, ...] = INDEXED_METADATA) -> None:
+    """Create the secondary indexes if they are missing. Safe to call on every start."""
+    statements = [
+        # Children of a checkpoint, i.e. forks made with update_state
+        "CREATE INDEX IF NOT EXISTS checkpoints_parent_idx ON checkpoints (thread_id, checkpoint_ns, parent_checkpoint_id)",
+        # All threads in creation order, for incremental exports
+        "CREATE INDEX IF NOT EXISTS checkpoints_id_idx ON checkpoints (checkpoint_id)",
+        "CREATE INDEX IF NOT EXISTS writes_id_idx ON writes (checkpoint_id, thread_id, checkpoint_ns, task_id, idx)",
+        # Interrupted checkpoints across threads
+        "CREATE INDEX IF NOT EXISTS writes_channel_idx ON writes (channel, thread_id, checkpoint_ns, checkpoint_id)",
+    ]
+    for key in metadata_keys:
+        statements.append(
+            f"CREATE INDEX IF NOT EXISTS checkpoints_metadata_{key.replace('.', '_').replace('-', '_')}_idx "
+            f"ON checkpoints (thread_id, checkpoint_ns, {metadata_expression(key)}, checkpoint_id)"
+        )
+    with closing(conn.cursor()) as cur:
+        for statement in statements:
+            cur.execute(statement)
+    conn.commit()
+
+def history_page(
+    saver: SqliteSaver,
+    config: RunnableConfig,
+    *,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = 20,
+    filter: Optional[dict[str, Any]] = None,
+    include_state: bool = False,
+) -> HistoryPage:
+    """One page of a thread's checkpoints, newest first.
+
+    Args:
+        config: Selects the thread (and `checkpoint_ns`, default the root graph).
+        before: Return checkpoints older than this checkpoint id.
+        after: Return checkpoints newer than this checkpoint id (the page just above it).
+        filter: Metadata values to match, as in `SqliteSaver.list`.
+        include_state: Also load each checkpoint with its pending writes.
+    """
+    if before and after:
+        raise ValueError("Pass either before or after, not both")
+    thread_id = str(config["configurable"]["thread_id"])
+    checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+    predicates, params = metadata_predicate(filter or {})
+    where = " AND ".join(["thread_id = ?", "checkpoint_ns = ?", *predicates])
+    params = [thread_id, checkpoint_ns, *params]
+
+    newest_first = after is None
+    cursor_clause = ""
+    if before or after:
+        cursor_clause = " AND checkpoint_id < ?" if before else " AND checkpoint_id > ?"
+        params.append(before or after)
+    with saver.cursor(transaction=False) as cur:
+        cur.execute(
+            f"SELECT checkpoint_id, parent_checkpoint_id, metadata FROM checkpoints WHERE {where}{cursor_clause} "
+            f"ORDER BY checkpoint_id {'DESC' if newest_first else 'ASC'} LIMIT ?",
+            (*params, limit + 1),
+        )
+        rows = cur.fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit] if newest_first else rows[:limit][::-1]
+
+        page = HistoryPage([HistoryEntry(thread_id, checkpoint_ns, checkpoint_id, parent_id,
+                                         json.loads(metadata) if metadata else {})
+                            for checkpoint_id, parent_id, metadata in rows])
+        if not page.entries:
+            return page
+        # Whether a page exists on the other side of this one
+        newest, oldest = page.entries[0].checkpoint_id, page.entries[-1].checkpoint_id
+        if newest_first:
+            page.before = oldest if more else None
+            if before:
+                cur.execute(f"SELECT 1 FROM checkpoints WHERE {where} AND checkpoint_id > ? LIMIT 1",
+                            (*params[:-1], newest))
+                page.after = newest if cur.fetchone() else None
+        else:
+            page.after = newest if more else None
+            cur.execute(f"SELECT 1 FROM checkpoints WHERE {where} AND checkpoint_id < ? LIMIT 1",
+                        (*params[:-1], oldest))
+            page.before = oldest if cur.fetchone() else None
+
+    if include_state:
+        for entry in page.entries:
+            entry.state = saver.get_tuple(entry.config)
+    return page
+
+def parent_chain(saver: SqliteSaver, config: RunnableConfig, limit: int = 100) -> list[str]:
+    """Ids of a checkpoint's ancestors, nearest first, following `parent_checkpoint_id`
+    (which differs from id order after a fork)."""
+    thread_id = str(config["configurable"]["thread_id"])
+    checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+    with saver.cursor(transaction=False) as cur:
+        cur.execute(
+            """
+            WITH RECURSIVE chain(checkpoint_id, depth) AS (
+                SELECT parent_checkpoint_id, 1 FROM checkpoints
+                WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?
+                UNION ALL
+                SELECT c.parent_checkpoint_id, chain.depth + 1 FROM checkpoints c JOIN chain
+                ON c.thread_id = ? AND c.checkpoint_ns = ? AND c.checkpoint_id = chain.checkpoint_id
+                WHERE chain.depth < ?
+            )
+            SELECT checkpoint_id FROM chain WHERE checkpoint_id IS NOT NULL ORDER BY depth
+            """,
+            (thread_id, checkpoint_ns, config["configurable"]["checkpoint_id"], thread_id, checkpoint_ns, limit),
+        )
+        return [checkpoint_id for (checkpoint_id,) in cur.fetchall()]
+
+def children(saver: SqliteSaver, config: RunnableConfig) -> list[str]:
+    """Ids of the checkpoints created from this one; more than one means a fork."""
+    with saver.cursor(transaction=False) as cur:
+        cur.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "AND parent_checkpoint_id = ? ORDER BY checkpoint_id",
+            (str(config["configurable"]["thread_id"]), config["configurable"].get("checkpoint_ns", ""),
+             config["configurable"]["checkpoint_id"]),
+        )
+        return [checkpoint_id for (checkpoint_id,) in cur.fetchall()]
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    index_parser = subcommands.add_parser("index", help="Create the secondary indexes")
+    index_parser.add_argument("database")
+    list_parser = subcommands.add_parser("list", help="Print one page of a thread's history as JSON")
+    list_parser.add_argument("database")
+    list_parser.add_argument("--thread-id", required=True)
+    list_parser.add_argument("--checkpoint-ns", default="")
+    list_parser.add_argument("--before")
+    list_parser.add_argument("--after")
+    list_parser.add_argument("--limit", type=int, default=20)
+    list_parser.add_argument("--filter", type=json.loads, help='Metadata filter as JSON, e.g. \'{"source": "update"}\'')
+    list_parser.add_argument("--serde", default="jsonplus", help=SERDE_HELP)
+    args = parser.parse_args(argv)
+
+    if args.command == "index":
+        with closing(sqlite3.connect(args.database, check_same_thread=False)) as conn:
+            CompressedSqliteSaver(conn).setup()
+            ensure_indexes(conn)
+        return
+
+    # Listing never writes: the queries use the indexes if `index` has created them
+    # and scan the thread otherwise
+    with closing(connect_readonly(args.database)) as conn:
+        saver = CompressedSqliteSaver(conn, serde=load_serializer(args.serde))
+        config = {"configurable": {"thread_id": args.thread_id, "checkpoint_ns": args.checkpoint_ns}}
+        page = history_page(saver, config, before=args.before, after=args.after, limit=args.limit, filter=args.filter)
+    print(json.dumps({
+        "entries": [{"checkpoint_id": e.checkpoint_id, "parent_checkpoint_id": e.parent_checkpoint_id,
+                     "created_at": e.created_at, "metadata": e.metadata} for e in page.entries],
+        "before": page.before,
+        "after": page.after,
+    }, indent=2, default=str))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,179 @@
+"""Resume many interrupted threads at once.
+
+Approving paused threads one by one costs a client round trip and several checkpoint
+reads per thread (`get_state`, `update_state`, then `invoke` reads it again).
+`bulk_resume` loads the latest checkpoint of a whole batch of threads with two
+queries, serves every per-thread read from a `CachedSaver` warmed with them, and
+runs the resumed threads on a bounded thread pool:
+
+    report = bulk_resume(
+        graph,
+        {"thread-1": {"human_analyst_feedback": "approve"},
+         "thread-2": {"human_analyst_feedback": "Add a startup founder"}},
+        as_node="human_feedback",
+        max_concurrency=16,
+        on_progress=lambda done, total, result: print(f"{done}/{total} {result.status}"),
+    )
+    report.counts  # Counter({"completed": 1, "interrupted": 1}), thread-2 has new analysts
+
+The update for each thread is a state update applied with `update_state` (as
+`as_node`), a `Command` passed as the input (e.g. `Command(resume=...)` for threads
+paused by `interrupt()`), or None to resume as is. Threads that have no checkpoint or
+are not paused are skipped. The graph's checkpointer must be a SqliteSaver, or a
+CachedSaver over one, opened with `check_same_thread=False`.
+"""
+
+import json
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable, Iterable, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import groupby
+from typing import Any, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import CheckpointTuple
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.types import Command
+
+from checkpoints.cache import CachedSaver
+from checkpoints.retention import chunks
+
+@dataclass
+class ResumeResult:
+    thread_id: str
+    # "completed", "interrupted" (paused again), "failed" or "skipped"
+    status: str
+    # Nodes the thread is paused before, if it was interrupted again
+    next: tuple[str, ...] = ()
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+@dataclass
+class ResumeReport:
+    results: list[ResumeResult] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def counts(self) -> Counter:
+        return Counter(result.status for result in self.results)
+
+def load_latest(saver: SqliteSaver, thread_ids: Iterable[str], checkpoint_ns: str = "",
+                batch_size: int = 500) -> dict[str, CheckpointTuple]:
+    """Latest checkpoint of each thread, with its pending writes, in two queries per batch."""
+    latest = {}
+    for batch in chunks([str(thread_id) for thread_id in thread_ids], batch_size):
+        placeholders = ", ".join("?" * len(batch))
+        with saver.cursor(transaction=False) as cur:
+            cur.execute(
+                f"SELECT thread_id, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata FROM checkpoints c "
+                f"WHERE checkpoint_ns = ? AND thread_id IN ({placeholders}) AND checkpoint_id = ("
+                f"SELECT max(checkpoint_id) FROM checkpoints WHERE thread_id = c.thread_id AND checkpoint_ns = ?)",
+                (checkpoint_ns, *batch, checkpoint_ns),
+            )
+            rows = cur.fetchall()
+            if not rows:
+                continue
+            cur.execute(
+                f"SELECT thread_id, task_id, channel, type, value FROM writes "
+                f"WHERE checkpoint_ns = ? AND (thread_id, checkpoint_id) IN (VALUES {', '.join(['(?, ?)'] * len(rows))}) "
+                # The order a super-step's writes were applied in, as SqliteSaver returns them
+                f"ORDER BY thread_id, task_path, task_id, idx",
+                (checkpoint_ns, *[value for row in rows for value in row[:2]]),
+            )
+            writes = {thread_id: [write[1:] for write in group]
+                      for thread_id, group in groupby(cur.fetchall(), key=lambda write: write[0])}
+
+        for thread_id, checkpoint_id, parent_id, type_, checkpoint, metadata in rows:
+            config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                       "checkpoint_id": checkpoint_id}}
+            parent_config = None
+            if parent_id:
+                parent_config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                                  "checkpoint_id": parent_id}}
+            checkpoint_tuple = CheckpointTuple(
+                config,
+                saver.serde.loads_typed((type_, checkpoint)),
+                json.loads(metadata) if metadata is not None else {},
+                parent_config,
+                [(task_id, channel, saver.serde.loads_typed((write_type, value)))
+                 for task_id, channel, write_type, value in writes.get(thread_id, [])],
+            )
+            # CompressedSqliteSaver stores some channels as deltas
+            if hasattr(saver, "rehydrate"):
+                checkpoint_tuple = saver.rehydrate(checkpoint_tuple)
+            latest[thread_id] = checkpoint_tuple
+    return latest
+
+def bulk_resume(
+    graph: Any,
+    updates: Mapping[str, Any],
+    *,
+    as_node: Optional[str] = None,
+    max_concurrency: int = 8,
+    batch_size: int = 500,
+    config: Optional[RunnableConfig] = None,
+    on_progress: Optional[Callable[[int, int, ResumeResult], None]] = None,
+) -> ResumeReport:
+    """Resume paused threads with bounded concurrency; see the module docstring.
+
+    Args:
+        graph: The compiled graph the threads belong to.
+        updates: Thread id -> state update, `Command` or None.
+        as_node: Node to apply state updates as, e.g. the node interrupted before.
+        max_concurrency: Threads resumed at the same time.
+        batch_size: Threads whose checkpoints are loaded (and cached) together.
+        config: Extra config for every run, e.g. `recursion_limit`.
+        on_progress: Called with (done, total, result) after each thread.
+    """
+    updates = {str(thread_id): update for thread_id, update in updates.items()}
+    checkpointer = graph.checkpointer
+    if not isinstance(checkpointer, CachedSaver):
+        # Big enough for a batch of typical threads; evicted ones are just read again
+        checkpointer = CachedSaver(checkpointer, max_bytes=512 * 2**20)
+        graph = graph.copy(update={"checkpointer": checkpointer})
+    if not isinstance(checkpointer.inner, SqliteSaver):
+        raise TypeError(f"bulk_resume needs a SqliteSaver checkpointer, got {type(checkpointer.inner).__name__}")
+
+    start = time.perf_counter()
+    report = ResumeReport()
+    progress_lock = threading.Lock()
+
+    def resume(thread_id: str, found: bool) -> ResumeResult:
+        began = time.perf_counter()
+        run_config = {**(config or {}), "configurable": {**(config or {}).get("configurable", {}),
+                                                         "thread_id": thread_id}}
+        if not found:
+            result = ResumeResult(thread_id, "skipped", error="no checkpoint")
+        elif not graph.get_state(run_config).next:
+            result = ResumeResult(thread_id, "skipped", error="not paused")
+        else:
+            update = updates[thread_id]
+            try:
+                if isinstance(update, Command):
+                    graph.invoke(update, run_config)
+                else:
+                    if update:
+                        graph.update_state(run_config, update, as_node=as_node)
+                    graph.invoke(None, run_config)
+                state = graph.get_state(run_config)
+                result = ResumeResult(thread_id, "interrupted" if state.next else "completed", next=state.next)
+            except Exception as e:
+                result = ResumeResult(thread_id, "failed", error=f"{type(e).__name__}: {e}")
+        result.seconds = time.perf_counter() - began
+        with progress_lock:
+            report.results.append(result)
+            if on_progress is not None:
+                on_progress(len(report.results), len(updates), result)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="resume") as pool:
+        for batch in chunks(list(updates), batch_size):
+            latest = load_latest(checkpointer.inner, batch, batch_size=batch_size)
+            checkpointer.warm(latest.values())
+            # Finish the batch before loading the next, so the cache holds one batch at a time
+            list(pool.map(resume, batch, [thread_id in latest for thread_id in batch]))
+    report.seconds = time.perf_counter() - start
+    return report
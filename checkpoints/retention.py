@@ -0,0 +1,313 @@
+"""Retention and compaction for SQLite checkpoint databases.
+
+SqliteSaver keeps every checkpoint and every pending write forever. `apply_retention`
+deletes what a `RetentionPolicy` no longer needs, a few hundred rows per transaction
+so a running graph sharing the database is never blocked for long, then returns the
+free pages to the filesystem with an incremental VACUUM.
+
+A checkpoint is deleted when it is older than `max_age_days` or not among the
+`keep_last` newest of its thread, unless it is:
+
+- the newest checkpoint of its thread,
+- interrupted (has an `__interrupt__` write), with `keep_interrupts`,
+- a fork point (parent of several checkpoints, e.g. after `update_state` on an old
+  checkpoint) or the tip of a forked branch, with `keep_forks`.
+
+Threads whose newest checkpoint is older than `max_thread_idle_days` are deleted
+outright. Surviving checkpoints are re-linked to their nearest surviving ancestor, so
+`parent_config` still walks the history. Channel values stored by
+`checkpoints.forks.CopyOnWriteSqliteSaver` are deleted once no checkpoint uses them.
+
+Examples:
+    python -m checkpoints.retention module-2/state_db/example.db --keep-last 5 --dry-run
+    python -m checkpoints.retention app.db --max-age-days 30 --max-thread-idle-days 90 --enable-incremental-vacuum
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+import uuid
+from collections import Counter
+from contextlib import closing
+from dataclasses import asdict, dataclass, field
+from itertools import groupby
+from typing import Iterator, Optional
+from urllib.request import pathname2url
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from checkpoints.compression import CompressedSqliteSaver
+from checkpoints.forks import collect_blobs
+from checkpoints.serde import SERDE_HELP, load_serializer
+
+# Offset between the UUID epoch (1582-10-15) and the Unix epoch, in 100 ns intervals
+UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+INTERRUPT = "__interrupt__"
+
+@dataclass
+class RetentionPolicy:
+    """What to keep. `None` disables a limit."""
+    keep_last: Optional[int] = None
+    max_age_days: Optional[float] = None
+    max_thread_idle_days: Optional[float] = None
+    keep_interrupts: bool = True
+    keep_forks: bool = True
+    # Pending writes of a checkpoint that already has a child were applied to that child
+    drop_completed_writes: bool = True
+
+@dataclass
+class RetentionPlan:
+    # (thread_id, checkpoint_ns) -> checkpoint ids to delete
+    checkpoints: dict[tuple[str, str], list[str]] = field(default_factory=dict)
+    # (thread_id, checkpoint_ns, checkpoint_id) -> surviving ancestor, or None
+    relink: dict[tuple[str, str, str], Optional[str]] = field(default_factory=dict)
+    # (thread_id, checkpoint_ns) -> surviving checkpoint ids whose writes can go
+    completed_writes: dict[tuple[str, str], list[str]] = field(default_factory=dict)
+    idle_threads: list[str] = field(default_factory=list)
+
+@dataclass
+class RetentionReport:
+    checkpoints_deleted: int = 0
+    writes_deleted: int = 0
+    threads_deleted: int = 0
+    keyframes_rewritten: int = 0
+    blobs_deleted: int = 0
+    payload_bytes_deleted: int = 0
+    file_bytes_before: int = 0
+    file_bytes_after: int = 0
+    free_bytes_after: int = 0
+
+def checkpoint_time(checkpoint_id: str) -> float:
+    """Unix time at which a checkpoint was created, read from its UUIDv6 id."""
+    value = uuid.UUID(checkpoint_id).int
+    ticks = ((value >> 80) << 12) | ((value >> 64) & 0xFFF)
+    return (ticks - UUID_EPOCH_OFFSET) / 1e7
+
+def checkpoint_id_at(timestamp: float) -> str:
+    """Smallest checkpoint id created at `timestamp`; ids compare as strings in time order."""
+    ticks = int(timestamp * 1e7) + UUID_EPOCH_OFFSET
+    return str(uuid.UUID(int=((ticks >> 12) << 80) | (6 << 76) | ((ticks & 0xFFF) << 64)))
+
+def chunks(items: list, size: int) -> Iterator[list]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def file_bytes(conn: sqlite3.Connection) -> tuple[int, int]:
+    """Database size and the part of it on the free list, in bytes."""
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return (conn.execute("PRAGMA page_count").fetchone()[0] * page_size,
+            conn.execute("PRAGMA freelist_count").fetchone()[0] * page_size)
+
+## Planning
+
+def plan_thread(ids: list[str], parents: dict[str, Optional[str]], interrupted: set[str],
+                policy: RetentionPolicy, cutoff: Optional[float]) -> tuple[list[str], list[str]]:
+    """Checkpoint ids of one thread to delete, and surviving ids with completed writes.
+
+    `ids` must be in creation order.
+    """
+    children = Counter(parents.values())
+    doomed = []
+    for index, checkpoint_id in enumerate(ids[:-1]):
+        expired = cutoff is not None and checkpoint_time(checkpoint_id) < cutoff
+        surplus = policy.keep_last is not None and index < len(ids) - policy.keep_last
+        if not (expired or surplus):
+            continue
+        if policy.keep_interrupts and checkpoint_id in interrupted:
+            continue
+        if policy.keep_forks and children[checkpoint_id] != 1:
+            continue
+        doomed.append(checkpoint_id)
+    dropped = set(doomed)
+    completed = [i for i in ids if i not in dropped and children[i]] if policy.drop_completed_writes else []
+    return doomed, completed
+
+def connect_readonly(database: str) -> sqlite3.Connection:
+    """Open a database so that nothing, not even a schema migration, can write to it."""
+    return sqlite3.connect(f"file:{pathname2url(os.path.abspath(database))}?mode=ro", uri=True,
+                           check_same_thread=False)
+
+def plan_retention(conn: sqlite3.Connection, policy: RetentionPolicy, now: Optional[float] = None) -> RetentionPlan:
+    """Work out what `policy` deletes, reading ids only (no checkpoint blobs)."""
+    now = time.time() if now is None else now
+    cutoff = now - policy.max_age_days * 86400 if policy.max_age_days is not None else None
+    plan = RetentionPlan()
+    if policy.max_thread_idle_days is not None:
+        idle_cutoff = now - policy.max_thread_idle_days * 86400
+        plan.idle_threads = [thread_id for thread_id, latest in conn.execute(
+            "SELECT thread_id, MAX(checkpoint_id) FROM checkpoints GROUP BY thread_id"
+        ) if checkpoint_time(latest) < idle_cutoff]
+    idle = set(plan.idle_threads)
+    interrupted: dict[tuple[str, str], set[str]] = {}
+    for thread_id, checkpoint_ns, checkpoint_id in conn.execute(
+        "SELECT DISTINCT thread_id, checkpoint_ns, checkpoint_id FROM writes WHERE channel = ?", (INTERRUPT,)
+    ):
+        interrupted.setdefault((thread_id, checkpoint_ns), set()).add(checkpoint_id)
+
+    rows = conn.execute(
+        "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id FROM checkpoints "
+        "ORDER BY thread_id, checkpoint_ns, checkpoint_id"
+    )
+    for key, group in groupby(rows, key=lambda row: (row[0], row[1])):
+        if key[0] in idle:
+            continue
+        parents = {checkpoint_id: parent_id for _, _, checkpoint_id, parent_id in group}
+        doomed, completed = plan_thread(list(parents), parents, interrupted.get(key, set()), policy, cutoff)
+        if completed:
+            plan.completed_writes[key] = completed
+        if not doomed:
+            continue
+        plan.checkpoints[key] = doomed
+        dropped = set(doomed)
+        for checkpoint_id, parent_id in parents.items():
+            if checkpoint_id in dropped or parent_id not in dropped:
+                continue
+            while parent_id in dropped:
+                parent_id = parents.get(parent_id)
+            plan.relink[(*key, checkpoint_id)] = parent_id
+    return plan
+
+## Applying
+
+def delete_rows(saver: SqliteSaver, table: str, where: str, params: tuple, report: RetentionReport) -> int:
+    """Delete matching rows in one transaction and add their payload size to the report."""
+    size = "LENGTH(checkpoint) + LENGTH(metadata)" if table == "checkpoints" else "LENGTH(value)"
+    with saver.cursor() as cur:
+        cur.execute(f"SELECT COUNT(*), SUM({size}) FROM {table} WHERE {where}", params)
+        count, payload = cur.fetchone()
+        cur.execute(f"DELETE FROM {table} WHERE {where}", params)
+    report.payload_bytes_deleted += payload or 0
+    return count
+
+def vacuum(saver: SqliteSaver, enable_incremental: bool, pages_per_step: int, pause: float) -> None:
+    """Return free pages to the filesystem, a few at a time.
+
+    Needs `auto_vacuum = INCREMENTAL`. Switching an existing database to it takes one
+    full VACUUM, which is only done when `enable_incremental` is set.
+    """
+    with saver.cursor(transaction=False) as cur:
+        mode = cur.execute("PRAGMA auto_vacuum").fetchone()[0]
+    if mode != 2:
+        if not enable_incremental:
+            return
+        with saver.cursor(transaction=False) as cur:
+            cur.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            cur.execute("VACUUM")
+        return
+    while True:
+        with saver.cursor() as cur:
+            if not cur.execute("PRAGMA freelist_count").fetchone()[0]:
+                return
+            cur.execute(f"PRAGMA incremental_vacuum({pages_per_step})").fetchall()
+        time.sleep(pause)
+
+def apply_retention(
+    saver: SqliteSaver,
+    policy: RetentionPolicy,
+    *,
+    batch_size: int = 500,
+    pause: float = 0.0,
+    enable_incremental_vacuum: bool = False,
+    vacuum_pages_per_step: int = 1000,
+    now: Optional[float] = None,
+) -> RetentionReport:
+    """Delete what `policy` does not keep, `batch_size` rows per transaction, sleeping
+    `pause` seconds between transactions so other writers get the lock.
+
+    Pass the saver the running graph uses so both share its lock.
+    """
+    report = RetentionReport()
+    report.file_bytes_before = file_bytes(saver.conn)[0]
+    with saver.cursor(transaction=False) as cur:
+        plan = plan_retention(cur.connection, policy, now)
+
+    for thread_id in plan.idle_threads:
+        for table in ("writes", "checkpoints"):
+            while count := delete_rows(
+                saver, table, f"rowid IN (SELECT rowid FROM {table} WHERE thread_id = ? LIMIT ?)",
+                (thread_id, batch_size), report,
+            ):
+                if table == "checkpoints":
+                    report.checkpoints_deleted += count
+                else:
+                    report.writes_deleted += count
+                time.sleep(pause)
+        report.threads_deleted += 1
+
+    # Survivors stored as deltas against a checkpoint about to go become keyframes first
+    for (thread_id, checkpoint_ns, checkpoint_id), parent_id in plan.relink.items():
+        if isinstance(saver, CompressedSqliteSaver):
+            report.keyframes_rewritten += saver.store_keyframe(thread_id, checkpoint_ns, checkpoint_id)
+        with saver.cursor() as cur:
+            cur.execute(
+                "UPDATE checkpoints SET parent_checkpoint_id = ? WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (parent_id, thread_id, checkpoint_ns, checkpoint_id),
+            )
+
+    for (thread_id, checkpoint_ns), doomed in plan.checkpoints.items():
+        for batch in chunks(doomed, batch_size):
+            where = f"thread_id = ? AND checkpoint_ns = ? AND checkpoint_id IN ({','.join('?' * len(batch))})"
+            params = (thread_id, checkpoint_ns, *batch)
+            report.writes_deleted += delete_rows(saver, "writes", where, params, report)
+            report.checkpoints_deleted += delete_rows(saver, "checkpoints", where, params, report)
+            time.sleep(pause)
+
+    for (thread_id, checkpoint_ns), completed in plan.completed_writes.items():
+        for batch in chunks(completed, batch_size):
+            where = f"thread_id = ? AND checkpoint_ns = ? AND checkpoint_id IN ({','.join('?' * len(batch))})"
+            params = (thread_id, checkpoint_ns, *batch)
+            if policy.keep_interrupts:
+                where, params = f"{where} AND channel != ?", (*params, INTERRUPT)
+            report.writes_deleted += delete_rows(saver, "writes", where, params, report)
+            time.sleep(pause)
+
+    blobs, payload = collect_blobs(saver, batch_size, pause)
+    report.blobs_deleted += blobs
+    report.payload_bytes_deleted += payload
+
+    vacuum(saver, enable_incremental_vacuum, vacuum_pages_per_step, pause)
+    report.file_bytes_after, report.free_bytes_after = file_bytes(saver.conn)
+    return report
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("database")
+    parser.add_argument("--keep-last", type=int, help="Checkpoints to keep per thread and namespace")
+    parser.add_argument("--max-age-days", type=float)
+    parser.add_argument("--max-thread-idle-days", type=float, help="Delete threads idle for longer")
+    parser.add_argument("--keep-interrupts", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--keep-forks", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--drop-completed-writes", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--batch-size", type=int, default=500, help="Rows per transaction")
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between transactions")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="Switch the database to auto_vacuum=INCREMENTAL (one full VACUUM)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be deleted")
+    parser.add_argument("--serde", default="jsonplus", help=SERDE_HELP)
+    args = parser.parse_args(argv)
+
+    policy = RetentionPolicy(args.keep_last, args.max_age_days, args.max_thread_idle_days,
+                             args.keep_interrupts, args.keep_forks, args.drop_completed_writes)
+    if args.dry_run:
+        # Read-only: a dry run must not migrate the schema (setup) or write anything
+        with closing(connect_readonly(args.database)) as conn:
+            plan = plan_retention(conn, policy)
+        result = {
+            "checkpoints": sum(len(ids) for ids in plan.checkpoints.values()),
+            "checkpoints_with_completed_writes": sum(len(ids) for ids in plan.completed_writes.values()),
+            "idle_threads": len(plan.idle_threads),
+        }
+    else:
+        with closing(sqlite3.connect(args.database, check_same_thread=False)) as conn:
+            saver = CompressedSqliteSaver(conn, serde=load_serializer(args.serde))
+            saver.setup()
+            result = asdict(apply_retention(saver, policy, batch_size=args.batch_size, pause=args.pause,
+                                            enable_incremental_vacuum=args.enable_incremental_vacuum))
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,175 @@
+"""A msgpack checkpoint serializer with registered, reflection-free codecs.
+
+`JsonPlusSerializer` stores every Pydantic object, messages included, as
+(module, class name, `model_dump()`) and rebuilds it by importing the module and
+validating the dump. `FastSerializer` instead keeps a registry of classes, each with
+a small integer tag and a fixed field order worked out once at registration:
+
+- encoding reads the fields with one `attrgetter` call and packs their values
+  positionally, without field names;
+- decoding looks the tag up and calls `model_construct`, skipping validation
+  (the values were valid when they were written).
+
+LangChain message classes are registered by default. Register your own models with
+fixed tags, since tags are persisted in checkpoints:
+
+    serde = FastSerializer(models={64: Analyst, 65: Profile, 66: ToDo})
+    memory = SqliteSaver(conn, serde=serde)
+
+Fields are stored by position, so only append new fields to a registered model, or
+pin the order with `register(cls, tag, fields=...)`. Anything not registered is
+stored with the inner `JsonPlusSerializer`, and data written by it is still read.
+
+The command-line tools in `checkpoints` take `--serde` to read databases written
+with another serializer: "jsonplus" (the default), "fast", or "module:attribute"
+naming a serializer, or a function returning one, such as one with your models
+registered.
+"""
+
+import importlib
+from operator import attrgetter
+from typing import Any, Optional
+
+import ormsgpack
+from langchain_core import messages
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+TYPE = "fastpack"
+
+# Ext code wrapping a value encoded by the fallback serializer, as (type, bytes)
+FALLBACK_CODE = 127
+
+OPTIONS = (
+    ormsgpack.OPT_NON_STR_KEYS
+    # Hand these to `default` so they keep their type, like JsonPlusSerializer
+    | ormsgpack.OPT_PASSTHROUGH_DATACLASS
+    | ormsgpack.OPT_PASSTHROUGH_DATETIME
+    | ormsgpack.OPT_PASSTHROUGH_ENUM
+    | ormsgpack.OPT_PASSTHROUGH_UUID
+    | ormsgpack.OPT_PASSTHROUGH_TUPLE
+)
+
+# Tags 1-63 are reserved for these; keep them stable
+MESSAGE_TAGS: dict[int, type] = {
+    1: messages.HumanMessage,
+    2: messages.AIMessage,
+    3: messages.SystemMessage,
+    4: messages.ToolMessage,
+    5: messages.RemoveMessage,
+    6: messages.FunctionMessage,
+    7: messages.ChatMessage,
+    8: messages.HumanMessageChunk,
+    9: messages.AIMessageChunk,
+    10: messages.SystemMessageChunk,
+    11: messages.ToolMessageChunk,
+}
+
+# Suggested tags for the course's own models, looked up by class name
+COURSE_MODEL_TAGS = {"Analyst": 64, "Perspectives": 65, "SearchQuery": 66, "Profile": 67, "ToDo": 68}
+
+class Codec:
+    def __init__(self, cls: type, tag: int, fields: tuple[str, ...]):
+        self.cls, self.tag, self.fields = cls, tag, fields
+        self.get = attrgetter(*fields) if len(fields) > 1 else lambda obj: (getattr(obj, fields[0]),)
+        # What model_construct would do, minus its per-call bookkeeping. Models with
+        # private attributes need their defaults set up, so they go through it.
+        self.direct = not cls.__private_attributes__
+        self.extra_allowed = cls.model_config.get("extra") == "allow"
+
+    def encode(self, obj: Any) -> list:
+        return [list(self.get(obj)), getattr(obj, "__pydantic_extra__", None) or None]
+
+    def decode(self, data: list) -> Any:
+        values, extra = data
+        fields = dict(zip(self.fields, values))
+        if not self.direct or len(values) != len(self.fields):
+            # Fields added since the data was written get their defaults here
+            return self.cls.model_construct(**fields, **(extra or {}))
+        obj = self.cls.__new__(self.cls)
+        object.__setattr__(obj, "__dict__", fields)
+        object.__setattr__(obj, "__pydantic_fields_set__", set(fields))
+        object.__setattr__(obj, "__pydantic_extra__", (extra or {}) if self.extra_allowed else None)
+        object.__setattr__(obj, "__pydantic_private__", None)
+        return obj
+
+class FastSerializer(SerializerProtocol):
+    """msgpack serializer with per-class codecs; see the module docstring.
+
+    Args:
+        models: Extra Pydantic models to register, keyed by tag (64-126).
+        fallback: Serializer for everything else; defaults to JsonPlusSerializer.
+    """
+
+    def __init__(self, models: Optional[dict[int, type]] = None, fallback: Optional[SerializerProtocol] = None):
+        self.fallback = fallback or JsonPlusSerializer()
+        self.by_type: dict[type, Codec] = {}
+        self.by_tag: dict[int, Codec] = {}
+        for tag, cls in {**MESSAGE_TAGS, **(models or {})}.items():
+            self.register(cls, tag)
+
+    def register(self, cls: type, tag: int, fields: Optional[tuple[str, ...]] = None) -> None:
+        """Encode instances of `cls` (exactly, not subclasses) under `tag`."""
+        if not 0 < tag < FALLBACK_CODE:
+            raise ValueError(f"Tag must be between 1 and {FALLBACK_CODE - 1}, got {tag}")
+        if tag in self.by_tag and self.by_tag[tag].cls is not cls:
+            raise ValueError(f"Tag {tag} is already used by {self.by_tag[tag].cls.__name__}")
+        codec = Codec(cls, tag, tuple(fields or cls.model_fields))
+        self.by_type[cls] = self.by_tag[tag] = codec
+
+    ## Encoding
+
+    def _default(self, obj: Any) -> ormsgpack.Ext:
+        codec = self.by_type.get(type(obj))
+        if codec is not None:
+            return ormsgpack.Ext(codec.tag, ormsgpack.packb(codec.encode(obj), default=self._default, option=OPTIONS))
+        if isinstance(obj, tuple):
+            return ormsgpack.Ext(0, ormsgpack.packb(list(obj), default=self._default, option=OPTIONS))
+        return ormsgpack.Ext(FALLBACK_CODE, ormsgpack.packb(self.fallback.dumps_typed(obj)))
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        if obj is None or isinstance(obj, (bytes, bytearray)):
+            return self.fallback.dumps_typed(obj)
+        return TYPE, ormsgpack.packb(obj, default=self._default, option=OPTIONS)
+
+    ## Decoding
+
+    def _ext_hook(self, code: int, data: bytes) -> Any:
+        if code == FALLBACK_CODE:
+            type_, payload = ormsgpack.unpackb(data)
+            return self.fallback.loads_typed((type_, payload))
+        value = ormsgpack.unpackb(data, ext_hook=self._ext_hook, option=ormsgpack.OPT_NON_STR_KEYS)
+        if code == 0:
+            return tuple(value)
+        return self.by_tag[code].decode(value)
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_ != TYPE:
+            return self.fallback.loads_typed(data)
+        return ormsgpack.unpackb(payload, ext_hook=self._ext_hook, option=ormsgpack.OPT_NON_STR_KEYS)
+
+def course_models(*modules: Any) -> dict[int, type]:
+    """`COURSE_MODEL_TAGS` resolved against loaded graph modules, for `FastSerializer(models=...)`."""
+    found = {}
+    for module in modules:
+        for name, tag in COURSE_MODEL_TAGS.items():
+            if hasattr(module, name):
+                found[tag] = getattr(module, name)
+    return found
+
+def load_serializer(spec: str) -> SerializerProtocol:
+    """The serializer named by a `--serde` option: "jsonplus", "fast" or "module:attribute"."""
+    if spec == "jsonplus":
+        return JsonPlusSerializer()
+    if spec == "fast":
+        return FastSerializer()
+    module_name, _, attribute = spec.partition(":")
+    if not attribute:
+        raise ValueError(f'Serializer must be "jsonplus", "fast" or "module:attribute", got {spec!r}')
+    serde = getattr(importlib.import_module(module_name), attribute)
+    if isinstance(serde, type) or not hasattr(serde, "loads_typed"):
+        serde = serde()
+    return serde
+
+SERDE_HELP = 'Serializer the database was written with: "jsonplus" (default), "fast" or "module:attribute"'
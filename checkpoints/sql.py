@@ -0,0 +1,12 @@
+"""SQL statements shared by the savers in `checkpoints` that write rows themselves."""
+
+# Same statements as SqliteSaver.put and put_writes
+INSERT_CHECKPOINT = (
+    "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, "
+    "checkpoint, metadata) VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+# `conflict` is REPLACE when every write goes to a special channel (WRITES_IDX_MAP), else IGNORE
+INSERT_WRITES = (
+    "INSERT OR {conflict} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, task_path, idx, channel, "
+    "type, value) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
@@ -0,0 +1,285 @@
+"""Write-behind SQLite checkpointer with batched commits.
+
+`SqliteSaver` commits every checkpoint and every task's pending writes on its own,
+so each superstep waits for several fsyncs. `WriteBehindSqliteSaver` serializes rows
+on the caller's thread but only queues them; a background thread commits everything
+queued in one transaction every `commit_interval` seconds (group commit), under WAL.
+
+Queued rows are committed before anything is read back through the saver, before
+deletes, when a task interrupts or fails, when a run ends (a checkpoint with no
+tasks left to run), when a run stops at a static breakpoint listed in
+`interrupt_before`, on `flush()`/`close()` and at interpreter exit. So a graph always
+sees its own writes, and other connections see a run as soon as `invoke` returns.
+Durability is set by two knobs:
+
+- `commit_interval`: how long a row may wait in memory. A crash of the process loses
+  at most this window; 0 commits inside every `put`, like SqliteSaver.
+- `synchronous`: SQLite's `PRAGMA synchronous`. "NORMAL" (the default) keeps commits
+  across a process crash but may roll back the last ones on power loss; "FULL"
+  fsyncs every commit; "OFF" leaves flushing to the OS.
+
+    memory = WriteBehindSqliteSaver(sqlite3.connect("example.db", check_same_thread=False),
+                                    interrupt_before=["human_feedback"])
+    graph = builder.compile(checkpointer=memory, interrupt_before=["human_feedback"])
+    graph.invoke(inputs, config)  # on disk once it returns, at the end or at the breakpoint
+
+`interrupt_after` breakpoints are not recognized; their checkpoint is committed
+after `commit_interval`, or call `flush()`.
+
+Combine with compression by subclassing both, compression first:
+
+    class Saver(CompressedSqliteSaver, WriteBehindSqliteSaver):
+        pass
+"""
+
+import atexit
+import json
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from collections.abc import Collection, Iterator, Sequence
+from contextlib import closing, contextmanager
+from typing import Any, Literal, Optional, Union
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.types import ERROR, INTERRUPT
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from checkpoints.sql import INSERT_CHECKPOINT, INSERT_WRITES
+
+# Writes that end a run early; commit them right away
+FLUSH_CHANNELS = frozenset({ERROR, INTERRUPT})
+
+# Channels that trigger a StateGraph node, named after it
+BRANCH_PREFIX = "branch:to:"
+START_CHANNEL = "__start__"
+SEND_CHANNEL = "__pregel_tasks"
+
+# Threads remembered as stopped, so writes that arrive after their last checkpoint
+# (the runtime saves them concurrently) are committed at once too
+STOPPED_THREADS = 1024
+
+def pending_nodes(checkpoint: Checkpoint) -> set[str]:
+    """Nodes a checkpoint still has to run, as far as its trigger channels tell.
+
+    Reads StateGraph's trigger channels (`__start__`, `branch:to:<node>` and pending
+    `Send`s), which hold a value only until the node they trigger has run. Only used to
+    pick the moment to commit, so a wrong guess costs an early or a late commit.
+    """
+    pending = set()
+    for channel, value in checkpoint["channel_values"].items():
+        if channel == START_CHANNEL:
+            pending.add(START_CHANNEL)
+        elif channel.startswith(BRANCH_PREFIX):
+            pending.add(channel[len(BRANCH_PREFIX):])
+        elif channel == SEND_CHANNEL:
+            pending.update(getattr(send, "node", SEND_CHANNEL) for send in value or ())
+    return pending
+
+class WriteBehindSqliteSaver(SqliteSaver):
+    """SqliteSaver that commits checkpoints in batches from a background thread; see the module docstring.
+
+    Args:
+        commit_interval: Seconds rows may wait before they are committed.
+        max_batch: Commit early once this many statements are queued.
+        synchronous: PRAGMA synchronous for the connection: "OFF", "NORMAL" or "FULL".
+        interrupt_before: The graph's static breakpoints, as passed to `compile`; a
+            checkpoint waiting in front of one is committed at once.
+    """
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        *,
+        serde: Optional[SerializerProtocol] = None,
+        commit_interval: float = 0.05,
+        max_batch: int = 1000,
+        synchronous: str = "NORMAL",
+        interrupt_before: Union[Collection[str], Literal["*"]] = (),
+    ):
+        super().__init__(conn, serde=serde)
+        if synchronous.upper() not in ("OFF", "NORMAL", "FULL"):
+            raise ValueError(f"synchronous must be OFF, NORMAL or FULL, got {synchronous!r}")
+        self.commit_interval = commit_interval
+        self.max_batch = max_batch
+        self.synchronous = synchronous.upper()
+        self.interrupt_before = interrupt_before if interrupt_before == "*" else frozenset(interrupt_before)
+        # (thread_id, checkpoint_ns) whose latest checkpoint ended a run or hit a breakpoint
+        self.stopped: OrderedDict[tuple[str, str], None] = OrderedDict()
+        # (statement, rows) in the order they were written; guarded by `condition`
+        self.queue: list[tuple[str, list[tuple]]] = []
+        self.condition = threading.Condition()
+        self.writer: Optional[threading.Thread] = None
+        self.closed = False
+        # Raised from the next call after a background commit fails
+        self.error: Optional[BaseException] = None
+        self.counters = {"commits": 0, "statements": 0, "rows": 0}
+        atexit.register(_flush_at_exit, weakref.ref(self))
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        super().setup()
+        self.conn.execute(f"PRAGMA synchronous={self.synchronous}")
+
+    ## Queue
+
+    def _enqueue(self, statement: str, rows: list[tuple], flush: bool = False) -> None:
+        self._raise_error()
+        if self.closed:
+            raise RuntimeError("WriteBehindSqliteSaver is closed")
+        with self.condition:
+            self.queue.append((statement, rows))
+            if self.writer is None and self.commit_interval > 0:
+                self.writer = threading.Thread(target=self._run, name="checkpoint-writer", daemon=True)
+                self.writer.start()
+            if len(self.queue) == 1 or len(self.queue) >= self.max_batch:
+                self.condition.notify()
+        if flush or self.commit_interval <= 0:
+            self.flush()
+
+    def _run(self) -> None:
+        while True:
+            with self.condition:
+                while not self.queue and not self.closed:
+                    self.condition.wait()
+                if self.closed and not self.queue:
+                    return
+                # Let the batch grow for one interval, unless it fills up first
+                deadline = time.monotonic() + self.commit_interval
+                while len(self.queue) < self.max_batch and not self.closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+            try:
+                self._commit_pending()
+            except Exception as e:
+                self.error = e
+
+    def _commit_pending(self) -> None:
+        # Taking the batch under the connection lock keeps commits in write order,
+        # whichever thread runs them
+        with self.lock:
+            with self.condition:
+                batch, self.queue = self.queue, []
+            if not batch:
+                return
+            self.setup()
+            try:
+                with closing(self.conn.cursor()) as cur:
+                    for statement, rows in batch:
+                        cur.executemany(statement, rows)
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+            self.counters["commits"] += 1
+            self.counters["statements"] += len(batch)
+            self.counters["rows"] += sum(len(rows) for _, rows in batch)
+
+    def _raise_error(self) -> None:
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise RuntimeError("A batched checkpoint commit failed; its checkpoints were not saved") from error
+
+    def flush(self) -> None:
+        """Commit everything queued, on the calling thread."""
+        # Also waits for a batch the background thread is committing
+        self._commit_pending()
+        self._raise_error()
+
+    def close(self) -> None:
+        """Commit everything queued and stop the background thread. The connection stays open."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        if self.writer is not None:
+            self.writer.join()
+        self.flush()
+
+    def stats(self) -> dict:
+        with self.condition:
+            return {**self.counters, "queued": len(self.queue)}
+
+    def __enter__(self) -> "WriteBehindSqliteSaver":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    ## SqliteSaver
+
+    @contextmanager
+    def cursor(self, transaction: bool = True) -> Iterator[sqlite3.Cursor]:
+        # Every read and every direct write sees the queued rows
+        self.flush()
+        with super().cursor(transaction) as cur:
+            yield cur
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        type_, serialized_checkpoint = self.serde.dumps_typed(checkpoint)
+        serialized_metadata = json.dumps(
+            get_checkpoint_metadata(config, metadata), ensure_ascii=False
+        ).encode("utf-8", "ignore")
+        stops = self._stops_here(checkpoint)
+        key = (str(thread_id), checkpoint_ns)
+        with self.condition:
+            if stops:
+                self.stopped[key] = None
+                self.stopped.move_to_end(key)
+                if len(self.stopped) > STOPPED_THREADS:
+                    self.stopped.popitem(last=False)
+            else:
+                self.stopped.pop(key, None)
+        self._enqueue(INSERT_CHECKPOINT, [(
+            str(thread_id), checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+            type_, serialized_checkpoint, serialized_metadata,
+        )], flush=stops)
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                 "checkpoint_id": checkpoint["id"]}}
+
+    def _stops_here(self, checkpoint: Checkpoint) -> bool:
+        # The run ends, or waits at a breakpoint, after this checkpoint
+        pending = pending_nodes(checkpoint)
+        if not pending:
+            return True
+        if self.interrupt_before == "*":
+            return pending != {START_CHANNEL}
+        return not pending.isdisjoint(self.interrupt_before)
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        conflict = "REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "IGNORE"
+        configurable = config["configurable"]
+        rows = [
+            (str(configurable["thread_id"]), str(configurable["checkpoint_ns"]), str(configurable["checkpoint_id"]),
+             task_id, task_path, WRITES_IDX_MAP.get(channel, idx), channel, *self.serde.dumps_typed(value))
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        with self.condition:
+            stopped = (str(configurable["thread_id"]), str(configurable["checkpoint_ns"])) in self.stopped
+        self._enqueue(INSERT_WRITES.format(conflict=conflict), rows,
+                      flush=stopped or any(channel in FLUSH_CHANNELS for channel, _ in writes))
+
+def _flush_at_exit(ref: "weakref.ref[WriteBehindSqliteSaver]") -> None:
+    saver = ref()
+    if saver is not None:
+        try:
+            saver.close()
+        except (sqlite3.Error, RuntimeError):
+            # The connection may already be closed
+            pass
@@ -1,8 +1,16 @@
-from langchain_core.messages import SystemMessage
-from langchain_openai import ChatOpenAI
+import time
+from functools import lru_cache
+from typing import Literal
+from typing_extensions import TypedDict
 
-from langgraph.graph import START, StateGraph, MessagesState
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+
+from langgraph.graph import START, END, StateGraph, MessagesState
 from langgraph.prebuilt import tools_condition, ToolNode
+from studio_common import arithmetic
+import configuration
+from studio_common import tracing
 
 def add(a: int, b: int) -> int:
     """Adds a and b.
@@ -31,24 +39,158 @@ def divide(a: int, b: int) -> float:
     """
     return a / b
 
-tools = [add, multiply, divide]
+# Batched variants, so one tool call can cover many numbers or a whole sequence of operations
+# (numpy is imported on first use, like the model client)
+def _pair(a: list[float], b: list[float]):
+    import numpy as np
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    if b.size != 1 and b.shape != a.shape:
+        raise ValueError(f"b must have one value or the same length as a ({a.size}), got {b.size}")
+    return a, b
+
+def add_batch(a: list[float], b: list[float]) -> list[float]:
+    """Adds a and b element-wise.
+
+    Args:
+        a: list of numbers
+        b: list of numbers, either one value or the same length as a
+    """
+    a, b = _pair(a, b)
+    return (a + b).tolist()
+
+def multiply_batch(a: list[float], b: list[float]) -> list[float]:
+    """Multiplies a and b element-wise.
+
+    Args:
+        a: list of numbers
+        b: list of numbers, either one value or the same length as a
+    """
+    a, b = _pair(a, b)
+    return (a * b).tolist()
+
+def divide_batch(a: list[float], b: list[float]) -> list[float]:
+    """Divide a and b element-wise.
+
+    Args:
+        a: list of numbers
+        b: list of numbers, either one value or the same length as a
+    """
+    import numpy as np
+    a, b = _pair(a, b)
+    # Division by zero gives inf (or nan for 0/0) rather than failing the whole batch
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (a / b).tolist()
+
+class Operation(TypedDict):
+    op: Literal["add", "multiply", "divide"]
+    value: float
+
+def apply_operations(values: list[float], operations: list[Operation]) -> list[float]:
+    """Applies a sequence of operations, in order, to every number in values.
 
-# Define LLM with bound tools
-llm = ChatOpenAI(model="gpt-4o")
-llm_with_tools = llm.bind_tools(tools)
+    For example values=[3] with operations add 4, multiply 2, divide 5 gives [2.8].
+
+    Args:
+        values: list of starting numbers
+        operations: operations to apply one after another, each an op and a value
+    """
+    import numpy as np
+    result = np.asarray(values, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for operation in operations:
+            # np.add, np.multiply and np.divide share the operation names
+            result = getattr(np, operation["op"])(result, operation["value"])
+    return result.tolist()
+
+tools = [add, multiply, divide, add_batch, multiply_batch, divide_batch, apply_operations]
+
+# Define LLM with bound tools, on first call: importing langchain_openai would dominate this module's import time
+@lru_cache
+def get_llm_with_tools():
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model="gpt-4o").bind_tools(tools)
 
 # System message
-sys_msg = SystemMessage(content="You are a helpful assistant tasked with writing performing arithmetic on a set of inputs.")
+sys_msg = SystemMessage(content="You are a helpful assistant tasked with writing performing arithmetic on a set of inputs. "
+                                "Use the batch tools or apply_operations to handle many numbers or a chain of operations in a single tool call.")
+
+# State, with the budget spent by the current run
+class AgentState(MessagesState):
+    budget_usage: dict
+
+def exhausted_budget(usage: dict, config: configuration.Configuration):
+    """Name of the first budget limit that has been reached, or None."""
+    if config.max_llm_turns and usage["llm_turns"] >= config.max_llm_turns:
+        return "max_llm_turns"
+    if config.max_tokens and usage["tokens"] >= config.max_tokens:
+        return "max_tokens"
+    if config.max_wall_clock_seconds and usage["elapsed_seconds"] >= config.max_wall_clock_seconds:
+        return "max_wall_clock_seconds"
+    return None
+
+def best_effort_answer(messages: list, reason: str) -> AIMessage:
+    """Final answer built from the tool results gathered so far, without calling the model."""
+    results = []
+    for message in reversed(messages):
+        if not isinstance(message, ToolMessage):
+            break
+        results.insert(0, f"{message.name}: {message.content}")
+    content = f"I stopped before finishing because the run reached its {reason} budget."
+    if results:
+        content += " The latest results were:\n" + "\n".join(results)
+    return AIMessage(content=content)
 
 # Node
-def assistant(state: MessagesState):
-   return {"messages": [llm_with_tools.invoke([sys_msg] + state["messages"])]}
+def assistant(state: AgentState, config: RunnableConfig):
+    configurable = configuration.Configuration.from_runnable_config(config)
+
+    # A new human message starts a new run, and a new budget
+    usage = state.get("budget_usage")
+    if usage is None or isinstance(state["messages"][-1], HumanMessage):
+        usage = {"llm_turns": 0, "tokens": 0, "started_at": time.time(), "exhausted": None}
+    usage = {**usage, "elapsed_seconds": time.time() - usage["started_at"]}
+
+    reason = exhausted_budget(usage, configurable)
+    if reason:
+        return {"messages": [best_effort_answer(state["messages"], reason)],
+                "budget_usage": {**usage, "exhausted": reason}}
+
+    response = get_llm_with_tools().invoke([sys_msg] + state["messages"])
+    tokens = (response.usage_metadata or {}).get("total_tokens", 0)
+    usage.update(llm_turns=usage["llm_turns"] + 1,
+                 tokens=usage["tokens"] + tokens,
+                 elapsed_seconds=time.time() - usage["started_at"])
+    return {"messages": [response], "budget_usage": usage}
+
+# Answer plain arithmetic with the tool functions directly, skipping the model
+def arithmetic_fast_path(state: AgentState):
+    last_message = state["messages"][-1]
+    if not isinstance(last_message, HumanMessage) or not isinstance(last_message.content, str):
+        return {}
+    answer = arithmetic.answer(last_message.content, {tool.__name__: tool for tool in tools})
+    if answer is None:
+        return {}
+    return {"messages": [AIMessage(content=answer)]}
+
+def route_start(state: AgentState, config: RunnableConfig):
+    if configuration.Configuration.from_runnable_config(config).arithmetic_fast_path:
+        return "arithmetic_fast_path"
+    return "assistant"
+
+def route_fast_path(state: AgentState):
+    # Fall back to the model when the request was not plain arithmetic
+    if isinstance(state["messages"][-1], AIMessage):
+        return END
+    return "assistant"
 
 # Build graph
-builder = StateGraph(MessagesState)
+builder = StateGraph(AgentState, config_schema=configuration.Configuration)
+builder.add_node("arithmetic_fast_path", arithmetic_fast_path)
 builder.add_node("assistant", assistant)
-builder.add_node("tools", ToolNode(tools))
-builder.add_edge(START, "assistant")
+# Mismatched batch lengths come back to the model as a tool error it can correct
+builder.add_node("tools", ToolNode(tools, handle_tool_errors=ValueError))
+builder.add_conditional_edges(START, route_start, ["arithmetic_fast_path", "assistant"])
+builder.add_conditional_edges("arithmetic_fast_path", route_fast_path, ["assistant", END])
 builder.add_conditional_edges(
     "assistant",
     # If the latest message (result) from assistant is a tool call -> tools_condition routes to tools
@@ -58,4 +200,4 @@ builder.add_conditional_edges(
 builder.add_edge("tools", "assistant")
 
 # Compile graph
-graph = builder.compile()
+graph = tracing.instrument(builder.compile(), "agent")
@@ -0,0 +1,42 @@
+import os
+from dataclasses import dataclass, fields
+from typing import Any, Optional
+
+from langchain_core.runnables import RunnableConfig
+
+def _coerce(value: Any, type_: type) -> Any:
+    """Environment variables arrive as strings; convert them to the field's type."""
+    if not isinstance(value, str) or type_ is str:
+        return value
+    if type_ is bool:
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return type_(value)
+
+@dataclass(kw_only=True)
+class Configuration:
+    """The configurable fields for the arithmetic agent."""
+    # Answer plain arithmetic ("3 * 4 + 5") locally before calling the model
+    arithmetic_fast_path: bool = False
+    # Per-run budget for the assistant <-> tools loop (0 means no limit)
+    max_llm_turns: int = 0
+    max_wall_clock_seconds: float = 0.0
+    max_tokens: int = 0
+    # Let a cheaper model make the router's tool/no-tool decision first
+    router_cascade: bool = False
+    cascade_model: str = "gpt-4o-mini"
+    cascade_confidence_threshold: float = 0.8
+
+    @classmethod
+    def from_runnable_config(
+        cls, config: Optional[RunnableConfig] = None
+    ) -> "Configuration":
+        """Create a Configuration instance from a RunnableConfig."""
+        configurable = (
+            config["configurable"] if config and "configurable" in config else {}
+        )
+        values: dict[str, Any] = {
+            f.name: _coerce(os.environ.get(f.name.upper(), configurable.get(f.name)), f.type)
+            for f in fields(cls)
+            if f.init
+        }
+        return cls(**{k: v for k, v in values.items() if v is not None})
@@ -1,7 +1,18 @@
-from langchain_openai import ChatOpenAI
+import threading
+import time
+import uuid
+from functools import lru_cache
+from typing import Literal, Optional
+
+from pydantic import BaseModel, Field
+
+from langchain_core.messages import AIMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import MessagesState
 from langgraph.graph import StateGraph, START, END
 from langgraph.prebuilt import ToolNode, tools_condition
+import configuration
+from studio_common import tracing
 
 # Tool
 def multiply(a: int, b: int) -> int:
@@ -14,15 +25,106 @@ def multiply(a: int, b: int) -> int:
     return a * b
 
 # LLM with bound tool
-llm = ChatOpenAI(model="gpt-4o")
-llm_with_tools = llm.bind_tools([multiply])
+@lru_cache
+def get_llm_with_tools():
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model="gpt-4o").bind_tools([multiply])
+
+# Cascade: a cheap model routes first and the large model is only used when it is unsure
+class RouteDecision(BaseModel):
+    """Routing decision for the user's latest message."""
+    decision: Literal["call_multiply", "respond", "escalate"] = Field(
+        description="call_multiply if the user wants two numbers multiplied, respond to answer directly, "
+                    "escalate if you are not sure")
+    confidence: float = Field(description="Confidence in the decision, from 0 to 1")
+    a: Optional[int] = Field(None, description="First number to multiply, for call_multiply")
+    b: Optional[int] = Field(None, description="Second number to multiply, for call_multiply")
+    response: Optional[str] = Field(None, description="Reply to the user, for respond")
+
+router_instructions = SystemMessage(content="""You route messages for an assistant with one tool, multiply(a, b).
+Decide whether the latest user message should call multiply, get a direct reply, or be escalated to a stronger model.
+Escalate anything ambiguous or anything you cannot answer well.""")
+
+@lru_cache
+def get_router_model(model: str):
+    """Cheap model with structured output for the routing decision"""
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model=model, temperature=0).with_structured_output(RouteDecision)
+
+def cascade_message(decision: RouteDecision, threshold: float) -> Optional[AIMessage]:
+    """Turn a confident routing decision into the node's message, or None to escalate."""
+    if decision.confidence < threshold:
+        return None
+    if decision.decision == "call_multiply" and decision.a is not None and decision.b is not None:
+        return AIMessage(content="", tool_calls=[{"name": "multiply", "args": {"a": decision.a, "b": decision.b},
+                                                  "id": f"call_{uuid.uuid4().hex[:12]}"}])
+    if decision.decision == "respond" and decision.response:
+        return AIMessage(content=decision.response)
+    return None
+
+# Running mean of large model latency in this process, used to estimate what the cascade saves
+_large_model_latency = {"count": 0, "total": 0.0}
+_large_model_latency_lock = threading.Lock()
+
+def observe_large_model(seconds: float) -> None:
+    with _large_model_latency_lock:
+        _large_model_latency["count"] += 1
+        _large_model_latency["total"] += seconds
+
+def expected_large_model_seconds() -> float:
+    with _large_model_latency_lock:
+        count = _large_model_latency["count"]
+        return _large_model_latency["total"] / count if count else 0.0
+
+# State
+class RouterState(MessagesState):
+    cascade_stats: dict
+
+def update_cascade_stats(stats: Optional[dict], escalated: bool, cheap_seconds: float, large_seconds: float) -> dict:
+    """Add one routing decision to the thread's cascade totals."""
+    stats = dict(stats or {"decisions": 0, "escalations": 0, "cheap_seconds": 0.0,
+                           "large_seconds": 0.0, "saved_seconds": 0.0})
+    stats["decisions"] += 1
+    stats["escalations"] += escalated
+    stats["cheap_seconds"] += cheap_seconds
+    stats["large_seconds"] += large_seconds
+    # A confident cheap decision saves a large model call; an escalation costs the cheap call.
+    # Savings are only counted once a large model call has been timed in this process.
+    expected = expected_large_model_seconds()
+    if escalated:
+        saved = -cheap_seconds
+    else:
+        saved = expected - cheap_seconds if expected else 0.0
+    stats["saved_seconds"] += saved
+    stats["escalation_rate"] = stats["escalations"] / stats["decisions"]
+    stats["last_run"] = {"escalated": escalated, "cheap_seconds": cheap_seconds,
+                         "large_seconds": large_seconds, "saved_seconds": saved}
+    return stats
 
 # Node
-def tool_calling_llm(state: MessagesState):
-    return {"messages": [llm_with_tools.invoke(state["messages"])]}
+def tool_calling_llm(state: RouterState, config: RunnableConfig):
+    configurable = configuration.Configuration.from_runnable_config(config)
+    if not configurable.router_cascade:
+        return {"messages": [get_llm_with_tools().invoke(state["messages"])]}
+
+    start = time.perf_counter()
+    decision = get_router_model(configurable.cascade_model).invoke([router_instructions] + state["messages"])
+    cheap_seconds = time.perf_counter() - start
+    message = cascade_message(decision, configurable.cascade_confidence_threshold)
+
+    escalated = message is None
+    large_seconds = 0.0
+    if escalated:
+        start = time.perf_counter()
+        message = get_llm_with_tools().invoke(state["messages"])
+        large_seconds = time.perf_counter() - start
+        observe_large_model(large_seconds)
+
+    stats = update_cascade_stats(state.get("cascade_stats"), escalated, cheap_seconds, large_seconds)
+    return {"messages": [message], "cascade_stats": stats}
 
 # Build graph
-builder = StateGraph(MessagesState)
+builder = StateGraph(RouterState, config_schema=configuration.Configuration)
 builder.add_node("tool_calling_llm", tool_calling_llm)
 builder.add_node("tools", ToolNode([multiply]))
 builder.add_edge(START, "tool_calling_llm")
@@ -35,4 +137,4 @@ builder.add_conditional_edges(
 builder.add_edge("tools", END)
 
 # Compile graph
-graph = builder.compile()
\ No newline at end of file
+graph = tracing.instrument(builder.compile(), "router")
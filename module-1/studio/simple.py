@@ -2,6 +2,7 @@ import random
 from typing import Literal
 from typing_extensions import TypedDict
 from langgraph.graph import StateGraph, START, END
+from studio_common import tracing
 
 # State
 class State(TypedDict):
@@ -46,4 +47,4 @@ builder.add_edge("node_2", END)
 builder.add_edge("node_3", END)
 
 # Compile graph
-graph = builder.compile()
\ No newline at end of file
+graph = tracing.instrument(builder.compile(), "simple_graph")
\ No newline at end of file
@@ -1,21 +1,64 @@
-from typing import Literal
-from langchain_core.messages import HumanMessage, SystemMessage, RemoveMessage
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Annotated, Literal, Optional
+from typing_extensions import TypedDict
+from langchain_core.messages import HumanMessage, SystemMessage, RemoveMessage, convert_to_messages, get_buffer_string
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import MessagesState
 from langgraph.graph import StateGraph, START, END
+from langgraph.types import Command, Send
+import configuration
+from studio_common import llm_cache
+from studio_common import tracing
 
 # We will use this model for both the conversation and the summarization
-from langchain_openai import ChatOpenAI
-model = ChatOpenAI(model="gpt-4o", temperature=0) 
+@lru_cache
+def get_model():
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model="gpt-4o", temperature=0, cache=llm_cache.get_cache("chatbot"))
 
-# State class to store messages and summary
+# Reducer for dict channels: updates are merged by key and a value of None drops the key
+def merge_by_key(left: Optional[dict], right: Optional[dict]) -> dict:
+    merged = dict(left or {})
+    for key, value in (right or {}).items():
+        if value is None:
+            merged.pop(key, None)
+        else:
+            merged[key] = value
+    return merged
+
+# State class to store messages and summary. The summary has two tiers: `summary` covers
+# recent turns in detail and `archived_summary` is a compacted summary of everything older.
 class State(MessagesState):
     summary: str
+    archived_summary: str
+    summary_tokens: int # Both tiers
+    pending_summary: Optional[dict]
+    token_counts: Annotated[dict[str, int], merge_by_key] # Cached by message id
+    # Bulk import of an earlier conversation: set ingest_messages to seed the thread
+    ingest_messages: list
+    partial_summaries: Annotated[dict[int, str], merge_by_key] # By chunk index
+
+def count_new_messages(state: State, messages: list) -> dict:
+    """Token counts for the messages not counted yet, so each turn only counts what is new."""
+    counted = state.get("token_counts") or {}
+    return {m.id: count_tokens_approximately([m]) for m in messages if m.id not in counted}
+
+def prompt_tokens(state: State) -> int:
+    counts = state.get("token_counts") or {}
+    return state.get("summary_tokens", 0) + sum(
+        counts[m.id] if m.id in counts else count_tokens_approximately([m]) for m in state["messages"])
     
 # Define the logic to call the model
 def call_model(state: State):
     
-    # Get summary if it exists
-    summary = state.get("summary", "")
+    # Get summary if it exists, oldest tier first
+    summary = "\n\n".join(s for s in (state.get("archived_summary", ""), state.get("summary", "")) if s)
 
     # If there is summary, then we add it to messages
     if summary:
@@ -29,28 +72,30 @@ def call_model(state: State):
     else:
         messages = state["messages"]
     
-    response = model.invoke(messages)
-    return {"messages": response}
+    response = get_model().invoke(messages)
+    if response.id is None:
+        response.id = str(uuid.uuid4())
+    return {"messages": response, "token_counts": count_new_messages(state, state["messages"] + [response])}
 
 # Determine whether to end or summarize the conversation
-def should_continue(state: State) -> Literal["summarize_conversation", "__end__"]:
+def should_continue(state: State, config: RunnableConfig) -> Literal["summarize_conversation", "schedule_summary", "__end__"]:
     
     """Return the next node to execute."""
     
+    configurable = configuration.Configuration.from_runnable_config(config)
     messages = state["messages"]
     
-    # If there are more than six messages, then we summarize the conversation
-    if len(messages) > 6:
+    # If the prompt has grown past the token budget, then we summarize the conversation
+    if len(messages) > configurable.messages_to_keep and prompt_tokens(state) > configurable.max_tokens_before_summary:
+        if configurable.background_summary:
+            return "schedule_summary"
         return "summarize_conversation"
     
     # Otherwise we can just end
     return END
 
-def summarize_conversation(state: State):
+def write_summary(messages: list, summary: str) -> str:
     
-    # First get the summary if it exists
-    summary = state.get("summary", "")
-
     # Create our summarization prompt 
     if summary:
         
@@ -65,22 +110,226 @@ def summarize_conversation(state: State):
         summary_message = "Create a summary of the conversation above:"
 
     # Add prompt to our history
-    messages = state["messages"] + [HumanMessage(content=summary_message)]
-    response = model.invoke(messages)
-    
-    # Delete all but the 2 most recent messages and add our summary to the state 
-    delete_messages = [RemoveMessage(id=m.id) for m in state["messages"][:-2]]
-    return {"summary": response.content, "messages": delete_messages}
+    response = get_model().invoke(messages + [HumanMessage(content=summary_message)])
+    return response.content
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Hard cap for a summary: keep its most recent part so that, with the "..." prefix and
+    the per-message overhead, it counts as at most max_tokens (about 4 characters per token)."""
+    if count_tokens_approximately([text]) <= max_tokens:
+        return text
+    chars = (max_tokens - count_tokens_approximately([""])) * 4 - len("...")
+    return "..." + text[-chars:] if chars > 0 else ""
+
+def compact_summaries(archived_summary: str, summary: str, max_tokens: int) -> str:
+    """Fold the recent summary into the archived one, condensed to fit max_tokens."""
+    older = f"Older summary of the conversation: {archived_summary}\n\n" if archived_summary else ""
+    prompt = (
+        f"{older}Summary of the conversation since then: {summary}\n\n"
+        f"Combine these into a single condensed summary of at most {int(max_tokens * 0.75)} words, "
+        "keeping the facts about the user most likely to matter later."
+    )
+    response = get_model().invoke([HumanMessage(content=prompt)])
+    return truncate_to_tokens(response.content, max_tokens)
+
+def update_summaries(messages: list, summary: str, archived_summary: str, max_summary_tokens: int,
+                     max_archived_summary_tokens: int) -> dict:
+    """Extend the recent summary; once it passes its cap, compact it into the archive."""
+    summary = write_summary(messages, summary)
+    if count_tokens_approximately([summary]) > max_summary_tokens:
+        archived_summary = compact_summaries(archived_summary, summary, max_archived_summary_tokens)
+        summary = ""
+    return {"summary": summary, "archived_summary": archived_summary}
+
+def summary_limits(config: RunnableConfig) -> tuple[int, int]:
+    configurable = configuration.Configuration.from_runnable_config(config)
+    return configurable.max_summary_tokens, configurable.max_archived_summary_tokens
+
+def replace_with_summary(summaries: dict, removed: list) -> dict:
+    """State update that stores the new summary tiers and deletes the messages they cover."""
+    return {**summaries,
+            "summary_tokens": count_tokens_approximately([s for s in summaries.values() if s]),
+            "messages": [RemoveMessage(id=m.id) for m in removed],
+            "token_counts": {m.id: None for m in removed}}
+
+def messages_to_summarize(state: State, config: RunnableConfig) -> list:
+    # All but the most recent messages
+    keep = configuration.Configuration.from_runnable_config(config).messages_to_keep
+    return state["messages"][:-keep] if keep else state["messages"]
+
+def summarize_conversation(state: State, config: RunnableConfig):
+    summaries = update_summaries(state["messages"], state.get("summary", ""), state.get("archived_summary", ""),
+                                 *summary_limits(config))
+    return replace_with_summary(summaries, messages_to_summarize(state, config))
+
+## Background summarization
+# The reply is returned right away and the summary is written on a worker thread.
+# The job only covers the messages that existed when it was scheduled, so messages
+# added while it runs are kept. It is applied at the start of the next turn.
+
+_summary_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="chatbot-summary")
+_summary_jobs: dict[str, Future] = {}
+_summary_jobs_finished: dict[str, float] = {} # Job id -> when it finished
+_summary_jobs_lock = threading.Lock()
+# Results of threads that do not come back for this long are dropped
+SUMMARY_RESULT_TTL = 3600
+
+def _forget_stale_jobs():
+    cutoff = time.monotonic() - SUMMARY_RESULT_TTL
+    for job_id in [job_id for job_id, finished in _summary_jobs_finished.items() if finished < cutoff]:
+        del _summary_jobs_finished[job_id]
+        _summary_jobs.pop(job_id, None)
+
+def _job_finished(job_id: str):
+    with _summary_jobs_lock:
+        if job_id in _summary_jobs:
+            _summary_jobs_finished[job_id] = time.monotonic()
+        _forget_stale_jobs()
+
+def schedule_summary(state: State, config: RunnableConfig):
+    if state.get("pending_summary"):
+        return {}
+    job_id = str(uuid.uuid4())
+    base_summary = [state.get("summary", ""), state.get("archived_summary", "")]
+    future = _summary_executor.submit(update_summaries, list(state["messages"]), *base_summary,
+                                      *summary_limits(config))
+    with _summary_jobs_lock:
+        _forget_stale_jobs()
+        _summary_jobs[job_id] = future
+    future.add_done_callback(lambda _: _job_finished(job_id))
+    return {"pending_summary": {"job_id": job_id,
+                                "message_ids": [m.id for m in messages_to_summarize(state, config)],
+                                "base_summary": base_summary}}
+
+def apply_pending_summary(state: State):
+    pending = state["pending_summary"]
+    with _summary_jobs_lock:
+        future = _summary_jobs.pop(pending["job_id"], None)
+        _summary_jobs_finished.pop(pending["job_id"], None)
+    # The job is lost if the process restarted or its result expired; the next turn schedules a new one
+    if future is None:
+        return {"pending_summary": None}
+    try:
+        summaries = future.result()
+    except Exception:
+        logging.exception("Background summarization failed")
+        return {"pending_summary": None}
+    # Drop the result if the summary changed since the job was scheduled
+    if [state.get("summary", ""), state.get("archived_summary", "")] != pending["base_summary"]:
+        return {"pending_summary": None}
+    summarized = set(pending["message_ids"])
+    removed = [m for m in state["messages"] if m.id in summarized]
+    return {**replace_with_summary(summaries, removed), "pending_summary": None}
+
+## Bulk ingest
+# Importing thousands of earlier messages in one summarization prompt overflows the context
+# window, so they are split into chunks that are summarized by parallel Send tasks (at most
+# ingest_max_concurrency at a time), then reduced into the archived summary. The chunks only
+# travel in the Send packets, so they are not stored again in every checkpoint.
+# Only the last messages_to_keep messages are kept as messages.
+
+class ChunkState(TypedDict):
+    index: int
+    total: int
+    chunk: list
+
+def chunk_messages(messages: list, max_tokens: int) -> list[list]:
+    """Split messages into consecutive chunks of at most max_tokens (a longer message gets its own chunk)."""
+    chunks, current, current_tokens = [], [], 0
+    for message in messages:
+        tokens = count_tokens_approximately([message])
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(message)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+def plan_ingest(state: State, config: RunnableConfig) -> Command[Literal["summarize_chunk", "__end__"]]:
+    configurable = configuration.Configuration.from_runnable_config(config)
+    # Input from Studio or the API arrives as dicts. Give every message an id up front so
+    # token counts and removals can refer to it
+    history = [m if m.id else m.model_copy(update={"id": str(uuid.uuid4())})
+               for m in convert_to_messages(state["ingest_messages"])]
+    keep = configurable.messages_to_keep
+    older, tail = (history[:-keep], history[-keep:]) if keep else (history, [])
+    chunks = chunk_messages(older, configurable.ingest_chunk_tokens)
+    update = {"ingest_messages": [], "messages": tail, "token_counts": count_new_messages(state, tail)}
+    if not chunks:
+        return Command(update=update, goto=END)
+    return Command(update=update, goto=[Send("summarize_chunk", {"index": i, "total": len(chunks), "chunk": chunk})
+                                        for i, chunk in enumerate(chunks)])
+
+@lru_cache
+def ingest_slots(limit: int) -> threading.Semaphore:
+    return threading.Semaphore(limit)
+
+def summarize_chunk(state: ChunkState, config: RunnableConfig):
+    prompt = (
+        f"Here is part {state['index'] + 1} of {state['total']} of an earlier conversation:\n\n"
+        f"{get_buffer_string(state['chunk'])}\n\n"
+        "Summarize this part, keeping the facts about the user most likely to matter later."
+    )
+    # All chunks run in one superstep; this bounds how many call the model at once
+    with ingest_slots(configuration.Configuration.from_runnable_config(config).ingest_max_concurrency):
+        response = get_model().invoke([HumanMessage(content=prompt)])
+    return {"partial_summaries": {state["index"]: response.content}}
+
+def reduce_summaries(state: State, config: RunnableConfig):
+    configurable = configuration.Configuration.from_runnable_config(config)
+    partials = [state["partial_summaries"][i] for i in sorted(state["partial_summaries"])]
+    # Reduce in rounds until the partial summaries fit in one prompt; each round is one parallel batch
+    while len(partials) > 1 and count_tokens_approximately(partials) > configurable.ingest_chunk_tokens:
+        groups = chunk_messages([HumanMessage(content=p) for p in partials], configurable.ingest_chunk_tokens)
+        if len(groups) == len(partials):
+            # Each partial fills a prompt on its own; shorten them and combine them in pairs
+            shortened = [HumanMessage(content=truncate_to_tokens(p, configurable.ingest_chunk_tokens // 2))
+                         for p in partials]
+            groups = [shortened[i:i + 2] for i in range(0, len(shortened), 2)]
+        responses = get_model().batch(
+            [[HumanMessage(content="Combine these consecutive summaries of a conversation into one:\n\n"
+                                   + "\n\n".join(m.content for m in group))] for group in groups],
+            config={"max_concurrency": configurable.ingest_max_concurrency},
+        )
+        partials = [r.content for r in responses]
+    # A single partial can still be too long for the compaction prompt
+    combined = truncate_to_tokens("\n\n".join(partials), configurable.ingest_chunk_tokens)
+    archived_summary = compact_summaries(state.get("archived_summary", ""), combined,
+                                         configurable.max_archived_summary_tokens)
+    return {"archived_summary": archived_summary,
+            "summary_tokens": count_tokens_approximately([s for s in (archived_summary, state.get("summary", "")) if s]),
+            "partial_summaries": {i: None for i in state["partial_summaries"]}}
+
+def route_start(state: State) -> Literal["plan_ingest", "apply_pending_summary", "conversation"]:
+    if state.get("ingest_messages"):
+        return "plan_ingest"
+    if state.get("pending_summary"):
+        return "apply_pending_summary"
+    return "conversation"
 
 # Define a new graph
-workflow = StateGraph(State)
+workflow = StateGraph(State, config_schema=configuration.Configuration)
 workflow.add_node("conversation", call_model)
 workflow.add_node(summarize_conversation)
+workflow.add_node(schedule_summary)
+workflow.add_node(apply_pending_summary)
+workflow.add_node(plan_ingest)
+workflow.add_node(summarize_chunk)
+workflow.add_node(reduce_summaries)
 
-# Set the entrypoint as conversation
-workflow.add_edge(START, "conversation")
+# Set the entrypoint as conversation, applying a finished background summary first,
+# or start a bulk ingest
+workflow.add_conditional_edges(START, route_start)
+workflow.add_edge("apply_pending_summary", "conversation")
 workflow.add_conditional_edges("conversation", should_continue)
 workflow.add_edge("summarize_conversation", END)
+workflow.add_edge("schedule_summary", END)
+
+# Bulk ingest: plan_ingest sends the chunks to summarize_chunk, then they are reduced
+workflow.add_edge("summarize_chunk", "reduce_summaries")
+workflow.add_edge("reduce_summaries", END)
 
 # Compile
-graph = workflow.compile()
\ No newline at end of file
+graph = tracing.instrument(workflow.compile(), "chatbot")
\ No newline at end of file
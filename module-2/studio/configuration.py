@@ -0,0 +1,45 @@
+import os
+from dataclasses import dataclass, fields
+from typing import Any, Optional
+
+from langchain_core.runnables import RunnableConfig
+
+def _coerce(value: Any, type_: type) -> Any:
+    """Environment variables arrive as strings; convert them to the field's type."""
+    if not isinstance(value, str) or type_ is str:
+        return value
+    if type_ is bool:
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return type_(value)
+
+@dataclass(kw_only=True)
+class Configuration:
+    """The configurable fields for the chatbot."""
+    # Summarize once the summary plus messages exceed this many tokens
+    max_tokens_before_summary: int = 2000
+    # Messages left in the thread after summarizing
+    messages_to_keep: int = 2
+    # Token cap for the recent summary tier before it is compacted into the archive
+    max_summary_tokens: int = 500
+    # Hard token cap for the compacted archive tier
+    max_archived_summary_tokens: int = 500
+    # Bulk ingest: tokens per chunk and chunks summarized at the same time
+    ingest_chunk_tokens: int = 8000
+    ingest_max_concurrency: int = 8
+    # Return the reply first and write the summary in the background, applied next turn
+    background_summary: bool = False
+
+    @classmethod
+    def from_runnable_config(
+        cls, config: Optional[RunnableConfig] = None
+    ) -> "Configuration":
+        """Create a Configuration instance from a RunnableConfig."""
+        configurable = (
+            config["configurable"] if config and "configurable" in config else {}
+        )
+        values: dict[str, Any] = {
+            f.name: _coerce(os.environ.get(f.name.upper(), configurable.get(f.name)), f.type)
+            for f in fields(cls)
+            if f.init
+        }
+        return cls(**{k: v for k, v in values.items() if v is not None})
@@ -1,8 +1,12 @@
-from langchain_core.messages import SystemMessage
-from langchain_openai import ChatOpenAI
+from functools import lru_cache
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
 
-from langgraph.graph import START, StateGraph, MessagesState
+from langgraph.graph import START, END, StateGraph, MessagesState
 from langgraph.prebuilt import tools_condition, ToolNode
+from studio_common import arithmetic
+import configuration
+from studio_common import tracing
 
 def add(a: int, b: int) -> int:
     """Adds a and b.
@@ -34,21 +38,46 @@ def divide(a: int, b: int) -> float:
 tools = [add, multiply, divide]
 
 # Define LLM with bound tools
-llm = ChatOpenAI(model="gpt-4o")
-llm_with_tools = llm.bind_tools(tools)
+@lru_cache
+def get_llm_with_tools():
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model="gpt-4o").bind_tools(tools)
 
 # System message
 sys_msg = SystemMessage(content="You are a helpful assistant tasked with writing performing arithmetic on a set of inputs.")
 
 # Node
 def assistant(state: MessagesState):
-   return {"messages": [llm_with_tools.invoke([sys_msg] + state["messages"])]}
+   return {"messages": [get_llm_with_tools().invoke([sys_msg] + state["messages"])]}
+
+# Answer plain arithmetic with the tool functions directly, skipping the model
+def arithmetic_fast_path(state: MessagesState):
+    last_message = state["messages"][-1]
+    if not isinstance(last_message, HumanMessage) or not isinstance(last_message.content, str):
+        return {}
+    answer = arithmetic.answer(last_message.content, {tool.__name__: tool for tool in tools})
+    if answer is None:
+        return {}
+    return {"messages": [AIMessage(content=answer)]}
+
+def route_start(state: MessagesState, config: RunnableConfig):
+    if configuration.Configuration.from_runnable_config(config).arithmetic_fast_path:
+        return "arithmetic_fast_path"
+    return "assistant"
+
+def route_fast_path(state: MessagesState):
+    # Fall back to the model when the request was not plain arithmetic
+    if isinstance(state["messages"][-1], AIMessage):
+        return END
+    return "assistant"
 
 # Build graph
-builder = StateGraph(MessagesState)
+builder = StateGraph(MessagesState, config_schema=configuration.Configuration)
+builder.add_node("arithmetic_fast_path", arithmetic_fast_path)
 builder.add_node("assistant", assistant)
 builder.add_node("tools", ToolNode(tools))
-builder.add_edge(START, "assistant")
+builder.add_conditional_edges(START, route_start, ["arithmetic_fast_path", "assistant"])
+builder.add_conditional_edges("arithmetic_fast_path", route_fast_path, ["assistant", END])
 builder.add_conditional_edges(
     "assistant",
     # If the latest message (result) from assistant is a tool call -> tools_condition routes to tools
@@ -58,4 +87,4 @@ builder.add_conditional_edges(
 builder.add_edge("tools", "assistant")
 
 # Compile graph
-graph = builder.compile()
+graph = tracing.instrument(builder.compile(), "agent")
@@ -1,6 +1,7 @@
 from typing_extensions import TypedDict
 from langgraph.errors import NodeInterrupt
 from langgraph.graph import START, END, StateGraph
+from studio_common import tracing
 
 class State(TypedDict):
     input: str
@@ -30,4 +31,4 @@ builder.add_edge("step_1", "step_2")
 builder.add_edge("step_2", "step_3")
 builder.add_edge("step_3", END)
 
-graph = builder.compile()
\ No newline at end of file
+graph = tracing.instrument(builder.compile(), "dynamic_breakpoints")
\ No newline at end of file
@@ -1,21 +1,26 @@
+from functools import lru_cache
 import operator
 from typing import Annotated
 from typing_extensions import TypedDict
 
 from pydantic import BaseModel
 
-from langchain_openai import ChatOpenAI 
-
 from langgraph.constants import Send
 from langgraph.graph import END, StateGraph, START
 
+from studio_common import llm_cache
+from studio_common import tracing
+
 # Prompts we will use
 subjects_prompt = """Generate a list of 3 sub-topics that are all related to this overall topic: {topic}."""
 joke_prompt = """Generate a joke about {subject}"""
 best_joke_prompt = """Below are a bunch of jokes about {topic}. Select the best one! Return the ID of the best one, starting 0 as the ID for the first joke. Jokes: \n\n  {jokes}"""
 
 # LLM
-model = ChatOpenAI(model="gpt-4o", temperature=0) 
+@lru_cache
+def get_model():
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model="gpt-4o", temperature=0, cache=llm_cache.get_cache("map_reduce"))
 
 # Define the state
 class Subjects(BaseModel):
@@ -32,7 +37,7 @@ class OverallState(TypedDict):
 
 def generate_topics(state: OverallState):
     prompt = subjects_prompt.format(topic=state["topic"])
-    response = model.with_structured_output(Subjects).invoke(prompt)
+    response = get_model().with_structured_output(Subjects).invoke(prompt)
     return {"subjects": response.subjects}
 
 class JokeState(TypedDict):
@@ -43,13 +48,13 @@ class Joke(BaseModel):
 
 def generate_joke(state: JokeState):
     prompt = joke_prompt.format(subject=state["subject"])
-    response = model.with_structured_output(Joke).invoke(prompt)
+    response = get_model().with_structured_output(Joke).invoke(prompt)
     return {"jokes": [response.joke]}
 
 def best_joke(state: OverallState):
     jokes = "\n\n".join(state["jokes"])
     prompt = best_joke_prompt.format(topic=state["topic"], jokes=jokes)
-    response = model.with_structured_output(BestJoke).invoke(prompt)
+    response = get_model().with_structured_output(BestJoke).invoke(prompt)
     return {"best_selected_joke": state["jokes"][response.id]}
 
 def continue_to_jokes(state: OverallState):
@@ -66,4 +71,4 @@ graph_builder.add_edge("generate_joke", "best_joke")
 graph_builder.add_edge("best_joke", END)
 
 # Compile the graph
-graph = graph_builder.compile()
+graph = tracing.instrument(graph_builder.compile(), "map_reduce")
@@ -1,3 +1,4 @@
+from functools import lru_cache
 import operator
 from typing import Annotated
 from typing_extensions import TypedDict
@@ -5,14 +6,15 @@ from typing_extensions import TypedDict
 from langchain_core.documents import Document
 from langchain_core.messages import HumanMessage, SystemMessage
 
-from langchain_community.document_loaders import WikipediaLoader
-from langchain_tavily import TavilySearch  # updated 1.0
-
-from langchain_openai import ChatOpenAI
-
 from langgraph.graph import StateGraph, START, END
 
-llm = ChatOpenAI(model="gpt-4o", temperature=0) 
+from studio_common import llm_cache
+from studio_common import tracing
+
+@lru_cache
+def get_llm():
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model="gpt-4o", temperature=0, cache=llm_cache.get_cache("parallelization"))
 
 class State(TypedDict):
     question: str
@@ -24,6 +26,7 @@ def search_web(state):
     """ Retrieve docs from web search """
 
     # Search
+    from langchain_tavily import TavilySearch  # updated 1.0
     tavily_search = TavilySearch(max_results=3)
     data = tavily_search.invoke({"query": state['question']})
     search_docs = data.get("results", data)
@@ -43,6 +46,7 @@ def search_wikipedia(state):
     """ Retrieve docs from wikipedia """
 
     # Search
+    from langchain_community.document_loaders import WikipediaLoader
     search_docs = WikipediaLoader(query=state['question'], 
                                   load_max_docs=2).load()
 
@@ -70,7 +74,7 @@ def generate_answer(state):
                                                        context=context)    
     
     # Answer
-    answer = llm.invoke([SystemMessage(content=answer_instructions)]+[HumanMessage(content=f"Answer the question.")])
+    answer = get_llm().invoke([SystemMessage(content=answer_instructions)]+[HumanMessage(content=f"Answer the question.")])
       
     # Append it to state
     return {"answer": answer}
@@ -89,4 +93,4 @@ builder.add_edge(START, "search_web")
 builder.add_edge("search_wikipedia", "generate_answer")
 builder.add_edge("search_web", "generate_answer")
 builder.add_edge("generate_answer", END)
-graph = builder.compile()
+graph = tracing.instrument(builder.compile(), "parallelization")
@@ -1,19 +1,27 @@
+from functools import lru_cache
 import operator
 from pydantic import BaseModel, Field
 from typing import Annotated, List
 from typing_extensions import TypedDict
 
-from langchain_community.document_loaders import WikipediaLoader
-from langchain_tavily import TavilySearch  # updated 1.0
+from langchain_core.caches import BaseCache
+from langchain_core.globals import get_llm_cache
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, get_buffer_string
-from langchain_openai import ChatOpenAI
+from langchain_core.runnables import RunnableLambda
 
+from langgraph.config import get_stream_writer
 from langgraph.constants import Send
 from langgraph.graph import END, MessagesState, START, StateGraph
 
+from studio_common import llm_cache
+from studio_common import tracing
+
 ### LLM
 
-llm = ChatOpenAI(model="gpt-4o", temperature=0) 
+@lru_cache
+def get_llm():
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model="gpt-4o", temperature=0, cache=llm_cache.get_cache("research_assistant"))
 
 ### Schema 
 
@@ -83,28 +91,41 @@ analyst_instructions="""You are tasked with creating a set of AI analyst persona
 
 5. Assign one analyst to each theme."""
 
-def create_analysts(state: GenerateAnalystsState):
-    
-    """ Create analysts """
-    
+def analyst_messages(state: GenerateAnalystsState):
+
+    """ Prompt for creating analysts """
+
     topic=state['topic']
     max_analysts=state['max_analysts']
     human_analyst_feedback=state.get('human_analyst_feedback', '')
-        
-    # Enforce structured output
-    structured_llm = llm.with_structured_output(Perspectives)
 
     # System message
     system_message = analyst_instructions.format(topic=topic,
                                                             human_analyst_feedback=human_analyst_feedback, 
                                                             max_analysts=max_analysts)
+    return [SystemMessage(content=system_message)]+[HumanMessage(content="Generate the set of analysts.")]
+
+def create_analysts(state: GenerateAnalystsState):
+    
+    """ Create analysts """
+    
+    # Enforce structured output
+    structured_llm = get_llm().with_structured_output(Perspectives)
 
     # Generate question 
-    analysts = structured_llm.invoke([SystemMessage(content=system_message)]+[HumanMessage(content="Generate the set of analysts.")])
+    analysts = structured_llm.invoke(analyst_messages(state))
     
     # Write the list of analysis to state
     return {"analysts": analysts.analysts}
 
+async def acreate_analysts(state: GenerateAnalystsState):
+
+    """ Create analysts (async) """
+
+    structured_llm = get_llm().with_structured_output(Perspectives)
+    analysts = await structured_llm.ainvoke(analyst_messages(state))
+    return {"analysts": analysts.analysts}
+
 def human_feedback(state: GenerateAnalystsState):
     """ No-op node that should be interrupted on """
     pass
@@ -138,11 +159,19 @@ def generate_question(state: InterviewState):
 
     # Generate question 
     system_message = question_instructions.format(goals=analyst.persona)
-    question = llm.invoke([SystemMessage(content=system_message)]+messages)
+    question = get_llm().invoke([SystemMessage(content=system_message)]+messages)
         
     # Write messages to state
     return {"messages": [question]}
 
+async def agenerate_question(state: InterviewState):
+
+    """ Node to generate a question (async) """
+
+    system_message = question_instructions.format(goals=state["analyst"].persona)
+    question = await get_llm().ainvoke([SystemMessage(content=system_message)]+state["messages"])
+    return {"messages": [question]}
+
 # Search query writing
 search_instructions = SystemMessage(content=f"""You will be given a conversation between an analyst and an expert. 
 
@@ -154,52 +183,86 @@ Pay particular attention to the final question posed by the analyst.
 
 Convert this final question into a well-structured web search query""")
 
+def format_web_docs(data):
+
+    """ Format Tavily results as source documents """
+
+    search_docs = data.get("results", data)
+    return "\n\n---\n\n".join(
+        [
+            f'<Document href="{doc["url"]}"/>\n{doc["content"]}\n</Document>'
+            for doc in search_docs
+        ]
+    )
+
+def format_wikipedia_docs(search_docs):
+
+    """ Format Wikipedia pages as source documents """
+
+    return "\n\n---\n\n".join(
+        [
+            f'<Document source="{doc.metadata["source"]}" page="{doc.metadata.get("page", "")}"/>\n{doc.page_content}\n</Document>'
+            for doc in search_docs
+        ]
+    )
+
 def search_web(state: InterviewState):
     
     """ Retrieve docs from web search """
 
     # Search
+    from langchain_tavily import TavilySearch  # updated 1.0
     tavily_search = TavilySearch(max_results=3)
 
     # Search query
-    structured_llm = llm.with_structured_output(SearchQuery)
+    structured_llm = get_llm().with_structured_output(SearchQuery)
     search_query = structured_llm.invoke([search_instructions]+state['messages'])
     
     # Search
     data = tavily_search.invoke({"query": search_query.search_query})
-    search_docs = data.get("results", data)
 
      # Format
-    formatted_search_docs = "\n\n---\n\n".join(
-        [
-            f'<Document href="{doc["url"]}"/>\n{doc["content"]}\n</Document>'
-            for doc in search_docs
-        ]
-    )
+    return {"context": [format_web_docs(data)]} 
 
-    return {"context": [formatted_search_docs]} 
+async def asearch_web(state: InterviewState):
+
+    """ Retrieve docs from web search (async) """
+
+    from langchain_tavily import TavilySearch  # updated 1.0
+    tavily_search = TavilySearch(max_results=3)
+    structured_llm = get_llm().with_structured_output(SearchQuery)
+    search_query = await structured_llm.ainvoke([search_instructions]+state['messages'])
+    data = await tavily_search.ainvoke({"query": search_query.search_query})
+    return {"context": [format_web_docs(data)]}
 
 def search_wikipedia(state: InterviewState):
     
     """ Retrieve docs from wikipedia """
 
     # Search query
-    structured_llm = llm.with_structured_output(SearchQuery)
+    structured_llm = get_llm().with_structured_output(SearchQuery)
     search_query = structured_llm.invoke([search_instructions]+state['messages'])
     
     # Search
+    from langchain_community.document_loaders import WikipediaLoader
     search_docs = WikipediaLoader(query=search_query.search_query, 
                                   load_max_docs=2).load()
 
      # Format
-    formatted_search_docs = "\n\n---\n\n".join(
-        [
-            f'<Document source="{doc.metadata["source"]}" page="{doc.metadata.get("page", "")}"/>\n{doc.page_content}\n</Document>'
-            for doc in search_docs
-        ]
-    )
+    return {"context": [format_wikipedia_docs(search_docs)]} 
 
-    return {"context": [formatted_search_docs]} 
+async def asearch_wikipedia(state: InterviewState):
+
+    """ Retrieve docs from wikipedia (async) """
+
+    structured_llm = get_llm().with_structured_output(SearchQuery)
+    search_query = await structured_llm.ainvoke([search_instructions]+state['messages'])
+
+    # The wikipedia client is blocking, so aload() runs it in the default executor
+    from langchain_community.document_loaders import WikipediaLoader
+    search_docs = await WikipediaLoader(query=search_query.search_query,
+                                        load_max_docs=2).aload()
+    return {"context": [format_wikipedia_docs(search_docs)]}
 
 # Generate expert answer
 answer_instructions = """You are an expert being interviewed by an analyst.
@@ -241,7 +304,7 @@ def generate_answer(state: InterviewState):
 
     # Answer question
     system_message = answer_instructions.format(goals=analyst.persona, context=context)
-    answer = llm.invoke([SystemMessage(content=system_message)]+messages)
+    answer = get_llm().invoke([SystemMessage(content=system_message)]+messages)
             
     # Name the message as coming from the expert
     answer.name = "expert"
@@ -249,6 +312,16 @@ def generate_answer(state: InterviewState):
     # Append it to state
     return {"messages": [answer]}
 
+async def agenerate_answer(state: InterviewState):
+
+    """ Node to answer a question (async) """
+
+    analyst = state["analyst"]
+    system_message = answer_instructions.format(goals=analyst.persona, context=state["context"])
+    answer = await get_llm().ainvoke([SystemMessage(content=system_message)]+state["messages"])
+    answer.name = "expert"
+    return {"messages": [answer]}
+
 def save_interview(state: InterviewState):
     
     """ Save interviews """
@@ -351,19 +424,28 @@ def write_section(state: InterviewState):
    
     # Write section using either the gathered source docs from interview (context) or the interview itself (interview)
     system_message = section_writer_instructions.format(focus=analyst.description)
-    section = llm.invoke([SystemMessage(content=system_message)]+[HumanMessage(content=f"Use this source to write your section: {context}")]) 
+    section = get_llm().invoke([SystemMessage(content=system_message)]+[HumanMessage(content=f"Use this source to write your section: {context}")]) 
                 
     # Append it to state
     return {"sections": [section.content]}
 
+async def awrite_section(state: InterviewState):
+
+    """ Node to write a section (async) """
+
+    system_message = section_writer_instructions.format(focus=state["analyst"].description)
+    section = await get_llm().ainvoke([SystemMessage(content=system_message)]+[HumanMessage(content=f"Use this source to write your section: {state['context']}")])
+    return {"sections": [section.content]}
+
 # Add nodes and edges 
 interview_builder = StateGraph(InterviewState)
-interview_builder.add_node("ask_question", generate_question)
-interview_builder.add_node("search_web", search_web)
-interview_builder.add_node("search_wikipedia", search_wikipedia)
-interview_builder.add_node("answer_question", generate_answer)
+# Each LLM / search node has an async twin, used automatically under ainvoke / astream
+interview_builder.add_node("ask_question", RunnableLambda(generate_question, afunc=agenerate_question))
+interview_builder.add_node("search_web", RunnableLambda(search_web, afunc=asearch_web))
+interview_builder.add_node("search_wikipedia", RunnableLambda(search_wikipedia, afunc=asearch_wikipedia))
+interview_builder.add_node("answer_question", RunnableLambda(generate_answer, afunc=agenerate_answer))
 interview_builder.add_node("save_interview", save_interview)
-interview_builder.add_node("write_section", write_section)
+interview_builder.add_node("write_section", RunnableLambda(write_section, afunc=awrite_section))
 
 # Flow
 interview_builder.add_edge(START, "ask_question")
@@ -429,6 +511,50 @@ Here are the memos from your analysts to build your report from:
 
 {context}"""
 
+# Report sections are streamed token by token as custom stream events:
+# {"report_section": "introduction" | "content" | "conclusion", "token": str} and a final {"report_section": ..., "done": True}
+# `stream` bypasses the LLM cache, so with a cache configured the section is generated with
+# `invoke` (served from the cache when possible) and sent as a single token event.
+def uses_cache(llm):
+
+    """ Whether invoke would look the model's response up in an LLM cache """
+
+    if isinstance(llm.cache, BaseCache):
+        return True
+    return llm.cache is not False and get_llm_cache() is not None
+
+def stream_section(messages, section):
+
+    """ Generate a section, forwarding its tokens to the custom stream, and return the full text """
+
+    writer = get_stream_writer()
+    llm = get_llm()
+    chunks = [llm.invoke(messages)] if uses_cache(llm) else llm.stream(messages)
+    text = ""
+    for chunk in chunks:
+        text += chunk.content
+        writer({"report_section": section, "token": chunk.content})
+    writer({"report_section": section, "done": True})
+    return text
+
+async def astream_section(messages, section):
+
+    """ Generate a section, forwarding its tokens to the custom stream, and return the full text (async) """
+
+    writer = get_stream_writer()
+    llm = get_llm()
+    text = ""
+    if uses_cache(llm):
+        chunk = await llm.ainvoke(messages)
+        text = chunk.content
+        writer({"report_section": section, "token": chunk.content})
+    else:
+        async for chunk in llm.astream(messages):
+            text += chunk.content
+            writer({"report_section": section, "token": chunk.content})
+    writer({"report_section": section, "done": True})
+    return text
+
 def write_report(state: ResearchGraphState):
 
     """ Node to write the final report body """
@@ -442,8 +568,17 @@ def write_report(state: ResearchGraphState):
     
     # Summarize the sections into a final report
     system_message = report_writer_instructions.format(topic=topic, context=formatted_str_sections)    
-    report = llm.invoke([SystemMessage(content=system_message)]+[HumanMessage(content=f"Write a report based upon these memos.")]) 
-    return {"content": report.content}
+    report = stream_section([SystemMessage(content=system_message)]+[HumanMessage(content=f"Write a report based upon these memos.")], "content")
+    return {"content": report}
+
+async def awrite_report(state: ResearchGraphState):
+
+    """ Node to write the final report body (async) """
+
+    formatted_str_sections = "\n\n".join([f"{section}" for section in state["sections"]])
+    system_message = report_writer_instructions.format(topic=state["topic"], context=formatted_str_sections)
+    report = await astream_section([SystemMessage(content=system_message)]+[HumanMessage(content=f"Write a report based upon these memos.")], "content")
+    return {"content": report}
 
 # Write the introduction or conclusion
 intro_conclusion_instructions = """You are a technical writer finishing a report on {topic}
@@ -482,8 +617,17 @@ def write_introduction(state: ResearchGraphState):
     # Summarize the sections into a final report
     
     instructions = intro_conclusion_instructions.format(topic=topic, formatted_str_sections=formatted_str_sections)    
-    intro = llm.invoke([instructions]+[HumanMessage(content=f"Write the report introduction")]) 
-    return {"introduction": intro.content}
+    intro = stream_section([instructions]+[HumanMessage(content=f"Write the report introduction")], "introduction")
+    return {"introduction": intro}
+
+async def awrite_introduction(state: ResearchGraphState):
+
+    """ Node to write the introduction (async) """
+
+    formatted_str_sections = "\n\n".join([f"{section}" for section in state["sections"]])
+    instructions = intro_conclusion_instructions.format(topic=state["topic"], formatted_str_sections=formatted_str_sections)
+    intro = await astream_section([instructions]+[HumanMessage(content=f"Write the report introduction")], "introduction")
+    return {"introduction": intro}
 
 def write_conclusion(state: ResearchGraphState):
 
@@ -499,38 +643,136 @@ def write_conclusion(state: ResearchGraphState):
     # Summarize the sections into a final report
     
     instructions = intro_conclusion_instructions.format(topic=topic, formatted_str_sections=formatted_str_sections)    
-    conclusion = llm.invoke([instructions]+[HumanMessage(content=f"Write the report conclusion")]) 
-    return {"conclusion": conclusion.content}
+    conclusion = stream_section([instructions]+[HumanMessage(content=f"Write the report conclusion")], "conclusion")
+    return {"conclusion": conclusion}
+
+async def awrite_conclusion(state: ResearchGraphState):
+
+    """ Node to write the conclusion (async) """
+
+    formatted_str_sections = "\n\n".join([f"{section}" for section in state["sections"]])
+    instructions = intro_conclusion_instructions.format(topic=state["topic"], formatted_str_sections=formatted_str_sections)
+    conclusion = await astream_section([instructions]+[HumanMessage(content=f"Write the report conclusion")], "conclusion")
+    return {"conclusion": conclusion}
+
+class ReportAssembler:
+
+    """ Incrementally assemble the final report in order: introduction, content, conclusion, sources.
+
+    Text for a section is released as soon as all earlier sections are complete, so the
+    introduction streams live while the body and conclusion are buffered until their turn.
+    The "## Insights" title is dropped from the body and its "## Sources" list is moved to the end.
+    """
+
+    order = ("introduction", "content", "conclusion")
+    sources_marker = "\n## Sources\n"
+
+    def __init__(self):
+        self.buffers = {section: "" for section in self.order}
+        self.done = set()
+        self.current = 0 # Index of the section being emitted
+        self.emitted = 0 # Characters of the current section already emitted
+        self.sources = None
+        self.text = "" # Everything emitted so far
+
+    def add(self, section, token):
+        """ Add a token to a section and return any newly releasable report text """
+        self.buffers[section] += token
+        return self._release()
+
+    def finish(self, section):
+        """ Mark a section complete and return any newly releasable report text """
+        self.done.add(section)
+        return self._release()
+
+    def _visible(self, section):
+        text = self.buffers[section]
+        if section != "content":
+            return text
+        finished = section in self.done
+        if not finished and "## Insights".startswith(text):
+            return ""
+        text = text.removeprefix("## Insights")
+        body, marker, sources = text.partition(self.sources_marker)
+        if marker:
+            if finished:
+                self.sources = sources
+            return body
+        if finished:
+            return text
+        # Hold back a possible partial "## Sources" header at the end of the buffer
+        for size in range(len(self.sources_marker) - 1, 0, -1):
+            if text.endswith(self.sources_marker[:size]):
+                return text[:-size]
+        return text
+
+    def _release(self):
+        released = ""
+        while self.current < len(self.order):
+            section = self.order[self.current]
+            visible = self._visible(section)
+            released += visible[self.emitted:]
+            self.emitted = len(visible)
+            if section not in self.done:
+                break
+            self.current += 1
+            self.emitted = 0
+            if self.current < len(self.order):
+                released += "\n\n---\n\n"
+            elif self.sources is not None:
+                released += "\n\n## Sources\n" + self.sources
+        self.text += released
+        return released
 
 def finalize_report(state: ResearchGraphState):
 
     """ The is the "reduce" step where we gather all the sections, combine them, and reflect on them to write the intro/conclusion """
 
-    # Save full final report
-    content = state["content"]
-    if content.startswith("## Insights"):
-        content = content.strip("## Insights")
-    if "## Sources" in content:
-        try:
-            content, sources = content.split("\n## Sources\n")
-        except:
-            sources = None
-    else:
-        sources = None
-
-    final_report = state["introduction"] + "\n\n---\n\n" + content + "\n\n---\n\n" + state["conclusion"]
-    if sources is not None:
-        final_report += "\n\n## Sources\n" + sources
-    return {"final_report": final_report}
+    # Save full final report, assembled the same way it is streamed
+    assembler = ReportAssembler()
+    for section in ReportAssembler.order:
+        assembler.add(section, state[section])
+        assembler.finish(section)
+    return {"final_report": assembler.text}
+
+def stream_report(graph, input, config):
+
+    """ Run (or resume) the graph and yield the final report text as soon as each part is ready """
+
+    assembler = ReportAssembler()
+    for event in graph.stream(input, config, stream_mode="custom"):
+        if "report_section" not in event:
+            continue
+        if event.get("done"):
+            text = assembler.finish(event["report_section"])
+        else:
+            text = assembler.add(event["report_section"], event["token"])
+        if text:
+            yield text
+
+async def astream_report(graph, input, config):
+
+    """ Async variant of stream_report """
+
+    assembler = ReportAssembler()
+    async for event in graph.astream(input, config, stream_mode="custom"):
+        if "report_section" not in event:
+            continue
+        if event.get("done"):
+            text = assembler.finish(event["report_section"])
+        else:
+            text = assembler.add(event["report_section"], event["token"])
+        if text:
+            yield text
 
 # Add nodes and edges 
 builder = StateGraph(ResearchGraphState)
-builder.add_node("create_analysts", create_analysts)
+builder.add_node("create_analysts", RunnableLambda(create_analysts, afunc=acreate_analysts))
 builder.add_node("human_feedback", human_feedback)
 builder.add_node("conduct_interview", interview_builder.compile())
-builder.add_node("write_report",write_report)
-builder.add_node("write_introduction",write_introduction)
-builder.add_node("write_conclusion",write_conclusion)
+builder.add_node("write_report", RunnableLambda(write_report, afunc=awrite_report))
+builder.add_node("write_introduction", RunnableLambda(write_introduction, afunc=awrite_introduction))
+builder.add_node("write_conclusion", RunnableLambda(write_conclusion, afunc=awrite_conclusion))
 builder.add_node("finalize_report",finalize_report)
 
 # Logic
@@ -544,4 +786,4 @@ builder.add_edge(["write_conclusion", "write_report", "write_introduction"], "fi
 builder.add_edge("finalize_report", END)
 
 # Compile
-graph = builder.compile(interrupt_before=['human_feedback'])
\ No newline at end of file
+graph = tracing.instrument(builder.compile(interrupt_before=['human_feedback']), "research_assistant")
\ No newline at end of file
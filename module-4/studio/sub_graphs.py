@@ -2,6 +2,7 @@ from operator import add
 from typing import List, Optional, Annotated
 from typing_extensions import TypedDict
 from langgraph.graph import StateGraph, START, END
+from studio_common import tracing
 
 # The structure of the logs
 class Log(TypedDict):
@@ -100,4 +101,4 @@ entry_builder.add_edge("clean_logs", "question_summarization")
 entry_builder.add_edge("failure_analysis", END)
 entry_builder.add_edge("question_summarization", END)
 
-graph = entry_builder.compile()
\ No newline at end of file
+graph = tracing.instrument(entry_builder.compile(), "sub_graphs")
\ No newline at end of file
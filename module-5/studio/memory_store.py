@@ -1,12 +1,18 @@
+from functools import lru_cache
+
 from langchain_core.messages import SystemMessage
 from langchain_core.runnables.config import RunnableConfig
-from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, MessagesState, START, END
 from langgraph.store.base import BaseStore
 import configuration
+from studio_common import llm_cache
+from studio_common import tracing
 
 # Initialize the LLM
-model = ChatOpenAI(model="gpt-4o", temperature=0) 
+@lru_cache
+def get_model():
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model="gpt-4o", temperature=0, cache=llm_cache.get_cache("chatbot_memory"))
 
 # Chatbot instruction
 MODEL_SYSTEM_MESSAGE = """You are a helpful assistant with memory that provides information about the user. 
@@ -61,7 +67,7 @@ def call_model(state: MessagesState, config: RunnableConfig, store: BaseStore):
     system_msg = MODEL_SYSTEM_MESSAGE.format(memory=existing_memory_content)
 
     # Respond using memory as well as the chat history
-    response = model.invoke([SystemMessage(content=system_msg)]+state["messages"])
+    response = get_model().invoke([SystemMessage(content=system_msg)]+state["messages"])
 
     return {"messages": response}
 
@@ -88,7 +94,7 @@ def write_memory(state: MessagesState, config: RunnableConfig, store: BaseStore)
         
     # Format the memory in the system prompt
     system_msg = CREATE_MEMORY_INSTRUCTION.format(memory=existing_memory_content)
-    new_memory = model.invoke([SystemMessage(content=system_msg)]+state['messages'])
+    new_memory = get_model().invoke([SystemMessage(content=system_msg)]+state['messages'])
 
     # Overwrite the existing memory in the store 
     key = "user_memory"
@@ -101,4 +107,4 @@ builder.add_node("write_memory", write_memory)
 builder.add_edge(START, "call_model")
 builder.add_edge("call_model", "write_memory")
 builder.add_edge("write_memory", END)
-graph = builder.compile()
\ No newline at end of file
+graph = tracing.instrument(builder.compile(), "chatbot_memory")
\ No newline at end of file
@@ -1,32 +1,39 @@
 import uuid 
+from functools import lru_cache
 
 from pydantic import BaseModel, Field
 
-from trustcall import create_extractor
-
 from langchain_core.messages import SystemMessage
 from langchain_core.messages import merge_message_runs
 from langchain_core.runnables.config import RunnableConfig
-from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, MessagesState, START, END
 from langgraph.store.base import BaseStore
 import configuration
+from studio_common import llm_cache
+from studio_common import tracing
 
 # Initialize the LLM
-model = ChatOpenAI(model="gpt-4o", temperature=0) 
+@lru_cache
+def get_model():
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model="gpt-4o", temperature=0, cache=llm_cache.get_cache("chatbot_memory_collection"))
 
 # Memory schema
 class Memory(BaseModel):
     content: str = Field(description="The main content of the memory. For example: User expressed interest in learning about French.")
 
 # Create the Trustcall extractor
-trustcall_extractor = create_extractor(
-    model,
-    tools=[Memory],
-    tool_choice="Memory",
-    # This allows the extractor to insert new memories
-    enable_inserts=True,
-)
+@lru_cache
+def get_trustcall_extractor():
+    """Create the Trustcall extractor on first use; trustcall is slow to import"""
+    from trustcall import create_extractor
+    return create_extractor(
+        get_model(),
+        tools=[Memory],
+        tool_choice="Memory",
+        # This allows the extractor to insert new memories
+        enable_inserts=True,
+    )
 
 # Chatbot instruction
 MODEL_SYSTEM_MESSAGE = """You are a helpful chatbot. You are designed to be a companion to a user. 
@@ -62,7 +69,7 @@ def call_model(state: MessagesState, config: RunnableConfig, store: BaseStore):
     system_msg = MODEL_SYSTEM_MESSAGE.format(memory=info)
 
     # Respond using memory as well as the chat history
-    response = model.invoke([SystemMessage(content=system_msg)]+state["messages"])
+    response = get_model().invoke([SystemMessage(content=system_msg)]+state["messages"])
 
     return {"messages": response}
 
@@ -94,7 +101,7 @@ def write_memory(state: MessagesState, config: RunnableConfig, store: BaseStore)
     updated_messages=list(merge_message_runs(messages=[SystemMessage(content=TRUSTCALL_INSTRUCTION)] + state["messages"]))
 
     # Invoke the extractor
-    result = trustcall_extractor.invoke({"messages": updated_messages, 
+    result = get_trustcall_extractor().invoke({"messages": updated_messages, 
                                         "existing": existing_memories})
 
     # Save the memories from Trustcall to the store
@@ -111,4 +118,4 @@ builder.add_node("write_memory", write_memory)
 builder.add_edge(START, "call_model")
 builder.add_edge("call_model", "write_memory")
 builder.add_edge("write_memory", END)
-graph = builder.compile()
\ No newline at end of file
+graph = tracing.instrument(builder.compile(), "chatbot_memory_collection")
\ No newline at end of file
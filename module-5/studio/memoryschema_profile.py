@@ -1,16 +1,20 @@
-from pydantic import BaseModel, Field
+from functools import lru_cache
 
-from trustcall import create_extractor
+from pydantic import BaseModel, Field
 
 from langchain_core.messages import SystemMessage
 from langchain_core.runnables.config import RunnableConfig
-from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, MessagesState, START, END
 from langgraph.store.base import BaseStore
 import configuration
+from studio_common import llm_cache
+from studio_common import tracing
 
 # Initialize the LLM
-model = ChatOpenAI(model="gpt-4o", temperature=0) 
+@lru_cache
+def get_model():
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model="gpt-4o", temperature=0, cache=llm_cache.get_cache("chatbot_memory_profile"))
 
 # Schema 
 class UserProfile(BaseModel):
@@ -20,11 +24,15 @@ class UserProfile(BaseModel):
     interests: list = Field(description="A list of the user's interests")
 
 # Create the extractor
-trustcall_extractor = create_extractor(
-    model,
-    tools=[UserProfile],
-    tool_choice="UserProfile", # Enforces use of the UserProfile tool
-)
+@lru_cache
+def get_trustcall_extractor():
+    """Create the Trustcall extractor on first use; trustcall is slow to import"""
+    from trustcall import create_extractor
+    return create_extractor(
+        get_model(),
+        tools=[UserProfile],
+        tool_choice="UserProfile", # Enforces use of the UserProfile tool
+    )
 
 # Chatbot instruction
 MODEL_SYSTEM_MESSAGE = """You are a helpful assistant with memory that provides information about the user. 
@@ -63,7 +71,7 @@ def call_model(state: MessagesState, config: RunnableConfig, store: BaseStore):
     system_msg = MODEL_SYSTEM_MESSAGE.format(memory=formatted_memory)
 
     # Respond using memory as well as the chat history
-    response = model.invoke([SystemMessage(content=system_msg)]+state["messages"])
+    response = get_model().invoke([SystemMessage(content=system_msg)]+state["messages"])
 
     return {"messages": response}
 
@@ -85,7 +93,7 @@ def write_memory(state: MessagesState, config: RunnableConfig, store: BaseStore)
     existing_profile = {"UserProfile": existing_memory.value} if existing_memory else None
     
     # Invoke the extractor
-    result = trustcall_extractor.invoke({"messages": [SystemMessage(content=TRUSTCALL_INSTRUCTION)]+state["messages"], "existing": existing_profile})
+    result = get_trustcall_extractor().invoke({"messages": [SystemMessage(content=TRUSTCALL_INSTRUCTION)]+state["messages"], "existing": existing_profile})
     
     # Get the updated profile as a JSON object
     updated_profile = result["responses"][0].model_dump()
@@ -101,4 +109,4 @@ builder.add_node("write_memory", write_memory)
 builder.add_edge(START, "call_model")
 builder.add_edge("call_model", "write_memory")
 builder.add_edge("write_memory", END)
-graph = builder.compile()
\ No newline at end of file
+graph = tracing.instrument(builder.compile(), "chatbot_memory_profile")
\ No newline at end of file
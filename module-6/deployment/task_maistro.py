@@ -1,18 +1,15 @@
 import uuid
 from datetime import datetime
+from functools import lru_cache
 
 from pydantic import BaseModel, Field
 
-from trustcall import create_extractor
-
 from typing import Literal, Optional, TypedDict
 
 from langchain_core.runnables import RunnableConfig
 from langchain_core.messages import merge_message_runs
 from langchain_core.messages import SystemMessage, HumanMessage
 
-from langchain_openai import ChatOpenAI
-
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import StateGraph, MessagesState, START, END
 from langgraph.store.base import BaseStore
@@ -138,14 +135,21 @@ class UpdateMemory(TypedDict):
     update_type: Literal['user', 'todo', 'instructions']
 
 # Initialize the model
-model = ChatOpenAI(model="gpt-4o", temperature=0)
+@lru_cache
+def get_model():
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model="gpt-4o", temperature=0)
 
 ## Create the Trustcall extractors for updating the user profile and ToDo list
-profile_extractor = create_extractor(
-    model,
-    tools=[Profile],
-    tool_choice="Profile",
-)
+@lru_cache
+def get_profile_extractor():
+    """Create the Trustcall extractor on first use; trustcall is slow to import"""
+    from trustcall import create_extractor
+    return create_extractor(
+        get_model(),
+        tools=[Profile],
+        tool_choice="Profile",
+    )
 
 ## Prompts 
 
@@ -246,7 +250,7 @@ def task_mAIstro(state: MessagesState, config: RunnableConfig, store: BaseStore)
     system_msg = MODEL_SYSTEM_MESSAGE.format(task_maistro_role=task_maistro_role, user_profile=user_profile, todo=todo, instructions=instructions)
 
     # Respond using memory as well as the chat history
-    response = model.bind_tools([UpdateMemory], parallel_tool_calls=False).invoke([SystemMessage(content=system_msg)]+state["messages"])
+    response = get_model().bind_tools([UpdateMemory], parallel_tool_calls=False).invoke([SystemMessage(content=system_msg)]+state["messages"])
 
     return {"messages": [response]}
 
@@ -278,7 +282,7 @@ def update_profile(state: MessagesState, config: RunnableConfig, store: BaseStor
     updated_messages=list(merge_message_runs(messages=[SystemMessage(content=TRUSTCALL_INSTRUCTION_FORMATTED)] + state["messages"][:-1]))
 
     # Invoke the extractor
-    result = profile_extractor.invoke({"messages": updated_messages, 
+    result = get_profile_extractor().invoke({"messages": updated_messages, 
                                          "existing": existing_memories})
 
     # Save save the memories from Trustcall to the store
@@ -322,8 +326,9 @@ def update_todos(state: MessagesState, config: RunnableConfig, store: BaseStore)
     spy = Spy()
     
     # Create the Trustcall extractor for updating the ToDo list 
+    from trustcall import create_extractor
     todo_extractor = create_extractor(
-    model,
+    get_model(),
     tools=[ToDo],
     tool_choice=tool_name,
     enable_inserts=True
@@ -362,7 +367,7 @@ def update_instructions(state: MessagesState, config: RunnableConfig, store: Bas
         
     # Format the memory in the system prompt
     system_msg = CREATE_INSTRUCTIONS.format(current_instructions=existing_memory.value if existing_memory else None)
-    new_memory = model.invoke([SystemMessage(content=system_msg)]+state['messages'][:-1] + [HumanMessage(content="Please update the instructions based on the conversation")])
+    new_memory = get_model().invoke([SystemMessage(content=system_msg)]+state['messages'][:-1] + [HumanMessage(content="Please update the instructions based on the conversation")])
 
     # Overwrite the existing memory in the store 
     key = "user_instructions"
@@ -0,0 +1,5 @@
+"""Support code shared by the studio graphs in module-*/studio.
+
+Each studio's langgraph.json lists the repository root as a dependency, which puts
+this package on the path for `langgraph dev` and in deployed images.
+"""
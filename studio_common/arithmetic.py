@@ -0,0 +1,119 @@
+"""Parse plain arithmetic requests and evaluate them without a model call.
+
+Handles expressions ("3 * 4 + 5", "what is 10 divided by 4?") and chained
+instructions in the style of the course notebooks ("Add 3 and 4. Multiply the
+output by 2. Divide the output by 5"). Every step needs an operator or an
+instruction verb, so bare numbers ("42") and dates ("2024-1-15") are not
+arithmetic. Anything else returns None so the caller can fall back to the model.
+"""
+
+import ast
+import re
+from typing import Callable, Optional
+
+NUMBER = r"-?\d+(?:\.\d+)?"
+# An expression is unsigned numbers and these symbols; anything else ("0x10", "1.2.3",
+# "3rd") means the text is not plain arithmetic
+TOKEN = re.compile(r"\d+(?:\.\d+)?|[+\-*/()]")
+
+# Spelled-out operators, two-word forms first
+OPERATOR_WORDS = [
+    ("multiplied by", "*"),
+    ("divided by", "/"),
+    ("times", "*"),
+    ("plus", "+"),
+    ("minus", "-"),
+    ("over", "/"),
+    ("x", "*"),
+]
+
+# Instructions such as "add 3 and 4" or "divide 10 by 2"
+VERB_PATTERNS = [
+    (re.compile(rf"^(?:add|sum)\s+({NUMBER})\s+(?:and|to|with|plus)\s+({NUMBER})$"), "{0} + {1}"),
+    (re.compile(rf"^subtract\s+({NUMBER})\s+from\s+({NUMBER})$"), "{1} - {0}"),
+    (re.compile(rf"^multiply\s+({NUMBER})\s+(?:and|by|with|times)\s+({NUMBER})$"), "{0} * {1}"),
+    (re.compile(rf"^divide\s+({NUMBER})\s+(?:by|over)\s+({NUMBER})$"), "{0} / {1}"),
+]
+
+PREVIOUS_RESULT = re.compile(r"\b(?:the\s+)?(?:output|result|answer)\b|\bthat\b|\bit\b")
+FILLER = re.compile(r"^(?:please\s+)?(?:what\s+is|what's|whats|calculate|compute|evaluate|solve)\s+|[?!=]+$")
+
+# Three or more numbers joined by unspaced dashes or slashes: dates, phone numbers, ids
+DATE_LIKE = re.compile(r"\d[-/]\d+[-/]\d")
+
+def _format(value: float) -> str:
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+def _normalize(step: str, previous: Optional[float]) -> Optional[str]:
+    """Turn one instruction into a Python arithmetic expression string, or None."""
+    step = step.strip().lower().replace(",", "")
+    step = FILLER.sub("", step).strip()
+    if PREVIOUS_RESULT.search(step):
+        if previous is None:
+            return None
+        step = PREVIOUS_RESULT.sub(_format(previous), step)
+    for pattern, template in VERB_PATTERNS:
+        match = pattern.match(step)
+        if match:
+            return template.format(*match.groups())
+    for word, symbol in OPERATOR_WORDS:
+        # Whole words only, so "0x10" stays one token instead of becoming 0 * 10
+        step = re.sub(rf"(?<![\w.]){re.escape(word)}(?![\w.])", f" {symbol} ", step)
+    return step
+
+def _tokens(expression: str) -> list[str]:
+    return [token for token in re.split(r"\s+|([+\-*/()])", expression) if token]
+
+def _evaluate(node: ast.AST, tools: dict[str, Callable]) -> float:
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+        value = _evaluate(node.operand, tools)
+        return tools["multiply"](value, -1) if isinstance(node.op, ast.USub) else value
+    if isinstance(node, ast.BinOp):
+        left, right = _evaluate(node.left, tools), _evaluate(node.right, tools)
+        if isinstance(node.op, ast.Add):
+            return tools["add"](left, right)
+        if isinstance(node.op, ast.Sub):
+            return tools["add"](left, tools["multiply"](right, -1))
+        if isinstance(node.op, ast.Mult):
+            return tools["multiply"](left, right)
+        if isinstance(node.op, ast.Div):
+            return tools["divide"](left, right)
+    raise ValueError(f"Unsupported expression: {ast.dump(node)}")
+
+def solve(text: str, tools: dict[str, Callable]) -> Optional[list[tuple[str, float]]]:
+    """Evaluate an arithmetic request with the given add/multiply/divide functions.
+
+    Returns (expression, value) for each step, or None if the text is not plain
+    arithmetic (or divides by zero).
+    """
+    steps = [s for s in re.split(r"\.(?!\d)|;|\bthen\b", text) if s.strip(" \t\nand")]
+    if not steps:
+        return None
+    solved, value = [], None
+    for step in steps:
+        if DATE_LIKE.search(step):
+            return None
+        expression = _normalize(re.sub(r"^\s*and\s+", "", step), value)
+        if not expression or not all(TOKEN.fullmatch(token) for token in _tokens(expression)):
+            return None
+        try:
+            tree = ast.parse(expression, mode="eval").body
+            # A bare (possibly negated) number is not a calculation
+            if not any(isinstance(node, ast.BinOp) for node in ast.walk(tree)):
+                return None
+            value = _evaluate(tree, tools)
+        except (SyntaxError, ValueError, ZeroDivisionError):
+            return None
+        solved.append((" ".join(expression.split()), value))
+    return solved
+
+def answer(text: str, tools: dict[str, Callable]) -> Optional[str]:
+    """Answer text for an arithmetic request, or None to fall back to the model."""
+    solved = solve(text, tools)
+    if solved is None:
+        return None
+    return "\n".join(f"{expression} = {_format(value)}" for expression, value in solved)
@@ -0,0 +1,163 @@
+import atexit
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+# The cache is opt-in: set LLM_CACHE_PATH (e.g. in .env) to a SQLite file to enable it
+CACHE_PATH_ENV = "LLM_CACHE_PATH"
+CACHE_MAX_BYTES_ENV = "LLM_CACHE_MAX_BYTES"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Hits are recorded in memory and written in one transaction after this many lookups
+FLUSH_EVERY = 64
+
+class SQLiteLRUCache(BaseCache):
+    """Persistent LLM response cache with size-bounded LRU eviction.
+
+    Entries are keyed by a hash of the llm string (model name, parameters, bound tools
+    or structured output schema) and the serialized message list, so only identical
+    requests are served from the cache. Use it with deterministic (temperature=0) models.
+
+    Hit and miss counters are kept per namespace, which is typically the graph name.
+    Access times and counters are written in batches, not on every lookup, and the
+    total size is kept up to date by triggers, so neither hits nor writes scan the table.
+    """
+
+    def __init__(self, database_path: str, namespace: str = "default",
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.database_path = database_path
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # key -> last access time, and namespace counters, not yet written
+        self.touched: dict[str, float] = {}
+        self.pending = {"hits": 0, "misses": 0}
+        self.conn = sqlite3.connect(database_path, check_same_thread=False)
+        self.conn.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS llm_cache_last_access ON llm_cache (last_access);
+            CREATE TABLE IF NOT EXISTS llm_cache_stats (
+                namespace TEXT PRIMARY KEY,
+                hits INTEGER NOT NULL DEFAULT 0,
+                misses INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS llm_cache_size (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                total INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO llm_cache_size (id, total) SELECT 0, COALESCE(SUM(size), 0) FROM llm_cache;
+            CREATE TRIGGER IF NOT EXISTS llm_cache_size_insert AFTER INSERT ON llm_cache
+                BEGIN UPDATE llm_cache_size SET total = total + new.size WHERE id = 0; END;
+            CREATE TRIGGER IF NOT EXISTS llm_cache_size_update AFTER UPDATE OF size ON llm_cache
+                BEGIN UPDATE llm_cache_size SET total = total + new.size - old.size WHERE id = 0; END;
+            CREATE TRIGGER IF NOT EXISTS llm_cache_size_delete AFTER DELETE ON llm_cache
+                BEGIN UPDATE llm_cache_size SET total = total - old.size WHERE id = 0; END;
+            """
+        )
+        self.conn.commit()
+        atexit.register(self.flush)
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode()).hexdigest()
+
+    def _write_pending(self) -> None:
+        # Called with the lock held; the caller commits
+        self.conn.executemany("UPDATE llm_cache SET last_access = ? WHERE key = ?",
+                              [(accessed, key) for key, accessed in self.touched.items()])
+        if self.pending["hits"] or self.pending["misses"]:
+            self.conn.execute(
+                "INSERT INTO llm_cache_stats (namespace, hits, misses) VALUES (?, ?, ?) "
+                "ON CONFLICT(namespace) DO UPDATE SET hits = hits + excluded.hits, misses = misses + excluded.misses",
+                (self.namespace, self.pending["hits"], self.pending["misses"]),
+            )
+        self.touched.clear()
+        self.pending = {"hits": 0, "misses": 0}
+
+    def flush(self) -> None:
+        """Write access times and counters recorded since the last write."""
+        with self.lock:
+            self._write_pending()
+            self.conn.commit()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        """Look up based on prompt and llm_string."""
+        key = self._key(prompt, llm_string)
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.pending["misses"] += 1
+            else:
+                self.pending["hits"] += 1
+                self.touched[key] = time.time()
+            if self.pending["hits"] + self.pending["misses"] >= FLUSH_EVERY:
+                self._write_pending()
+                self.conn.commit()
+        return loads(row[0], allowed_objects="core") if row is not None else None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """Update cache based on prompt and llm_string, evicting least recently used entries."""
+        value = dumps(return_val)
+        key = self._key(prompt, llm_string)
+        with self.lock:
+            # An upsert rather than INSERT OR REPLACE, whose implicit delete skips the size trigger
+            self.conn.execute(
+                "INSERT INTO llm_cache (key, value, size, last_access) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size, "
+                "last_access = excluded.last_access",
+                (key, value, len(value), time.time()),
+            )
+            self._write_pending()
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self) -> None:
+        (total,) = self.conn.execute("SELECT total FROM llm_cache_size WHERE id = 0").fetchone()
+        if total <= self.max_bytes:
+            return
+        # Walk entries from least to most recently used until we are back under the limit
+        to_delete = []
+        for key, size in self.conn.execute("SELECT key, size FROM llm_cache ORDER BY last_access"):
+            if total <= self.max_bytes:
+                break
+            to_delete.append((key,))
+            total -= size
+        self.conn.executemany("DELETE FROM llm_cache WHERE key = ?", to_delete)
+
+    def clear(self, **kwargs) -> None:
+        """Clear all cached responses (counters are kept)."""
+        with self.lock:
+            self.conn.execute("DELETE FROM llm_cache")
+            self.conn.commit()
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Return hit / miss counters for every namespace sharing this database."""
+        with self.lock:
+            self._write_pending()
+            self.conn.commit()
+            rows = self.conn.execute("SELECT namespace, hits, misses FROM llm_cache_stats").fetchall()
+        return {namespace: {"hits": hits, "misses": misses} for namespace, hits, misses in rows}
+
+def get_cache(namespace: str) -> Optional[SQLiteLRUCache]:
+    """Return a cache for the given graph if LLM_CACHE_PATH is set, otherwise None.
+
+    None leaves the model's default behavior (no cache, or the global LangChain cache) unchanged.
+    """
+    database_path = os.environ.get(CACHE_PATH_ENV)
+    if not database_path:
+        return None
+    max_bytes = int(os.environ.get(CACHE_MAX_BYTES_ENV, DEFAULT_MAX_BYTES))
+    return SQLiteLRUCache(database_path, namespace=namespace, max_bytes=max_bytes)
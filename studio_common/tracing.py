@@ -0,0 +1,209 @@
+"""Per-node latency tracing for the studio graphs.
+
+Set NODE_TRACE_DIR (e.g. in .env) to record a span for every node run to
+`spans.jsonl` in that directory and keep `metrics.prom` (Prometheus text format)
+up to date: it is rewritten every METRICS_INTERVAL seconds while spans arrive, and
+at exit. Then inspect a trace from the repository root with:
+
+    python -m studio_common.tracing spans.jsonl
+    python -m studio_common.tracing spans.jsonl --thread <thread_id>
+"""
+
+import argparse
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+TRACE_DIR_ENV = "NODE_TRACE_DIR"
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float("inf"))
+
+# Seconds between rewrites of metrics.prom
+METRICS_INTERVAL = 5.0
+
+class SpanExporter:
+    """Append spans to a JSONL file and periodically rewrite a Prometheus text file with
+    node latency histograms."""
+
+    def __init__(self, directory: str, metrics_interval: float = METRICS_INTERVAL):
+        os.makedirs(directory, exist_ok=True)
+        self.spans_path = os.path.join(directory, "spans.jsonl")
+        self.metrics_path = os.path.join(directory, "metrics.prom")
+        self.metrics_interval = metrics_interval
+        self.lock = threading.Lock()
+        self.buckets = defaultdict(lambda: [0] * len(BUCKETS))
+        self.sums = defaultdict(float)
+        self.errors = defaultdict(int)
+        # Set when a span arrives; the writer thread rewrites the metrics and clears it
+        self.dirty = threading.Event()
+        self.writer: Optional[threading.Thread] = None
+        atexit.register(self.write_metrics)
+
+    def export(self, span: dict) -> None:
+        key = (span["graph"], span["node"])
+        with self.lock:
+            with open(self.spans_path, "a") as f:
+                f.write(json.dumps(span) + "\n")
+            for i, bound in enumerate(BUCKETS):
+                if span["duration"] <= bound:
+                    self.buckets[key][i] += 1
+            self.sums[key] += span["duration"]
+            if span["error"]:
+                self.errors[key] += 1
+            if self.writer is None:
+                self.writer = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+                self.writer.start()
+            self.dirty.set()
+
+    def _run(self) -> None:
+        while True:
+            self.dirty.wait()
+            time.sleep(self.metrics_interval)
+            self.write_metrics()
+
+    def write_metrics(self) -> None:
+        """Rewrite metrics.prom now, if spans arrived since the last rewrite."""
+        with self.lock:
+            if not self.dirty.is_set():
+                return
+            self.dirty.clear()
+            lines = ["# TYPE langgraph_node_duration_seconds histogram"]
+            for (graph, node), counts in sorted(self.buckets.items()):
+                labels = f'graph="{graph}",node="{node}"'
+                for bound, count in zip(BUCKETS, counts):
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'langgraph_node_duration_seconds_bucket{{{labels},le="{le}"}} {count}')
+                lines.append(f"langgraph_node_duration_seconds_sum{{{labels}}} {self.sums[(graph, node)]}")
+                lines.append(f"langgraph_node_duration_seconds_count{{{labels}}} {counts[-1]}")
+            lines.append("# TYPE langgraph_node_errors_total counter")
+            for (graph, node), count in sorted(self.errors.items()):
+                lines.append(f'langgraph_node_errors_total{{graph="{graph}",node="{node}"}} {count}')
+            tmp_path = self.metrics_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                f.write("\n".join(lines) + "\n")
+            os.replace(tmp_path, self.metrics_path)
+
+class NodeTracer(BaseCallbackHandler):
+    """Callback handler that turns every graph node run (including subgraph nodes) into a span."""
+
+    def __init__(self, graph_name: str, exporter: SpanExporter):
+        self.graph_name = graph_name
+        self.exporter = exporter
+        self.open_spans = {}
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, name=None, **kwargs):
+        metadata = metadata or {}
+        node = metadata.get("langgraph_node")
+        # Only the node runnable itself, not the chains and models it calls, nor
+        # LangGraph's own steps such as __start__
+        if node is None or name != node or node.startswith("__"):
+            return
+        self.open_spans[run_id] = {
+            "graph": self.graph_name,
+            "node": node,
+            "thread_id": metadata.get("thread_id"),
+            "checkpoint_ns": metadata.get("langgraph_checkpoint_ns", ""),
+            "superstep": metadata.get("langgraph_step"),
+            "start": time.time(),
+        }
+
+    def _end(self, run_id, error: Optional[BaseException] = None) -> None:
+        span = self.open_spans.pop(run_id, None)
+        if span is None:
+            return
+        span["end"] = time.time()
+        span["duration"] = span["end"] - span["start"]
+        span["error"] = f"{type(error).__name__}: {error}" if error else None
+        self.exporter.export(span)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+_exporters = {}
+
+def instrument(graph, graph_name: str):
+    """Attach a NodeTracer to a compiled graph if NODE_TRACE_DIR is set; otherwise return it unchanged."""
+    directory = os.environ.get(TRACE_DIR_ENV)
+    if not directory:
+        return graph
+    if directory not in _exporters:
+        _exporters[directory] = SpanExporter(directory)
+    return graph.with_config(callbacks=[NodeTracer(graph_name, _exporters[directory])])
+
+## Report CLI
+
+def _parent_ns(span: dict) -> str:
+    # A node's checkpoint_ns ends with its own "node:task_id" segment
+    return "|".join(span["checkpoint_ns"].split("|")[:-1])
+
+def critical_path(spans: list[dict], parent_ns: str = "") -> list[tuple[int, dict]]:
+    """Longest span of each superstep, descending into subgraph nodes. Returns (depth, span) pairs."""
+    children = [s for s in spans if _parent_ns(s) == parent_ns]
+    by_step = defaultdict(list)
+    for span in children:
+        by_step[span["superstep"]].append(span)
+    path = []
+    depth = parent_ns.count("|") + 1 if parent_ns else 0
+    for step in sorted(by_step, key=lambda s: (s is None, s)):
+        longest = max(by_step[step], key=lambda s: s["duration"])
+        path.append((depth, longest))
+        path.extend(critical_path(spans, longest["checkpoint_ns"]))
+    return path
+
+def print_histograms(spans: list[dict]) -> None:
+    durations = defaultdict(list)
+    for span in spans:
+        durations[(span["graph"], span["node"])].append(span["duration"])
+    for (graph, node), values in sorted(durations.items()):
+        values.sort()
+        p50 = values[len(values) // 2]
+        p99 = values[min(len(values) - 1, int(len(values) * 0.99))]
+        print(f"\n{graph} / {node}: n={len(values)} p50={p50:.3f}s p99={p99:.3f}s max={values[-1]:.3f}s")
+        counts = [0] * len(BUCKETS)
+        for value in values:
+            counts[bisect.bisect_left(BUCKETS, value)] += 1
+        widest = max(counts)
+        for i, count in enumerate(counts):
+            if count:
+                lower = BUCKETS[i - 1] if i else 0.0
+                label = f"{lower:g}-{BUCKETS[i]:g}s" if BUCKETS[i] != float("inf") else f">{lower:g}s"
+                print(f"  {label:>12} | {'#' * max(1, round(40 * count / widest))} {count}")
+
+def print_critical_path(spans: list[dict], thread_id: str) -> None:
+    thread_spans = [s for s in spans if s["thread_id"] == thread_id]
+    if not thread_spans:
+        print(f"No spans for thread {thread_id}")
+        return
+    total = max(s["end"] for s in thread_spans) - min(s["start"] for s in thread_spans)
+    print(f"\nCritical path for thread {thread_id} (wall time {total:.3f}s):")
+    for depth, span in critical_path(thread_spans):
+        share = 100 * span["duration"] / total if total else 0.0
+        error = f"  [{span['error']}]" if span["error"] else ""
+        print(f"  {'  ' * depth}step {span['superstep']}: {span['node']} {span['duration']:.3f}s ({share:.0f}%){error}")
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Summarize node spans recorded with NODE_TRACE_DIR.")
+    parser.add_argument("spans", help="Path to spans.jsonl")
+    parser.add_argument("--thread", help="Print the critical path for this thread_id")
+    args = parser.parse_args(argv)
+
+    with open(args.spans) as f:
+        spans = [json.loads(line) for line in f if line.strip()]
+    if args.thread:
+        print_critical_path(spans, args.thread)
+    else:
+        print_histograms(spans)
+
+if __name__ == "__main__":
+    main()
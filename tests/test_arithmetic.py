@@ -0,0 +1,34 @@
+import pytest
+
+from studio_common.arithmetic import answer, solve
+
+TOOLS = {
+    "add": lambda a, b: a + b,
+    "multiply": lambda a, b: a * b,
+    "divide": lambda a, b: a / b,
+}
+
+@pytest.mark.parametrize("text, expected", [
+    ("3 * 4 + 5", "3 * 4 + 5 = 17"),
+    ("What is 10 divided by 4?", "10 / 4 = 2.5"),
+    ("3 x 4", "3 * 4 = 12"),
+    ("add 3 to 4", "3 + 4 = 7"),
+    ("Add 3 and 4. Multiply the output by 2. Divide the output by 5",
+     "3 + 4 = 7\n7 * 2 = 14\n14 / 5 = 2.8"),
+])
+def test_answers_plain_arithmetic(text, expected):
+    assert answer(text, TOOLS) == expected
+
+@pytest.mark.parametrize("text", [
+    "42",
+    "-7",
+    "2024-1-15",
+    # Hex, not 0 * 10
+    "0x10",
+    "what is 0x10 + 1",
+    "1.2.3 + 4",
+    "divide 1 by 0",
+    "what is the capital of France?",
+])
+def test_falls_back_to_the_model(text):
+    assert solve(text, TOOLS) is None
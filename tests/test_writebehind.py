@@ -0,0 +1,60 @@
+import sqlite3
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import END, START, MessagesState, StateGraph
+
+from checkpoints.writebehind import WriteBehindSqliteSaver
+
+def build(memory, interrupt_before=()):
+    builder = StateGraph(MessagesState)
+    builder.add_node("assistant", lambda state: {"messages": [AIMessage("draft")]})
+    builder.add_node("human_feedback", lambda state: {})
+    builder.add_node("finish", lambda state: {"messages": [AIMessage("done")]})
+    builder.add_edge(START, "assistant")
+    builder.add_edge("assistant", "human_feedback")
+    builder.add_edge("human_feedback", "finish")
+    builder.add_edge("finish", END)
+    return builder.compile(checkpointer=memory, interrupt_before=list(interrupt_before))
+
+@pytest.fixture
+def database(tmp_path):
+    return str(tmp_path / "checkpoints.db")
+
+def checkpoints_seen_by_another_connection(database, thread_id):
+    with sqlite3.connect(database) as other:
+        return other.execute("SELECT COUNT(*) FROM checkpoints WHERE thread_id = ?", (thread_id,)).fetchone()[0]
+
+def test_static_breakpoint_is_committed_when_invoke_returns(database):
+    # A long interval: only the breakpoint itself can explain the commit
+    memory = WriteBehindSqliteSaver(sqlite3.connect(database, check_same_thread=False),
+                                    commit_interval=60, interrupt_before=["human_feedback"])
+    graph = build(memory, interrupt_before=["human_feedback"])
+    config = {"configurable": {"thread_id": "1"}}
+    graph.invoke({"messages": [HumanMessage("write a report")]}, config)
+
+    assert memory.stats()["queued"] == 0
+    assert checkpoints_seen_by_another_connection(database, "1") == 3
+    assert graph.get_state(config).next == ("human_feedback",)
+    memory.close()
+
+def test_run_end_is_committed_when_invoke_returns(database):
+    memory = WriteBehindSqliteSaver(sqlite3.connect(database, check_same_thread=False), commit_interval=60)
+    graph = build(memory)
+    graph.invoke({"messages": [HumanMessage("write a report")]}, {"configurable": {"thread_id": "1"}})
+
+    assert memory.stats()["queued"] == 0
+    assert checkpoints_seen_by_another_connection(database, "1") == 5
+    memory.close()
+
+def test_steps_inside_a_run_are_batched(database):
+    memory = WriteBehindSqliteSaver(sqlite3.connect(database, check_same_thread=False), commit_interval=60)
+    graph = build(memory)
+    graph.invoke({"messages": [HumanMessage("write a report")]}, {"configurable": {"thread_id": "1"}})
+
+    # Five checkpoints and their writes, committed at the end of the run (plus any
+    # writes the runtime saves after the last checkpoint)
+    stats = memory.stats()
+    assert stats["statements"] > 5
+    assert stats["commits"] <= 2
+    memory.close()